@@ -0,0 +1,49 @@
+"""
+Cut a sequence of frames (e.g., a piano roll or a list of chords) in possibly overlapping chunks.
+The sequence is padded once and every chunk is a view into it, instead of a padded copy.
+"""
+import numpy as np
+
+
+def get_chunk_starts(n_frames, chunk_frames, hop_frames):
+    """
+    Return the first frame of each chunk. Chunks start every hop_frames for as long as the previous
+    chunk doesn't reach the end of the sequence.
+    """
+    n_chunks = max(-(-(n_frames + hop_frames - chunk_frames) // hop_frames), 0)  # ceil division
+    return np.arange(n_chunks) * hop_frames
+
+
+def generate_strided_chunks(x, chunk_frames, hop_frames, pad_mode="constant"):
+    """
+    Chunk x along its first axis with a sliding window.
+    :param x: an array with shape (frames, ...)
+    :param chunk_frames: the number of frames in each chunk
+    :param hop_frames: the number of frames between the starts of consecutive chunks
+    :param pad_mode: how to fill the frames after the end of x, as in np.pad
+    :return: chunks, a read-only view with shape (chunks, chunk_frames, ...), and lengths, the
+      number of frames of x in each chunk
+    """
+    n_frames = len(x)
+    starts = get_chunk_starts(n_frames, chunk_frames, hop_frames)
+    lengths = np.minimum(n_frames - starts, chunk_frames)
+    padded_frames = starts[-1] + chunk_frames if len(starts) > 0 else 0
+    pad_width = [(0, padded_frames - n_frames)] + [(0, 0)] * (x.ndim - 1)
+    x_padded = np.pad(x, pad_width, mode=pad_mode) if padded_frames > n_frames else x
+
+    if hop_frames == chunk_frames:  # no overlap, the chunks are contiguous
+        chunks = x_padded[:padded_frames].reshape(len(starts), chunk_frames, *x.shape[1:])
+        chunks.flags.writeable = False
+    else:
+        chunks = np.lib.stride_tricks.as_strided(
+            x_padded,
+            shape=(len(starts), chunk_frames, *x.shape[1:]),
+            strides=(hop_frames * x_padded.strides[0], *x_padded.strides),
+            writeable=False,
+        )
+    return chunks, lengths
+
+
+def round_up_to_multiple(lengths, fpc):
+    """Round the chunk lengths up to a full crotchet"""
+    return -(-lengths // fpc) * fpc
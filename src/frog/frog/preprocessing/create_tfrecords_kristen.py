@@ -20,22 +20,22 @@ from argparse import ArgumentParser
 from datetime import datetime
 from math import inf
 
+import numpy as np
 import tensorflow as tf
 
 from frog import CHUNK_SIZE, DATA_FOLDER, HOP_SIZE, INPUT_FPC, INPUT_TYPES, OUTPUT_FPC
 from frog.label_codec import LabelCodec, OUTPUT_MODES
 from frog.preprocessing.preprocess_chords import (
+    EncodedChordTransposer,
     calculate_lr_transpositions_key,
     generate_chord_chunks,
     import_chords,
-    transpose_chord_labels,
 )
 from frog.preprocessing.preprocess_scores import (
+    ScoreFeatures,
     calculate_lr_transpositions_pitches,
     generate_input_chunks,
-    get_metrical_information,
-    import_piano_roll,
-    transpose_piano_roll,
+    transpose_piano_roll_batch,
 )
 from frog.preprocessing.train_valid_test_split import train_valid_test_split
 
@@ -65,10 +65,11 @@ def _preprocess_one_piece(
 ):
     hop_size = HOP_SIZE if train else CHUNK_SIZE
     file_name = os.path.splitext(os.path.basename(score_file))[0]
-    piano_roll = import_piano_roll(score_file, spelling, octaves, INPUT_FPC)
+    score_features = ScoreFeatures(score_file, INPUT_FPC)
+    piano_roll = score_features.get_piano_roll(spelling, octaves)
     pr_chunks = generate_input_chunks(piano_roll, CHUNK_SIZE, hop_size, INPUT_FPC)
 
-    structure = get_metrical_information(score_file, INPUT_FPC)
+    structure = score_features.get_metrical_information()
     st_chunks = generate_input_chunks(structure, CHUNK_SIZE, hop_size, INPUT_FPC)
 
     # Pre-process the chords
@@ -84,35 +85,41 @@ def _preprocess_one_piece(
             f"The piano roll has {len(piano_roll)} frames but the chords {len(chords)},"
             f" which are equivalent to {len(chords) * INPUT_FPC / OUTPUT_FPC}!"
         )
+    pitch_proximity = "fifth" if spelling == "spelling" else "semitone"
+    chord_transposer = EncodedChordTransposer(label_codec, pitch_proximity)
+
     features = []
-    skip = False
     for i, (pr, st, chords) in enumerate(zip(pr_chunks, st_chunks, chord_chunks)):
-        for s in _find_available_transpositions(pr, chords, spelling, transpose=train):
-            pr_transposed = transpose_piano_roll(pr, s, spelling, octaves)
-            pitch_proximity = "fifth" if spelling == "spelling" else "semitone"
-            chords_transposed = transpose_chord_labels(chords, s, pitch_proximity)
-            enc_chords = label_codec.encode_chords(chords_transposed)
+        transpositions = _find_available_transpositions(pr, chords, spelling, transpose=train)
+        prs_transposed = transpose_piano_roll_batch(pr, transpositions, spelling, octaves)
+        encoded_chords = chord_transposer.encode_chords(chords)
+        enc_chords_transposed = chord_transposer.transpose_encoded_chords(
+            encoded_chords, transpositions
+        )
+        for s, pr_transposed, enc_chords in zip(
+            transpositions, prs_transposed, enc_chords_transposed
+        ):
             breakpoint()
-            for ec, tc in zip(enc_chords, chords_transposed):
-                if any([x is None for x in ec]):
-                    logger.warning(f"Couldn't encode properly chord {tc} -> {ec}")
-                    skip = True
-                    continue
-            if skip:
+            (not_encoded,) = np.nonzero(np.any(enc_chords < 0, axis=1))
+            if len(not_encoded) > 0:
+                for c in not_encoded:
+                    logger.warning(
+                        f"Couldn't encode properly chord {chords[c]} transposed by {s}"
+                        f" -> {enc_chords[c]}"
+                    )
                 logger.warning(f"chunk skipped, transposition {s}")
-                skip = False
-            else:
-                temp = _make_tfr_feature(
-                    pr_transposed,
-                    st,
-                    enc_chords,
-                    label_codec,
-                    file_name,
-                    s,
-                    i * hop_size,
-                    beat_strength,
-                )
-                features.append(temp)
+                continue
+            temp = _make_tfr_feature(
+                pr_transposed,
+                st,
+                enc_chords.tolist(),
+                label_codec,
+                file_name,
+                s,
+                i * hop_size,
+                beat_strength,
+            )
+            features.append(temp)
     return features
 
 def _find_available_transpositions(piano_roll, chords, spelling, transpose):
@@ -1,12 +1,16 @@
 from cProfile import label
+import copy
 import csv
 import logging
 import math
 from collections import namedtuple
 from tkinter import CHORD
 
+import numpy as np
+
 from frog import NOTES, PITCH_FIFTHS, N2I, find_enharmonic_equivalent, PF2I
 from frog.label_codec import KEY_START, KEY_END
+from frog.preprocessing.chunking import generate_strided_chunks, round_up_to_multiple
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +18,67 @@ Chord = namedtuple("Chord", ["key", "degree", "quality", "inversion", "root"])
 
 ONSET_IDX, OFFSET_IDX, CHORD_IDX = 0, 1, 2
 
-# TODO: maybe implement transpositions on the encoded chords?
+# Keys and roots are transposed as integer note codes: the index of the note in NOTES (mode
+#  'semitone') or PITCH_FIFTHS (mode 'fifth'), times 2, plus 1 if the note is lower case
+NOTE_CODE_AMBIGUOUS, NOTE_CODE_NONE = -2, -1
+
+
+def _get_transposition_notes(mode):
+    if mode == "semitone":
+        return NOTES
+    elif mode == "fifth":
+        return PITCH_FIFTHS
+    raise ValueError('mode should be either "semitone" or "fifth"')
+
+
+def encode_note(note, mode="semitone"):
+    """Convert a note (a key or a chord root) to its note code"""
+    _get_transposition_notes(mode)
+    if note is None:
+        logger.warning("Trying to shift a note that is None. Returning None")
+        return NOTE_CODE_NONE
+
+    if note == "ambiguous":
+        return NOTE_CODE_AMBIGUOUS
+
+    if mode == "semitone":
+        # BEWARE: this never uses flats!
+        note = find_enharmonic_equivalent(note)
+        idx = N2I[note.upper()]
+    else:
+        idx = PF2I[note.upper()]
+    return 2 * idx + (0 if note.isupper() else 1)
+
+
+def decode_note(code, mode="semitone"):
+    """Convert a note code back to the note"""
+    notes = _get_transposition_notes(mode)
+    if code == NOTE_CODE_NONE:
+        return None
+    if code == NOTE_CODE_AMBIGUOUS:
+        return "ambiguous"
+    note = notes[code // 2]
+    return note if code % 2 == 0 else note.lower()
+
+
+def transpose_note_codes(codes, s, mode="semitone"):
+    """
+    Transpose note codes of s units. Notes that fall outside of PITCH_FIFTHS become None.
+    :param codes: an array of note codes
+    :param s: the transposition, or an array of them to broadcast against codes
+    :param mode: can be either 'semitone' or 'fifth' and describes how transpositions are done.
+    :return: the transposed note codes
+    """
+    notes = _get_transposition_notes(mode)
+    codes = np.asarray(codes)
+    idx = codes // 2 + s
+    if mode == "semitone":
+        idx %= len(notes)
+    transposed_codes = 2 * idx + codes % 2
+    transposed_codes = np.where((idx < 0) | (idx >= len(notes)), NOTE_CODE_NONE, transposed_codes)
+    return np.where(codes < 0, codes, transposed_codes)  # None and 'ambiguous' don't move
+
+
 def transpose_chord_labels(chord_labels, s, mode="semitone"):
     """
 
@@ -24,35 +88,119 @@ def transpose_chord_labels(chord_labels, s, mode="semitone"):
     :return:
     """
 
-    def shift_note(note):
-        if note is None:
-            logger.warning("Trying to shift a note that is None. Returning None")
-            return None
-
-        if note == "ambiguous":
-            return "ambiguous"
-
-        if mode == "semitone":
-            # BEWARE: this never uses flats!
-            note = find_enharmonic_equivalent(note)
-            idx = (N2I[note.upper()] + s) % 12
-            shifted_note = NOTES[idx] if note.isupper() else NOTES[idx].lower()
-        elif mode == "fifth":
-            idx = PF2I[note.upper()] + s
-            if idx >= len(PITCH_FIFTHS):
-                return None
-            shifted_note = PITCH_FIFTHS[idx] if note.isupper() else PITCH_FIFTHS[idx].lower()
-        else:
-            raise ValueError('mode should be either "semitone" or "fifth"')
-        return shifted_note
+    def shift_notes(notes):
+        codes = [encode_note(n, mode) for n in notes]
+        return [decode_note(c, mode) for c in transpose_note_codes(codes, s, mode)]
 
+    keys = shift_notes([c.key for c in chord_labels])
+    roots = shift_notes([c.root for c in chord_labels])
     transposed_chords = [
-        Chord(shift_note(c.key), c.degree, c.quality, c.inversion, shift_note(c.root))
-        for c in chord_labels
+        Chord(k, c.degree, c.quality, c.inversion, r)
+        for c, k, r in zip(chord_labels, keys, roots)
     ]
     return transposed_chords
 
 
+def _flatten_encoding(enc, width):
+    """Turn an encoding (an integer, a tuple of them, or None) into width integers, -1 for None"""
+    if enc is None:
+        return (-1,) * width
+    enc = enc if isinstance(enc, tuple) else (enc,)
+    return tuple(-1 if e is None else e for e in enc)
+
+
+class EncodedChordTransposer:
+    """
+    Transpose chords in the encoded integer domain, for all transpositions of a chunk at once.
+    The chords are encoded once, with their keys and roots as note codes. Transposing shifts the
+    note codes and looks up their encoding in tables built from the label codec.
+    """
+
+    def __init__(self, label_codec, mode="semitone"):
+        """
+        :param label_codec: the LabelCodec that encodes the chords
+        :param mode: can be either 'semitone' or 'fifth' and describes how transpositions are done.
+        """
+        self.label_codec = label_codec
+        # Finds the degrees and qualities that a non-strict label codec replaces with random ones
+        self.strict_label_codec = label_codec
+        if not label_codec.strict:
+            self.strict_label_codec = copy.copy(label_codec)
+            self.strict_label_codec.strict = True
+        self.mode = mode
+        # keys and degrees are encoded as pairs in the experimental mode
+        self.width = 1 if label_codec.mode == "legacy" else 2
+
+        # Tables indexed by note code, NOTE_CODE_AMBIGUOUS and NOTE_CODE_NONE index from the end
+        codes = list(range(2 * len(_get_transposition_notes(mode)))) + [
+            NOTE_CODE_AMBIGUOUS,
+            NOTE_CODE_NONE,
+        ]
+        notes = [decode_note(c, mode) for c in codes]
+        self.key_table = np.array(
+            [_flatten_encoding(label_codec.K2I.get(n, None), self.width) for n in notes],
+            dtype=np.int64,
+        )
+        self.root_table = np.array(
+            [label_codec.R2I.get(n.upper(), -1) if n is not None else -1 for n in notes],
+            dtype=np.int64,
+        )
+
+    def _encode_features(self, label_codec, chord):
+        """Encode the degree, quality and inversion of a chord, with -1 for None"""
+        ton, deg = label_codec.encode_degree(chord.degree)
+        return (
+            *_flatten_encoding(ton, self.width),
+            *_flatten_encoding(deg, self.width),
+            *_flatten_encoding(label_codec.encode_quality(chord.quality), 1),
+            label_codec.encode_inversion(chord.inversion),
+        )
+
+    def encode_chords(self, chords):
+        """
+        Encode the chords, except for their keys and roots that are kept as note codes.
+        :param chords: A list of named tuples: [key, degree, quality, inversion, root]
+        :return: key_codes, root_codes, the other features with shape (chords, features), and the
+          (index, chord) of the chords whose features the label codec picks at random, which are
+          encoded again for every transposition
+        """
+        key_codes = np.array([encode_note(c.key, self.mode) for c in chords], dtype=np.int64)
+        root_codes = np.array([encode_note(c.root, self.mode) for c in chords], dtype=np.int64)
+        features = [self._encode_features(self.strict_label_codec, c) for c in chords]
+        features = np.array(features, dtype=np.int64).reshape(len(chords), 2 * self.width + 2)
+        random_chords = []
+        if not self.label_codec.strict:
+            (random_rows,) = np.nonzero(np.any(features < 0, axis=1))
+            random_chords = [(i, chords[i]) for i in random_rows]
+        return key_codes, root_codes, features, random_chords
+
+    def transpose_encoded_chords(self, encoded_chords, transpositions):
+        """
+        Transpose the encoded chords by every transposition at once.
+        :param encoded_chords: the output of encode_chords
+        :param transpositions: a list of transpositions
+        :return: the encoded chords, shape (transpositions, chords, output features), with -1 for
+          the features that can't be encoded
+        """
+        key_codes, root_codes, features, random_chords = encoded_chords
+        s = np.asarray(transpositions, dtype=np.int64)[:, np.newaxis]
+        keys = self.key_table[transpose_note_codes(key_codes, s, self.mode)]
+        root_codes = transpose_note_codes(root_codes, s, self.mode)
+        roots = self.root_table[root_codes]
+        # the label codec picks a random root for the invalid ones if it is not strict
+        for i in zip(*np.nonzero(roots < 0)):
+            root = self.label_codec.encode_root(decode_note(root_codes[i], self.mode))
+            roots[i] = -1 if root is None else root
+        features = np.broadcast_to(features, (len(s), *features.shape))
+        if random_chords:
+            # draw the random degrees and qualities separately for each transposition
+            features = features.copy()
+            for t in range(len(s)):
+                for i, c in random_chords:
+                    features[t, i] = self._encode_features(self.label_codec, c)
+        return np.concatenate([keys, features, roots[:, :, np.newaxis]], axis=2)
+
+
 def calculate_lr_transpositions_key(chords, spelling):
     """The number of transpositions can be negative if the original key is not allowed!"""
     assert spelling in ["pitch", "spelling"], "Please choose either pitch or spelling"
@@ -67,17 +215,19 @@ def calculate_lr_transpositions_key(chords, spelling):
 
 
 def generate_chord_chunks(chords, chunk_size, hop_size, output_fpc):
-    """Chords must be a list of Chord named tuples"""
-    res = []
-    elapsed = 0
-    while elapsed + chunk_size * output_fpc < len(chords) + hop_size * output_fpc:
-        chunk = chords[elapsed : elapsed + chunk_size * output_fpc]
-        # Pad with repeating chords until the beginning of next crotchet
-        while len(chunk) % output_fpc != 0:
-            chunk.append(chunk[-1])
-        elapsed += hop_size * output_fpc
-        res.append(chunk)
-    return res
+    """
+    Chords must be a list of Chord named tuples. Each chunk is an array of chords, a view into a
+    single padded array of all chords.
+    """
+    chords_array = np.empty(len(chords), dtype=object)
+    for i, c in enumerate(chords):
+        chords_array[i] = c
+    # Pad with repeating chords until the beginning of next crotchet
+    chunks, lengths = generate_strided_chunks(
+        chords_array, chunk_size * output_fpc, hop_size * output_fpc, pad_mode="edge"
+    )
+    lengths = round_up_to_multiple(lengths, output_fpc)
+    return [chunk[:length] for chunk, length in zip(chunks, lengths)]
 
 
 def _load_chord_labels(chords_file, label_codec):
@@ -7,6 +7,11 @@ import numpy as np
 
 from frog import INPUT_FPC, OUTPUT_FPC, PF2I, PF2PS
 from frog.converters.annotation_converters import remove_prima_volta
+from frog.preprocessing.chunking import (
+    generate_strided_chunks,
+    get_chunk_starts,
+    round_up_to_multiple,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,19 +23,64 @@ def _load_score(score_file, input_fpc):
     return score, n_frames
 
 
-def get_metrical_information(score_file, input_fpc):
+class ScoreFeatures:
+    """
+    Parse a score once and extract every feature that the model needs from it: the piano roll
+    (complete, bass or class), the metrical structure and the measure offsets.
+    Use this instead of calling import_piano_roll and get_metrical_information on the same file,
+    which would parse the score (and remove its prima volta) twice.
+    """
+
+    def __init__(self, score_file, input_fpc):
+        """
+        :param score_file: the path to the file to analyse
+        :param input_fpc: frames per crotchet
+        """
+        self.score_file = score_file
+        self.input_fpc = input_fpc
+        self.score, self.n_frames = _load_score(score_file, input_fpc)
+        self.flat_score = self.score.flat
+        self._measure_offsets = None
+        self._pr_complete = {}
+
+    def get_measure_offsets(self):
+        """Return the offsets of the measures, computed the first time they are needed"""
+        if self._measure_offsets is None:
+            self._measure_offsets = _get_measure_offsets(self.score)
+        return self._measure_offsets
+
+    def get_piano_roll(self, spelling, octaves):
+        """Return a piano_roll with shape (frames, pitches)"""
+        assert octaves in ["complete", "bass", "class"]
+        if spelling not in self._pr_complete:
+            self._pr_complete[spelling] = _score_to_piano_roll_complete(
+                self.flat_score, self.n_frames, spelling, self.input_fpc
+            )
+        return _convert_piano_roll_octaves(self._pr_complete[spelling], spelling, octaves)
+
+    def get_metrical_information(self):
+        return _score_to_metrical_information(
+            self.flat_score, self.get_measure_offsets(), self.n_frames, self.input_fpc
+        )
+
+
+def _get_measure_offsets(score):
     # TODO: Maybe this entire function could use part = score.parts[0] instead of score?
-    score, n_frames = _load_score(score_file, input_fpc)
     score_mom = score.measureOffsetMap()
     # consider only measures that have not been marked as "excluded" in the musicxml
     # we assume all parts share the same measures (and take the part [0])
-    measure_offsets = np.array(
-        [k for k in score_mom.keys() if score_mom[k][0].numberSuffix is None]
-    )
+    return np.array([k for k in score_mom.keys() if score_mom[k][0].numberSuffix is None])
+
+
+def get_metrical_information(score_file, input_fpc):
+    return ScoreFeatures(score_file, input_fpc).get_metrical_information()
+
+
+def _score_to_metrical_information(flat_score, measure_offsets, n_frames, input_fpc):
     offsets = np.arange(n_frames) / input_fpc
 
     # Get metrical info from time signatures
-    ts_list = list(score.flat.getTimeSignatures())
+    ts_list = list(flat_score.getTimeSignatures())
     first_measure_number = 0 if any([ts.measureNumber == 0 for ts in ts_list]) else 1
     time_signatures = {max(ts.measureNumber - first_measure_number, 0): ts for ts in ts_list}
     ts_measures = np.array(sorted(time_signatures.keys()))
@@ -55,44 +105,80 @@ def _load_score_complete(score_file, spelling, input_fpc):
     :return: piano_roll, shape (n_frames, n_pitches)
     """
     assert spelling in ["pitch", "spelling"], "Please select either pitch or spelling as mode"
-    score, n_frames = _load_score(score_file, input_fpc)
+    return ScoreFeatures(score_file, input_fpc).get_piano_roll(spelling, "complete")
+
+
+def _score_to_piano_roll_complete(flat_score, n_frames, spelling, input_fpc):
+    assert spelling in ["pitch", "spelling"], "Please select either pitch or spelling as mode"
     n_pitches = 12 if spelling == "pitch" else 35
-    piano_roll = np.zeros(shape=(n_frames, n_pitches * 7), dtype=np.int32)
+    starts, ends, octaves, pitches = _extract_notes(flat_score, spelling, input_fpc)
+
+    in_range = (octaves >= 0) & (octaves < 7)  # we keep just 7 octaves in total
+    n_skipped = len(octaves) - np.count_nonzero(in_range)
+    if n_skipped > 0:
+        logger.warning(f"Score outside the octave boundaries. Skipped {n_skipped} notes.")
+    starts, ends, octaves = starts[in_range], ends[in_range], octaves[in_range]
+    idx = _pitches_to_indices([p for p, keep in zip(pitches, in_range) if keep], spelling)
+    columns = idx + n_pitches * octaves
+
+    # Mark where each note starts and stops sounding, then accumulate over time
+    diff = np.zeros(shape=(n_frames + 1, n_pitches * 7), dtype=np.int32)
+    np.add.at(diff, (starts, columns), 1)
+    np.add.at(diff, (ends, columns), -1)
+    piano_roll = (np.cumsum(diff[:-1], axis=0) > 0).astype(np.int32)
+    return piano_roll
 
-    for n in score.flat.notes:
-        notes = np.array([x for x in n] if n.isChord else [n])
-        start = int(round(n.offset * input_fpc))
-        end = start + max(int(round(n.duration.quarterLength * input_fpc)), 1)
-        time = np.arange(start, end)
+
+def _extract_notes(flat_score, spelling, input_fpc):
+    """
+    Extract all notes in the score as flat arrays, with one entry per note (each note in a chord
+    has its own entry).
+    :param flat_score: the flattened score
+    :param spelling: whether to return pitch classes ('pitch') or pitch names ('spelling')
+    :param input_fpc: frames per crotchet
+    :return: starts, ends, octaves, pitches, where notes sound in the frames [start, end)
+    """
+    offsets, durations, n_notes, octaves, pitches = [], [], [], [], []
+    for n in flat_score.notes:
+        notes = [x for x in n] if n.isChord else [n]
+        offsets.append(float(n.offset))
+        durations.append(float(n.duration.quarterLength))
+        n_notes.append(len(notes))
         for note in notes:
-            octave = note.pitch.octave - 1
-            if octave < 0 or octave >= 7:  # we keep just 7 octaves in total
-                logger.warning("Score outside the octave boundaries. Skipped a note.")
-                continue
-            idx = note.pitch.pitchClass if spelling == "pitch" else PF2I[note.pitch.name]
-            piano_roll[time, idx + n_pitches * octave] = 1
-    return piano_roll
+            octaves.append(note.pitch.octave - 1)
+            pitches.append(note.pitch.pitchClass if spelling == "pitch" else note.pitch.name)
+    # np.round rounds half to even, like the built-in round
+    starts = np.round(np.array(offsets) * input_fpc).astype(np.int64)
+    ends = starts + np.maximum(np.round(np.array(durations) * input_fpc).astype(np.int64), 1)
+    starts, ends = np.repeat(starts, n_notes), np.repeat(ends, n_notes)
+    octaves = np.array(octaves, dtype=np.int64)
+    return starts, ends, octaves, pitches
+
+
+def _pitches_to_indices(pitches, spelling):
+    """Map pitch classes or pitch names to their index within one octave of the piano roll"""
+    if spelling == "pitch":
+        return np.array(pitches, dtype=np.int64)
+    # Look up each distinct pitch name once
+    names, inverse = np.unique(np.array(pitches, dtype=str), return_inverse=True)
+    lookup = np.array([PF2I[name] for name in names], dtype=np.int64)
+    return lookup[inverse.reshape(-1)]
 
 
 def _complete_to_bass(pr_complete, mode):
-    def find_bass_spelling_frame(frame):
-        for i in range(7):
-            temp = frame[n_classes * i : n_classes * (i + 1)]
-            (active_pitches,) = np.nonzero(temp)
-            if len(active_pitches) > 0:
-                pitch_tuples = [(p, PF2PS[p]) for p in active_pitches]
-                ordered_pitches = sorted(pitch_tuples, key=lambda x: x[1])
-                return ordered_pitches[0][0]
-        return 0
+    def find_bass_spelling(pr_complete):
+        # Sort the columns by pitch height: first by octave, then by PF2PS within the octave
+        octaves, pitches = np.divmod(np.arange(pr_complete.shape[1]), n_classes)
+        column_heights = octaves * n_classes + np.array([PF2PS[p] for p in pitches])
+        masked_heights = np.where(pr_complete != 0, column_heights, len(column_heights))
+        return np.argmin(masked_heights, axis=1) % n_classes  # 0 if there are no notes
 
     def find_bass(pr_complete, mode):
         if mode == "pitch":
             bass_pitches = np.argmax(pr_complete, axis=1)  # argmax takes the first non-zero value
             bass_pitches %= n_classes
         else:
-            bass_pitches = np.zeros(pr_complete.shape[0], dtype=int)
-            for t, frame in enumerate(pr_complete):
-                bass_pitches[t] = find_bass_spelling_frame(frame)
+            bass_pitches = find_bass_spelling(pr_complete)
         values = np.max(pr_complete, axis=1)  # values == 1 if there are notes, 0 otherwise
         return bass_pitches, values
 
@@ -124,8 +210,11 @@ def _complete_to_class(pr_complete):
 
 def import_piano_roll(score_file, spelling, octaves, input_fpc):
     """Return a piano_roll with shape (frames, pitches)"""
+    return ScoreFeatures(score_file, input_fpc).get_piano_roll(spelling, octaves)
+
+
+def _convert_piano_roll_octaves(piano_roll, spelling, octaves):
     assert octaves in ["complete", "bass", "class"]
-    piano_roll = _load_score_complete(score_file, spelling, input_fpc)
     if octaves == "bass":
         piano_roll = _complete_to_bass(piano_roll, spelling)
     elif octaves == "class":
@@ -134,31 +223,22 @@ def import_piano_roll(score_file, spelling, octaves, input_fpc):
 
 
 def generate_input_chunks(x, chunk_size, hop_size, input_fpc):
-    """Chunk an input array x (e.g., piano_roll) in smaller, possibly overlapping, pieces"""
-    res = []
-    elapsed = 0
-    while elapsed + chunk_size * input_fpc < len(x) + hop_size * input_fpc:
-        chunk = x[elapsed : elapsed + chunk_size * input_fpc, :]
-        # Pad until reaching a full crotchet
-        padded_chunk = np.pad(chunk, [(0, (-len(chunk) % input_fpc)), (0, 0)])
-        res.append(padded_chunk)
-        elapsed += hop_size * input_fpc
-    return res
+    """
+    Chunk an input array x (e.g., piano_roll) in smaller, possibly overlapping, pieces.
+    The last chunks can be shorter, but are padded until reaching a full crotchet.
+    The chunks are views into a single padded copy of x.
+    """
+    chunks, lengths = generate_strided_chunks(x, chunk_size * input_fpc, hop_size * input_fpc)
+    lengths = round_up_to_multiple(lengths, input_fpc)
+    return [chunk[:length] for chunk, length in zip(chunks, lengths)]
 
 
 def generate_output_mask_chunks(piano_roll, chunk_size, hop_size, input_fpc, output_fpc):
-    # TODO: Maybe this should change. I'm sure we can come up with something simpler
-    elapsed_crotchets = 0
-    score_len_crotchets = len(piano_roll) / input_fpc
-    chunk_masks = []
-    while elapsed_crotchets + chunk_size < score_len_crotchets + hop_size:
-        remaining_length_crotchets = math.ceil(score_len_crotchets - elapsed_crotchets)
-        mask = np.ones((chunk_size * output_fpc))
-        if remaining_length_crotchets < chunk_size:
-            mask[remaining_length_crotchets * output_fpc :] = 0
-        chunk_masks.append(mask)
-        elapsed_crotchets += hop_size
-    return chunk_masks
+    """Return the output mask of each chunk, 0 after the end of the score, shape (chunks, frames)"""
+    starts = get_chunk_starts(len(piano_roll), chunk_size * input_fpc, hop_size * input_fpc)
+    remaining_length_crotchets = -(-(len(piano_roll) - starts) // input_fpc)  # ceil division
+    mask_frames = np.arange(chunk_size * output_fpc)
+    return (mask_frames < remaining_length_crotchets[:, np.newaxis] * output_fpc).astype(float)
 
 
 def calculate_lr_transpositions_pitches(piano_roll, spelling):
@@ -179,39 +259,50 @@ def calculate_lr_transpositions_pitches(piano_roll, spelling):
 
 def transpose_piano_roll(piano_roll, s, spelling, octaves):
     """Transpose a score of s units."""
+    return transpose_piano_roll_batch(piano_roll, [s], spelling, octaves)[0]
+
+
+def transpose_piano_roll_batch(piano_roll, transpositions, spelling, octaves):
+    """
+    Transpose a score by all transpositions at once.
+    :return: the transposed piano rolls, shape (transpositions, frames, features)
+    """
+    columns = transposition_column_indices(piano_roll.shape[1], transpositions, spelling, octaves)
+    return np.moveaxis(piano_roll[:, columns], 1, 0)
+
+
+def transposition_column_indices(n_features, transpositions, spelling, octaves):
+    """
+    For each transposition, the column of the original piano roll that goes to each column of the
+    transposed one, with shape (transpositions, features)
+    """
+    s = np.asarray(transpositions, dtype=np.int64)[:, np.newaxis]
+    columns = np.arange(n_features)
     if spelling == "spelling" or octaves == "complete":
-        return np.roll(piano_roll, shift=s, axis=1)
+        return (columns - s) % n_features  # the minus sign is correct!
 
-    # with MIDI pitch classes, pitch class 11 -> 0 (= 12) when transposed of +1
-    pr_transposed = np.zeros(piano_roll.shape, dtype=np.int32)
-    for i in range(12):  # transpose the main part
-        pr_transposed[:, i] = piano_roll[:, (i - s) % 12]  # the minus sign is correct!
-    for i in range(12, pr_transposed.shape[1]):  # transpose the bass, if present
-        pr_transposed[:, i] = piano_roll[:, ((i - s) % 12) + 12]
-    return pr_transposed
+    # with MIDI pitch classes, pitch class 11 -> 0 (= 12) when transposed of +1, both in the main
+    #  part and in the bass, if present
+    return (columns - s) % 12 + 12 * (columns // 12)
 
 
 def prepare_input_from_score_file(sf, input_type, chunk_size, metrical=True):
     spelling, octaves = input_type.split("_")
-    piano_roll = import_piano_roll(sf, spelling, octaves, INPUT_FPC)
-    pr_chunks = generate_input_chunks(piano_roll, chunk_size, chunk_size, INPUT_FPC)
-    pr_chunks = np.array([pad_to_length(c, chunk_size * INPUT_FPC) for c in pr_chunks])
+    score_features = ScoreFeatures(sf, INPUT_FPC)
+    piano_roll = score_features.get_piano_roll(spelling, octaves)
+    # Without overlap, the padded chunks of the whole score are one contiguous array
+    chunk_frames = chunk_size * INPUT_FPC
+    pr_chunks, _ = generate_strided_chunks(piano_roll, chunk_frames, chunk_frames)
     structure = np.zeros_like(piano_roll)
     if metrical:
         try:
-            structure = get_metrical_information(sf, INPUT_FPC)
+            structure = score_features.get_metrical_information()
         except:
             logger.warning("Couldn't get metrical information, returning a vector of zeros")
-    st_chunks = generate_input_chunks(structure, chunk_size, chunk_size, INPUT_FPC)
-    st_chunks = np.array([pad_to_length(c, chunk_size * INPUT_FPC) for c in st_chunks])
+    st_chunks, _ = generate_strided_chunks(structure, chunk_frames, chunk_frames)
     masks = generate_output_mask_chunks(piano_roll, chunk_size, chunk_size, INPUT_FPC, OUTPUT_FPC)
     n = len(pr_chunks)
     names = np.array([os.path.splitext(os.path.basename(sf))[0]] * n)
     transpositions = np.array([0] * n)
     starts = np.arange(n) * chunk_size * OUTPUT_FPC
-    return (pr_chunks, st_chunks, np.array(masks)), (names, transpositions, starts)
-
-
-def pad_to_length(piano_roll, length):
-    pad_width = length - len(piano_roll)
-    return np.pad(piano_roll, ((0, pad_width), (0, 0)))
+    return (pr_chunks, st_chunks, masks), (names, transpositions, starts)
@@ -5,6 +5,8 @@ import os
 
 import numpy as np
 
+from segment_masks import compute_segment_event_indices, compute_segment_mask
+
 DO_NOT_EXCLUDE = 0
 
 def get_filepaths_from_txt_file(txt_file_with_filepaths):
@@ -35,19 +37,11 @@ def exclude_events_outside_of_key_segments_from_event_key_labels(event_key_label
     event_key_labels : np.ndarray (dtype='int64', shape=(no. events,))
     key_segment_indices : np.ndarray (dtype='int64', shape=(no. key segments, 2))
     """
-    event_key_labels_with_non_key_segment_events_removed = []
-    for key_segment_idx in key_segment_indices:
-        start_idx, stop_idx = key_segment_idx[0], key_segment_idx[1]
-
-        if start_idx == stop_idx:
-            continue
+    key_segment_indices = np.asarray(key_segment_indices).reshape(-1, 2)
+    if not np.any(key_segment_indices[:, 0] != key_segment_indices[:, 1]):
+        return np.asarray([])
 
-        event_key_labels_with_non_key_segment_events_removed.append(event_key_labels[start_idx:stop_idx])
-
-    if len(event_key_labels_with_non_key_segment_events_removed) == 0:
-        return np.asarray(event_key_labels_with_non_key_segment_events_removed)
-    else:
-        return np.concatenate(event_key_labels_with_non_key_segment_events_removed)
+    return event_key_labels[compute_segment_event_indices(key_segment_indices, event_key_labels.shape[0])]
 
 def exclude_specified_events_from_event_key_labels(event_key_labels, events_to_exclude):
     """ Remove key labels for excluded events from `event_key_labels`
@@ -58,12 +52,11 @@ def exclude_specified_events_from_event_key_labels(event_key_labels, events_to_e
     event_key_labels : np.ndarray (dtype='int64', shape=(no. events,))
     events_to_exclude : np.ndarray (dtype='int64', shape=(no. events,))
     """
-    event_key_labels_with_excluded_events_removed = []
-    for event_idx, event in enumerate(events_to_exclude):
-        if event == DO_NOT_EXCLUDE:
-           event_key_labels_with_excluded_events_removed.append(event_key_labels[event_idx])
+    included_events = np.asarray(events_to_exclude) == DO_NOT_EXCLUDE
+    if not np.any(included_events):
+        return np.asarray([])
 
-    return np.asarray(event_key_labels_with_excluded_events_removed)
+    return event_key_labels[:included_events.shape[0]][included_events]
 
 def convert_key_indices_to_excluded_events_vector(key_segment_indices, num_events):
     """ Convert key segment eighth note beat start and stop times to
@@ -77,13 +70,9 @@ def convert_key_indices_to_excluded_events_vector(key_segment_indices, num_event
     key_segment_indices : np.ndarray (shape=(no. key segments, 2))
     num_events : int
     """
-    excluded_events_vector = np.ones(num_events)
-
-    for key_segment_idx in key_segment_indices:
-        start_idx, stop_idx = key_segment_idx[0], key_segment_idx[1]
-        excluded_events_vector[start_idx:stop_idx] = DO_NOT_EXCLUDE 
+    key_segment_mask = compute_segment_mask(key_segment_indices, num_events)
 
-    return excluded_events_vector
+    return np.where(key_segment_mask, DO_NOT_EXCLUDE, 1).astype('float64')
 
 def remove_songs_to_ignore_from_dict(songs_to_ignore, key_dict):
     """ Remove songs to ignore from inputted dictionary.
@@ -95,7 +84,7 @@ def remove_songs_to_ignore_from_dict(songs_to_ignore, key_dict):
     """
     for songname in songs_to_ignore:
         if songname in key_dict:
-            key_dict.pop(songname)
+            del key_dict[songname]
     return key_dict
 
 def truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels(event_key_predictions, ground_truth_event_key_labels):
@@ -190,23 +179,71 @@ def get_key_segments_from_consecutive_idx_groups(song_key_pred_for_each_event, c
     -------
     key_segments : list of [int, int] 
     """
-    key_segments = []
+    song_key_pred_for_each_event = np.asarray(song_key_pred_for_each_event)
+
+    threshold_mask = np.zeros(song_key_pred_for_each_event.shape[0], dtype=bool)
     for idx_group in consecutive_idx_groups:
-        key_segment_labels = song_key_pred_for_each_event[idx_group]
-
-        key_segment_start_indices = [0]
-        current_key_segment_label = key_segment_labels[0]
-        for key_label_idx, key_label in enumerate(key_segment_labels[1:]):
-            if key_label != current_key_segment_label:
-                key_segment_start_indices.append(key_label_idx+1)
-                current_key_segment_label = key_label
-
-        for start_idx_num, key_segment_start_idx in enumerate(key_segment_start_indices):
-            if start_idx_num == (len(key_segment_start_indices)-1):
-                key_segment_idx = [idx_group[key_segment_start_idx], idx_group[-1]+1]
-            else:
-                next_key_segment_start_idx = key_segment_start_indices[start_idx_num+1]
-                key_segment_idx = [idx_group[key_segment_start_idx], idx_group[next_key_segment_start_idx]]
-            key_segments.append(key_segment_idx)
-
-    return key_segments 
\ No newline at end of file
+        threshold_mask[idx_group] = True
+
+    return get_key_segments_from_threshold_mask(song_key_pred_for_each_event, threshold_mask).tolist()
+
+def get_key_segments_from_threshold_mask(song_key_pred_for_each_event, threshold_mask):
+    """ Get eighth note beat start and stop indices for each key
+    segment, where a key segment is a run of consecutive events that
+    pass the threshold and have the same predicted key.
+
+    Parameters
+    ----------
+    song_key_pred_for_each_event : np.ndarray (shape=(no. song events,), dtype='int64')
+    threshold_mask : np.ndarray (shape=(no. events,), dtype='bool')
+        True for the events whose maximum key probability is >= the threshold.
+
+    Returns
+    -------
+    key_segments : np.ndarray (shape=(no. key segments, 2), dtype='int64')
+    """
+    return get_key_segments_from_threshold_mask_for_songs(song_key_pred_for_each_event, threshold_mask,
+                                                          np.asarray([0, threshold_mask.shape[0]]))[0]
+
+def get_key_segments_from_threshold_mask_for_songs(key_pred_for_each_event, threshold_mask, song_event_offsets):
+    """ Get the key segments of every song at once, from the songs'
+    events concatenated into one array. Key segments never continue
+    from the end of one song into the start of the next.
+
+    Parameters
+    ----------
+    key_pred_for_each_event : np.ndarray (shape=(total no. events,), dtype='int64')
+    threshold_mask : np.ndarray (shape=(total no. events,), dtype='bool')
+    song_event_offsets : np.ndarray (shape=(no. songs + 1,), dtype='int64')
+        Song `i`'s events are `song_event_offsets[i]:song_event_offsets[i+1]`.
+
+    Returns
+    -------
+    key_segments : np.ndarray (shape=(total no. key segments, 2), dtype='int64')
+        Indices relative to the start of each key segment's song.
+    song_key_segment_offsets : np.ndarray (shape=(no. songs + 1,), dtype='int64')
+        Song `i`'s key segments are `key_segments[song_key_segment_offsets[i]:song_key_segment_offsets[i+1]]`.
+    """
+    key_pred_for_each_event = key_pred_for_each_event[:threshold_mask.shape[0]]
+
+    # A key segment breaks between two events if either event doesn't pass the
+    # threshold, the predicted key changes, or a new song starts.
+    is_break_after_event = np.ones(threshold_mask.shape[0], dtype=bool)
+    is_break_after_event[:-1] = (key_pred_for_each_event[1:] != key_pred_for_each_event[:-1]) | ~threshold_mask[1:]
+    song_stops = song_event_offsets[1:-1]
+    is_break_after_event[song_stops[song_stops > 0] - 1] = True
+
+    is_break_before_event = np.ones(threshold_mask.shape[0], dtype=bool)
+    is_break_before_event[1:] = is_break_after_event[:-1] | ~threshold_mask[:-1]
+
+    key_segment_starts = np.flatnonzero(threshold_mask & is_break_before_event)
+    key_segment_stops = np.flatnonzero(threshold_mask & is_break_after_event) + 1
+
+    song_key_segment_offsets = np.searchsorted(key_segment_starts, song_event_offsets, side='left')
+    song_idx_of_each_key_segment = np.searchsorted(song_event_offsets, key_segment_starts, side='right') - 1
+    key_segment_song_offsets = song_event_offsets[song_idx_of_each_key_segment]
+
+    key_segments = np.stack([key_segment_starts - key_segment_song_offsets,
+                             key_segment_stops - key_segment_song_offsets], axis=1)
+
+    return key_segments.astype('int64'), song_key_segment_offsets.astype('int64')
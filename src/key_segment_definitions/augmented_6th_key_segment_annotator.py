@@ -1,6 +1,7 @@
 """ Implementation of Clear Key Segment Definition 7 from thesis.
 """
 
+from chord_table import ChordTable
 from foreign_note_detector import ForeignNoteDetector
 from relaxed_key_segment_annotator import RelaxedKeySegmentAnnotator
 
@@ -31,6 +32,10 @@ class Augmented6thKeySegmentAnnotator(RelaxedKeySegmentAnnotator):
         self.inverted_chord_regex = "(732|742|765|6432|643|642|654|65|6/5|64|6/4|63|6/3|62|6|532|54|5|43|4/3|42|4/2|4|3|2)"
 
         self.rntxt_analysis = rntxt_analysis
+        if "chord_table" in kwargs:
+            self.chord_table = kwargs["chord_table"]
+        else:
+            self.chord_table = ChordTable(rntxt_analysis)
 
         if rntxt_analysis[0].offset != 0.0:
             print("Warning: `rntxt_analysis[0].offset` starts on {}, not 0.0".format(rntxt_analysis[0].offset))
@@ -1,8 +1,12 @@
 """ Implementation of Clear Key Segment Definition 1 from thesis.
 """
 
+import numpy as np
+
+from chord_table import ChordTable
 from foreign_note_detector import ForeignNoteDetector
 from key_segment import KeySegment
+from key_segment_array import KeySegmentArray
 
 class BasicKeySegmentAnnotator:
     """ Implementation of Clear Key Segment Definition 1 from thesis.
@@ -30,8 +34,16 @@ class BasicKeySegmentAnnotator:
             Used to find the index associated with the last measure in the song.
         min_key_segment_quarter_length : int
             The minimum length a key segment should be in quarter note duration.
+        chord_table : ChordTable
+            Table of the RomanText chords in `rntxt_analysis`. Pass one in to
+            share it between annotators of the same song; built from
+            `rntxt_analysis` otherwise.
         """
         self.rntxt_analysis = rntxt_analysis
+        if "chord_table" in kwargs:
+            self.chord_table = kwargs["chord_table"]
+        else:
+            self.chord_table = ChordTable(rntxt_analysis)
 
         if rntxt_analysis[0].offset != 0.0:
             print("Warning: `rntxt_analysis[0].offset` starts on {}, not 0.0".format(rntxt_analysis[0].offset))
@@ -46,11 +58,20 @@ class BasicKeySegmentAnnotator:
 
         self.foreign_note_detector = ForeignNoteDetector()
 
-    def get_key_segments(self):
+    def get_key_segments(self, modulation_key_segments=None):
         """ Get all key segments from current song that satisfy the criteria for
         Definition 1.
+
+        Parameters
+        ----------
+        modulation_key_segments : list of KeySegment
+            Output of `create_key_segments_from_annotated_modulations()`, if it
+            has already been computed for this song (e.g. by an annotator for
+            another definition). These key segments aren't modified.
         """
-        modulation_key_segments = self.create_key_segments_from_annotated_modulations()
+        if modulation_key_segments is None:
+            modulation_key_segments = self.create_key_segments_from_annotated_modulations()
+
         key_segments_wo_foreign_notes = self.foreign_note_detector.find_foreign_notes_and_split_key_segments_accordingly(modulation_key_segments)
         trimmed_key_segments = self.trim_key_segments_to_start_and_end_on_allowable_chords(key_segments_wo_foreign_notes)
         key_segments_w_V_to_I_progs = self.remove_key_segments_without_V_to_I_progression(trimmed_key_segments)
@@ -66,26 +87,23 @@ class BasicKeySegmentAnnotator:
         key segments to ensure that they meet the 4 criteria of
         Definition 1.
         """
+        key_change_chord_indices = np.flatnonzero(np.diff(self.chord_table.key_indices)) + 1
+        key_segment_start_indices = [0] + key_change_chord_indices.tolist()
+        key_segment_stop_indices = key_change_chord_indices.tolist() + [len(self.chord_table)]
+
         key_segments = []
-        for rntxt_chord_idx, rntxt_chord in enumerate(self.rntxt_analysis):
-            key_name = self.get_key_from_rntxt_chord(rntxt_chord)
-
-            if rntxt_chord_idx == 0:
-                current_key_segment = KeySegment(first_rntxt_chord=rntxt_chord,
-                                                 score_starts_on_measure_zero=self.score_starts_on_measure_zero,
-                                                 rntxt_chords_start_idx=rntxt_chord_idx)
-            elif key_name != current_key_segment.key_name:
-                current_key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(rntxt_chord)
-                current_key_segment.set_rntxt_chords(self.rntxt_analysis, rntxt_chord_idx)
-                key_segments.append(current_key_segment)
-
-                current_key_segment = KeySegment(first_rntxt_chord=rntxt_chord,
-                                                 score_starts_on_measure_zero=self.score_starts_on_measure_zero,
-                                                 rntxt_chords_start_idx=rntxt_chord_idx)
-
-        current_key_segment.set_offset_and_stop_measure_num(self.end_of_score_offset, self.last_measure_num)
-        current_key_segment.set_rntxt_chords(self.rntxt_analysis, len(self.rntxt_analysis))
-        key_segments.append(current_key_segment)
+        for start_idx, stop_idx in zip(key_segment_start_indices, key_segment_stop_indices):
+            current_key_segment = KeySegment(score_starts_on_measure_zero=self.score_starts_on_measure_zero,
+                                             rntxt_chords_start_idx=start_idx)
+            current_key_segment.initialize_key_segment_using_chord_table(self.chord_table, start_idx)
+
+            if stop_idx == len(self.chord_table):
+                current_key_segment.set_offset_and_stop_measure_num(self.end_of_score_offset, self.last_measure_num)
+            else:
+                current_key_segment.set_offset_and_stop_measure_num_w_chord_table(self.chord_table, stop_idx)
+
+            current_key_segment.set_rntxt_chords(self.chord_table, stop_idx)
+            key_segments.append(current_key_segment)
 
         return key_segments
 
@@ -126,26 +144,23 @@ class BasicKeySegmentAnnotator:
         ----------
         key_segment : KeySegment
         """
-        new_key_onset, new_start_measure_num, new_rntxt_chord_idx = None, None, None
-        for rntxt_chord_idx, rntxt_chord in enumerate(key_segment.rntxt_chords):
-            if self.check_if_rntxt_chord_is_allowable_start_chord(rntxt_chord):
-                new_key_onset = rntxt_chord.offset 
-                new_start_measure_num = rntxt_chord.measureNumber
+        allowable_start_chord_indices = np.flatnonzero(key_segment.rntxt_chords.compute_chord_mask(
+                                                            self.check_if_rntxt_chord_is_allowable_start_chord))
 
-                if self.score_starts_on_measure_zero:
-                    new_start_measure_num += 1
+        if allowable_start_chord_indices.shape[0] == 0: # check if no start chord found.
+            return None
 
-                new_rntxt_chord_idx = rntxt_chord_idx
-                break
+        new_rntxt_chord_idx = int(allowable_start_chord_indices[0])
+        new_key_onset = key_segment.rntxt_chords.get_onset(new_rntxt_chord_idx)
+        new_start_measure_num = key_segment.rntxt_chords.get_measure_num(new_rntxt_chord_idx)
 
-        if (new_key_onset is None
-            and new_start_measure_num is None): # check if no start chord found.
-            return None
-        else:
-            key_segment.adjust_onset_start_measure_num_and_rntxt_chords(new_key_onset,
-                                                                        new_start_measure_num,
-                                                                        new_rntxt_chord_idx)
-            return key_segment 
+        if self.score_starts_on_measure_zero:
+            new_start_measure_num += 1
+
+        key_segment.adjust_onset_start_measure_num_and_rntxt_chords(new_key_onset,
+                                                                    new_start_measure_num,
+                                                                    new_rntxt_chord_idx)
+        return key_segment
 
     def trim_key_segment_to_end_on_allowable_chord(self, key_segment):
         """ Trim the end time of the key segment to ensure that the
@@ -155,14 +170,15 @@ class BasicKeySegmentAnnotator:
         ----------
         key_segment : KeySegment
         """
-        for rntxt_chord_reverse_idx, rntxt_chord in enumerate(key_segment.rntxt_chords[::-1]):
-            if self.check_if_rntxt_chord_is_allowable_end_chord(rntxt_chord):
-                if rntxt_chord_reverse_idx != 0:
-                    rntxt_chord_one_ahead_stop_idx = len(key_segment.rntxt_chords) - rntxt_chord_reverse_idx
-                    rntxt_chord_one_ahead = key_segment.rntxt_chords[rntxt_chord_one_ahead_stop_idx]
-                    key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(rntxt_chord_one_ahead)
-                    key_segment.adjust_end_of_rntxt_chords(rntxt_chord_one_ahead_stop_idx)
-                break
+        allowable_end_chord_indices = np.flatnonzero(key_segment.rntxt_chords.compute_chord_mask(
+                                                          self.check_if_rntxt_chord_is_allowable_end_chord))
+
+        if allowable_end_chord_indices.shape[0] != 0:
+            rntxt_chord_one_ahead_stop_idx = int(allowable_end_chord_indices[-1]) + 1
+            if rntxt_chord_one_ahead_stop_idx != len(key_segment.rntxt_chords):
+                key_segment.set_offset_and_stop_measure_num_w_chord_table(key_segment.rntxt_chords,
+                                                                          rntxt_chord_one_ahead_stop_idx)
+                key_segment.adjust_end_of_rntxt_chords(rntxt_chord_one_ahead_stop_idx)
 
         return key_segment
 
@@ -205,16 +221,31 @@ class BasicKeySegmentAnnotator:
         """
         key_segments_w_V_to_I_progs = []
         for key_segment in key_segments:
-            V_chord_seen = False
-            for rntxt_chord in key_segment.rntxt_chords:
-                if V_chord_seen and self.check_if_rntxt_chord_is_I_chord(rntxt_chord):
-                    key_segments_w_V_to_I_progs.append(key_segment)
-                    break
-                elif self.check_if_rntxt_chord_is_V_chord(rntxt_chord):
-                    V_chord_seen = True
+            if self.check_if_key_segment_contains_progression(key_segment,
+                                                              self.check_if_rntxt_chord_is_V_chord,
+                                                              self.check_if_rntxt_chord_is_I_chord):
+                key_segments_w_V_to_I_progs.append(key_segment)
 
         return key_segments_w_V_to_I_progs
 
+    def check_if_key_segment_contains_progression(self, key_segment, check_if_rntxt_chord_is_from_chord,
+                                                  check_if_rntxt_chord_is_to_chord):
+        """ Check if a "from" chord (e.g. V) occurs in the key segment
+        before a "to" chord (e.g. I).
+
+        Parameters
+        ----------
+        key_segment : KeySegment
+        check_if_rntxt_chord_is_from_chord : callable (music21.roman.RomanNumeral -> bool)
+        check_if_rntxt_chord_is_to_chord : callable (music21.roman.RomanNumeral -> bool)
+        """
+        from_chord_indices = np.flatnonzero(key_segment.rntxt_chords.compute_chord_mask(check_if_rntxt_chord_is_from_chord))
+        to_chord_indices = np.flatnonzero(key_segment.rntxt_chords.compute_chord_mask(check_if_rntxt_chord_is_to_chord))
+
+        return (from_chord_indices.shape[0] != 0
+                and to_chord_indices.shape[0] != 0
+                and to_chord_indices[-1] > from_chord_indices[0])
+
     def check_if_rntxt_chord_is_I_chord(self, rntxt_chord):
         """ Check if the current RomanText chord is a I chord.
 
@@ -247,11 +278,7 @@ class BasicKeySegmentAnnotator:
         ---------- 
         key_segments : list of KeySegment
         """
-        min_length_key_segments = []
-        for key_segment in key_segments:
-            key_segment_quarter_length = key_segment.offset - key_segment.onset
-
-            if key_segment_quarter_length >= self.min_key_segment_quarter_length:
-                min_length_key_segments.append(key_segment)
+        key_segment_array = KeySegmentArray(key_segments)
+        min_length_mask = key_segment_array.get_quarter_lengths() >= self.min_key_segment_quarter_length
 
-        return min_length_key_segments
\ No newline at end of file
+        return key_segment_array.filter_key_segments(min_length_mask)
\ No newline at end of file
@@ -0,0 +1,199 @@
+""" Classifies RomanText chords as foreign note chords (i.e. chords
+that contain a significant non-scale note). The chord label patterns
+are compiled once, and each verdict is memoized in a bounded cache
+that is shared by every ForeignNoteDetector in the process, so that
+the same chord labels aren't re-classified for every song and every
+Clear Key Segment Definition.
+"""
+
+from collections import OrderedDict
+import re
+
+DEFAULT_MAX_CACHE_SIZE = 8192  # no. of verdicts
+
+class ChordLabelClassifier:
+    """ Classifies RomanText chords as foreign note chords (i.e. chords
+    that contain a significant non-scale note). The chord label patterns
+    are compiled once, and each verdict is memoized in a bounded cache
+    that is shared by every ForeignNoteDetector in the process, so that
+    the same chord labels aren't re-classified for every song and every
+    Clear Key Segment Definition.
+    """
+
+    def __init__(self, max_cache_size=DEFAULT_MAX_CACHE_SIZE):
+        """
+
+        Parameters
+        ----------
+        max_cache_size : int
+            Maximum number of verdicts to keep. Once exceeded, the least
+            recently used verdicts are dropped.
+        """
+        self.max_cache_size = max_cache_size
+
+        self.major_key_diatonic_triads_pattern = re.compile("(viio|vi|V|IV|iii|ii|I)(64|6/4|63|6/3|6|532|54|5)?9?(\[((add|no)[1-9])+\])*")
+        self.major_key_diatonic_seventh_chords_pattern = re.compile("(viiø|vi|V|IV|iii|ii|I)(732|742|765|7|65|6/5|43|4/3|42|4/2|2)?(M9)?(\[((add|no)[1-9])+\])*")
+        self.minor_key_diatonic_triads_pattern = re.compile("(VII|viio|#vio|VI|V|v|IV|iv|III\+|III|iio|ii|i)(64|6/4|63|6/3|6|532|54|5|4|3|2)?:?9?(\[((add|no)[1-9])+\])*")
+        self.minor_key_diatonic_seventh_chords_pattern = re.compile("(VII|viio|viiø|#viø|VI|V|v|IV|iv|III\+|III|iiø|ii|i)(732|742|765|7|6432|643|654|65|62|6/5|642|64|6|43|4/3|42|4/2|2)?(M9)?(\[((add|no)[1-9])+\])*")
+
+        self.neapolitan_chords_pattern = re.compile("(n6|N6|(b|-)II(9|7|65|64|6|42)?)")
+        self.tonicization_chord_pattern = re.compile("/[vi]+")
+
+        self.foreign_note_chord_verdicts = OrderedDict()
+
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def check_if_is_foreign_note_chord(self, rntxt_chord, allow_for_mixture=False,
+                                       allow_aug6_chords=False, allow_neapolitan_chords=False):
+        """ Check if a RomanText chord contains a significant foreign note,
+        looking up the verdict in the cache first.
+
+        Parameters
+        ----------
+        rntxt_chord : music21.roman.RomanNumeral
+        allow_for_mixture : bool
+        allow_aug6_chords : bool
+        allow_neapolitan_chords : bool
+        """
+        verdict_key = (rntxt_chord.figure, rntxt_chord.key.mode,
+                       allow_for_mixture, allow_aug6_chords, allow_neapolitan_chords)
+
+        if verdict_key in self.foreign_note_chord_verdicts:
+            self.foreign_note_chord_verdicts.move_to_end(verdict_key)
+            self.num_hits += 1
+            return self.foreign_note_chord_verdicts[verdict_key]
+
+        self.num_misses += 1
+        is_foreign_note_chord = self.classify_foreign_note_chord(rntxt_chord, allow_for_mixture,
+                                                                 allow_aug6_chords, allow_neapolitan_chords)
+
+        self.foreign_note_chord_verdicts[verdict_key] = is_foreign_note_chord
+        if len(self.foreign_note_chord_verdicts) > self.max_cache_size:
+            self.foreign_note_chord_verdicts.popitem(last=False)
+
+        return is_foreign_note_chord
+
+    def classify_foreign_note_chord(self, rntxt_chord, allow_for_mixture, allow_aug6_chords,
+                                    allow_neapolitan_chords):
+        """ Check if a RomanText chord contains a significant foreign note,
+        without using the cache. Take into account whether Neapolitan chords,
+        augmented 6th chords, and/or mixture are allowed.
+
+        Parameters
+        ----------
+        rntxt_chord : music21.roman.RomanNumeral
+        allow_for_mixture : bool
+        allow_aug6_chords : bool
+        allow_neapolitan_chords : bool
+        """
+        chord_label = rntxt_chord.figure
+        if chord_label.lower() == "cad64":
+            return False
+        elif (allow_neapolitan_chords
+              and self.check_if_is_neapolitan_chord(chord_label)):
+            return False
+        elif allow_for_mixture and rntxt_chord.isMixture():
+            return False
+        elif (allow_aug6_chords
+              and self.check_if_is_non_tonicized_augmented_6th_chord(chord_label)):
+            return False
+        elif rntxt_chord.key.mode == 'major':
+            return self.check_if_is_non_diatonic_chord_in_major_key(chord_label)
+        elif rntxt_chord.key.mode == 'minor':
+            return self.check_if_is_non_diatonic_chord_in_minor_key(chord_label)
+        else:
+            raise Exception("`rntxt_chord.key` has mode other than major or minor ({})".format(rntxt_chord.key.mode))
+
+    def check_if_chord_label_matches_pattern(self, chord_label, pattern):
+        """ Check if the first match of `pattern` in the chord label
+        is the entire chord label.
+
+        Parameters
+        ----------
+        chord_label : str
+        pattern : re.Pattern
+        """
+        pattern_search = pattern.search(chord_label)
+        if (pattern_search
+            and chord_label == pattern_search.group(0)):
+            return True
+        else:
+            return False
+
+    def check_if_is_neapolitan_chord(self, chord_label):
+        """ Check if the current chord label is a
+        Neapolitan chord.
+
+        Parameters
+        ----------
+        chord_label : str
+        """
+        return self.check_if_chord_label_matches_pattern(chord_label, self.neapolitan_chords_pattern)
+
+    def check_if_is_non_diatonic_chord_in_major_key(self, chord_label):
+        """ Check if the current chord label is considered to be a
+        non-diatonic chord in major.
+
+        Parameters
+        ----------
+        chord_label : str
+        """
+        if self.check_if_chord_label_matches_pattern(chord_label, self.major_key_diatonic_triads_pattern):
+            return False
+        elif self.check_if_chord_label_matches_pattern(chord_label, self.major_key_diatonic_seventh_chords_pattern):
+            return False
+        else:
+            return True
+
+    def check_if_is_non_diatonic_chord_in_minor_key(self, chord_label):
+        """ Check if the current chord label is considered to be a
+        non-diatonic chord in minor.
+
+        Parameters
+        ----------
+        chord_label : str
+        """
+        if self.check_if_chord_label_matches_pattern(chord_label, self.minor_key_diatonic_triads_pattern):
+            return False
+        elif self.check_if_chord_label_matches_pattern(chord_label, self.minor_key_diatonic_seventh_chords_pattern):
+            return False
+        else:
+            return True
+
+    def check_if_is_non_tonicized_augmented_6th_chord(self, chord_label):
+        """ Check if the current chord label is a non-tonicized
+        augmented 6th chord.
+
+        Parameters
+        ----------
+        chord_label : str
+        """
+        lowercase_chord_label = chord_label.lower()
+
+        if self.check_if_is_tonicization_chord(chord_label):
+            return False
+        elif ("ger" in lowercase_chord_label
+              or "fr" in lowercase_chord_label
+              or "it" in lowercase_chord_label):
+            return True
+        else:
+            return False
+
+    def check_if_is_tonicization_chord(self, chord_label):
+        """ Check if the chord label indicates a tonicization
+        (i.e. check if it contains a '/' followed by another
+        Roman Numeral chord symbol to indicate the tonicized
+        key).
+
+        Parameters
+        ----------
+        chord_label : str
+        """
+        if self.tonicization_chord_pattern.search(chord_label.lower()):
+            return True
+        else:
+            return False
+
+# Shared by all ForeignNoteDetectors in the process that aren't given their own classifier.
+shared_chord_label_classifier = ChordLabelClassifier()
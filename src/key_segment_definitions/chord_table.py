@@ -0,0 +1,215 @@
+""" Compact, array-backed table of the RomanText chords in a song.
+Built once per song from the Music21 RomanText analysis and used by
+the key segment annotators instead of the Music21 RomanNumeral objects.
+"""
+
+import numpy as np
+
+NO_INVERSION = -1  # used when Music21 can't determine the inversion of a chord
+
+class ChordTable:
+    """ Compact, array-backed table of the RomanText chords in a song.
+
+    Each chord is a row in a set of NumPy columns (onset, measure number,
+    key index, Roman numeral code, inversion, figure id). String-valued
+    columns are stored as indices into lookup lists that are shared by
+    the whole song.
+
+    Chords with the same figure in the same key are the same Music21
+    chord, so every chord-level check (e.g. "is this a I chord?") only
+    has to be evaluated once per distinct (figure, key) pair, i.e. once
+    per *chord type*. `compute_chord_mask()` does this and broadcasts the
+    result back to every row.
+
+    Slicing a ChordTable returns a view that shares the columns and the
+    lookup lists of the song's table, so no chords are copied.
+    """
+
+    def __init__(self, rntxt_analysis):
+        """
+
+        Parameters
+        ----------
+        rntxt_analysis : music21.stream.iterator.RecursiveIterator
+            RomanText chords for the entire song.
+        """
+        num_chords = len(rntxt_analysis)
+
+        self.onsets = np.empty(num_chords, dtype='float64')
+        self.measure_nums = np.empty(num_chords, dtype='int64')
+        self.key_indices = np.empty(num_chords, dtype='int64')
+        self.figure_ids = np.empty(num_chords, dtype='int64')
+        self.chord_type_ids = np.empty(num_chords, dtype='int64')
+
+        self.key_names = []
+        self.figures = []
+        self.chord_type_representatives = []
+
+        key_name_to_key_idx = {}
+        figure_to_figure_id = {}
+        chord_type_to_chord_type_id = {}
+
+        for rntxt_chord_idx, rntxt_chord in enumerate(rntxt_analysis):
+            key_name = rntxt_chord.key.tonicPitchNameWithCase
+            key_idx = self.get_or_add_lookup_idx(key_name, key_name_to_key_idx, self.key_names)
+
+            figure = rntxt_chord.figure
+            figure_id = self.get_or_add_lookup_idx(figure, figure_to_figure_id, self.figures)
+
+            chord_type = (figure_id, key_idx)
+            if chord_type not in chord_type_to_chord_type_id:
+                chord_type_to_chord_type_id[chord_type] = len(self.chord_type_representatives)
+                self.chord_type_representatives.append(rntxt_chord)
+
+            self.onsets[rntxt_chord_idx] = rntxt_chord.offset
+            self.measure_nums[rntxt_chord_idx] = rntxt_chord.measureNumber
+            self.key_indices[rntxt_chord_idx] = key_idx
+            self.figure_ids[rntxt_chord_idx] = figure_id
+            self.chord_type_ids[rntxt_chord_idx] = chord_type_to_chord_type_id[chord_type]
+
+        self.roman_numerals = []
+        roman_numeral_to_code = {}
+        chord_type_roman_numeral_codes = []
+        chord_type_inversions = []
+        for rntxt_chord in self.chord_type_representatives:
+            roman_numeral_code = self.get_or_add_lookup_idx(rntxt_chord.romanNumeralAlone,
+                                                            roman_numeral_to_code,
+                                                            self.roman_numerals)
+            chord_type_roman_numeral_codes.append(roman_numeral_code)
+            chord_type_inversions.append(self.get_inversion(rntxt_chord))
+
+        self.roman_numeral_codes = np.asarray(chord_type_roman_numeral_codes, dtype='int64')[self.chord_type_ids]
+        self.inversions = np.asarray(chord_type_inversions, dtype='int64')[self.chord_type_ids]
+
+        self.chord_type_verdicts = {}
+
+        # a view keeps track of where it starts in the song's table
+        self.song_chord_table = self
+        self.song_start_idx = 0
+
+    def get_or_add_lookup_idx(self, value, value_to_idx, lookup_list):
+        """ Get the index of `value` in `lookup_list`, appending it
+        first if it hasn't been seen yet.
+
+        Parameters
+        ----------
+        value : str
+        value_to_idx : dict { str : int }
+        lookup_list : list of str
+        """
+        if value not in value_to_idx:
+            value_to_idx[value] = len(lookup_list)
+            lookup_list.append(value)
+
+        return value_to_idx[value]
+
+    def get_inversion(self, rntxt_chord):
+        """ Get the inversion of a RomanText chord, or `NO_INVERSION`
+        if Music21 can't determine it.
+
+        Parameters
+        ----------
+        rntxt_chord : music21.roman.RomanNumeral
+        """
+        try:
+            return rntxt_chord.inversion()
+        except Exception:
+            return NO_INVERSION
+
+    def __len__(self):
+        """ Number of chords in the table.
+        """
+        return self.onsets.shape[0]
+
+    def __getitem__(self, chord_slice):
+        """ Get a view of a contiguous range of chords. The view shares
+        the columns and lookup lists of this table.
+
+        Parameters
+        ----------
+        chord_slice : slice
+        """
+        if not isinstance(chord_slice, slice) or chord_slice.step not in (None, 1):
+            raise TypeError("ChordTable only supports contiguous slicing (got {}).".format(chord_slice))
+
+        start_idx, _, _ = chord_slice.indices(len(self))
+
+        chord_table_view = object.__new__(ChordTable)
+        chord_table_view.__dict__.update(self.__dict__)
+        chord_table_view.song_start_idx = self.song_start_idx + start_idx
+
+        for column_name in ['onsets', 'measure_nums', 'key_indices', 'figure_ids',
+                            'chord_type_ids', 'roman_numeral_codes', 'inversions']:
+            setattr(chord_table_view, column_name, getattr(self, column_name)[chord_slice])
+
+        return chord_table_view
+
+    def get_onset(self, chord_idx):
+        """ Get the onset of a chord in quarter length relative to the
+        start of the score.
+
+        Parameters
+        ----------
+        chord_idx : int
+        """
+        return float(self.onsets[chord_idx])
+
+    def get_measure_num(self, chord_idx):
+        """ Get the (Music21) measure number of a chord.
+
+        Parameters
+        ----------
+        chord_idx : int
+        """
+        return int(self.measure_nums[chord_idx])
+
+    def get_key_name(self, chord_idx):
+        """ Get the annotated key of a chord, in the format of
+        `Key.tonicPitchNameWithCase`.
+
+        Parameters
+        ----------
+        chord_idx : int
+        """
+        return self.key_names[self.key_indices[chord_idx]]
+
+    def get_figure(self, chord_idx):
+        """ Get the RomanText figure (i.e. chord label) of a chord.
+
+        Parameters
+        ----------
+        chord_idx : int
+        """
+        return self.figures[self.figure_ids[chord_idx]]
+
+    def get_representative_rntxt_chord(self, chord_idx):
+        """ Get a Music21 RomanNumeral with the same figure and key as the
+        chord. Only use it for properties that don't depend on the chord's
+        position in the score (e.g. its chord tones).
+
+        Parameters
+        ----------
+        chord_idx : int
+        """
+        return self.chord_type_representatives[self.chord_type_ids[chord_idx]]
+
+    def compute_chord_mask(self, rntxt_chord_predicate):
+        """ Evaluate `rntxt_chord_predicate` for every chord in the table.
+        The predicate is only called once per chord type for the whole
+        song, and the verdicts are shared by all views of the song's table.
+
+        Parameters
+        ----------
+        rntxt_chord_predicate : callable (music21.roman.RomanNumeral -> bool)
+            Must only depend on the figure and key of the chord.
+
+        Returns
+        -------
+        chord_mask : np.ndarray (dtype='bool', shape=(no. chords,))
+        """
+        if rntxt_chord_predicate not in self.chord_type_verdicts:
+            self.chord_type_verdicts[rntxt_chord_predicate] = np.fromiter(
+                                                    (rntxt_chord_predicate(rntxt_chord) for rntxt_chord in self.chord_type_representatives),
+                                                    dtype=bool, count=len(self.chord_type_representatives))
+
+        return self.chord_type_verdicts[rntxt_chord_predicate][self.chord_type_ids]
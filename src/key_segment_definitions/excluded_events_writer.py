@@ -9,6 +9,7 @@ of key).
 import numpy as np
 
 from file_handlers import NpzFileHandler
+from key_segment_array import KeySegmentArray
 from utils import convert_camel_case_to_snake_case, \
                   key_segment_annotator_class_to_def, \
                   strip_songname_from_path
@@ -85,15 +86,41 @@ class ExcludedEventsWriter:
         key_segments : list of KeySegment
         mxl_filepath : str
         """
+        song_excluded_events = self.compute_excluded_events_for_song(key_segments, mxl_filepath)
+        self.add_excluded_events_for_song(song_excluded_events, mxl_filepath)
+
+    def compute_excluded_events_for_song(self, key_segments, mxl_filepath):
+        """ Get the excluded events of a song, i.e. 0 for each eighth note
+        beat that is part of a clear key segment and 1 for all others.
+
+        Parameters
+        ----------
+        key_segments : list of KeySegment
+        mxl_filepath : str
+
+        Returns
+        -------
+        song_excluded_events : np.ndarray (shape=(no. eighth note beats,))
+        """
         songname = strip_songname_from_path(mxl_filepath)
 
         song_excluded_events = np.ones_like(self.ground_truth_key_labels_dict[songname])
 
-        for key_segment in key_segments:
-            key_segment_onset_eighth_note_idx = self.convert_onset_to_eighth_note_beat_idx(key_segment.onset)
-            key_segment_offset_eighth_note_idx = self.convert_onset_to_eighth_note_beat_idx(key_segment.offset)
+        for key_segment_onset_eighth_note_idx, key_segment_offset_eighth_note_idx in KeySegmentArray(key_segments).get_eighth_note_beat_indices():
             song_excluded_events[key_segment_onset_eighth_note_idx:key_segment_offset_eighth_note_idx] = NO_EXCLUDED_EVENT
 
+        return song_excluded_events
+
+    def add_excluded_events_for_song(self, song_excluded_events, mxl_filepath):
+        """ Add the excluded events of a song to the dict that is
+        written to the Npz file.
+
+        Parameters
+        ----------
+        song_excluded_events : np.ndarray
+        mxl_filepath : str
+        """
+        songname = strip_songname_from_path(mxl_filepath)
         self.songs_to_excluded_events_dict[songname] = song_excluded_events
 
     def convert_onset_to_eighth_note_beat_idx(self, onset):
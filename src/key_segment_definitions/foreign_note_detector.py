@@ -6,8 +6,9 @@ occur. Takes into account whether mixture, augmented 6th
 chords, and/or Neapolitan chords are allowed. 
 """
 
-import re
+import numpy as np
 
+from chord_label_classifier import shared_chord_label_classifier
 from key_segment import KeySegment
 
 class ForeignNoteDetector:
@@ -20,7 +21,7 @@ class ForeignNoteDetector:
     """
 
     def __init__(self, allow_for_mixture=False, allow_aug6_chords=False,
-                 allow_neapolitan_chords=False):
+                 allow_neapolitan_chords=False, chord_label_classifier=None):
         """
 
         Parameters
@@ -28,17 +29,17 @@ class ForeignNoteDetector:
         allow_for_mixture : bool
         allow_aug6_chords : bool
         allow_neapolitan_chords : bool
+        chord_label_classifier : ChordLabelClassifier
+            Classifier (and verdict cache) to use. Defaults to the one
+            shared by the whole process.
         """
         self.allow_for_mixture = allow_for_mixture
         self.allow_aug6_chords = allow_aug6_chords
         self.allow_neapolitan_chords = allow_neapolitan_chords
 
-        self.major_key_diatonic_triads_regex = "(viio|vi|V|IV|iii|ii|I)(64|6/4|63|6/3|6|532|54|5)?9?(\[((add|no)[1-9])+\])*"
-        self.major_key_diatonic_seventh_chords_regex = "(viiø|vi|V|IV|iii|ii|I)(732|742|765|7|65|6/5|43|4/3|42|4/2|2)?(M9)?(\[((add|no)[1-9])+\])*"
-        self.minor_key_diatonic_triads_regex = "(VII|viio|#vio|VI|V|v|IV|iv|III\+|III|iio|ii|i)(64|6/4|63|6/3|6|532|54|5|4|3|2)?:?9?(\[((add|no)[1-9])+\])*"
-        self.minor_key_diatonic_seventh_chords_regex = "(VII|viio|viiø|#viø|VI|V|v|IV|iv|III\+|III|iiø|ii|i)(732|742|765|7|6432|643|654|65|62|6/5|642|64|6|43|4/3|42|4/2|2)?(M9)?(\[((add|no)[1-9])+\])*"
-
-        self.neapolitan_chords_regex = "(n6|N6|(b|-)II(9|7|65|64|6|42)?)"
+        if chord_label_classifier is None:
+            chord_label_classifier = shared_chord_label_classifier
+        self.chord_label_classifier = chord_label_classifier
 
     def find_foreign_notes_and_split_key_segments_accordingly(self, key_segments):
         """ Detect significant foreign notes* and break up the existing key segments into
@@ -108,20 +109,15 @@ class ForeignNoteDetector:
             27.0: <music21.roman.RomanNumeral IV6 in e minor>
             28.0: <music21.roman.RomanNumeral iv7/iv in e minor>
         """
-        non_foreign_note_chords_key_segment_ranges = []
-        key_segment_start_idx = None
-        for rntxt_chord_idx, rntxt_chord in enumerate(key_segment.rntxt_chords): 
-            if (key_segment_start_idx is not None
-                and self.check_if_rntxt_chord_is_foreign_note_chord(rntxt_chord)):
-                non_foreign_note_chords_key_segment_ranges.append((key_segment_start_idx, rntxt_chord_idx))
+        foreign_note_chords_mask = key_segment.rntxt_chords.compute_chord_mask(self.check_if_rntxt_chord_is_foreign_note_chord)
 
-                key_segment_start_idx = None
-            elif (key_segment_start_idx is None
-                  and not self.check_if_rntxt_chord_is_foreign_note_chord(rntxt_chord)):
-                key_segment_start_idx = rntxt_chord_idx
+        # a range starts where a non-foreign note chord follows a foreign note chord (or the
+        # start of the key segment) and stops at the next foreign note chord (or the end).
+        padded_non_foreign_note_chords_mask = np.concatenate(([False], ~foreign_note_chords_mask, [False]))
+        range_boundaries = np.flatnonzero(padded_non_foreign_note_chords_mask[1:] != padded_non_foreign_note_chords_mask[:-1])
 
-        if key_segment_start_idx is not None:
-            non_foreign_note_chords_key_segment_ranges.append((key_segment_start_idx, len(key_segment.rntxt_chords)))
+        non_foreign_note_chords_key_segment_ranges = list(zip(range_boundaries[0::2].tolist(),
+                                                              range_boundaries[1::2].tolist()))
 
         return non_foreign_note_chords_key_segment_ranges
 
@@ -134,23 +130,10 @@ class ForeignNoteDetector:
         ----------
         rntxt_chord : music21.roman.RomanNumeral
         """
-        chord_label = rntxt_chord.figure
-        if chord_label.lower() == "cad64":
-            return False
-        elif (self.allow_neapolitan_chords
-              and self.check_if_is_neapolitan_chord(chord_label)):
-            return False
-        elif self.allow_for_mixture and rntxt_chord.isMixture():
-            return False
-        elif (self.allow_aug6_chords
-              and self.check_if_is_non_tonicized_augmented_6th_chord(chord_label)):
-            return False
-        elif rntxt_chord.key.mode == 'major':
-            return self.check_if_is_non_diatonic_chord_in_major_key(chord_label)
-        elif rntxt_chord.key.mode == 'minor':
-            return self.check_if_is_non_diatonic_chord_in_minor_key(chord_label)
-        else:
-            raise Exception("`rntxt_chord.key` has mode other than major or minor ({})".format(rntxt_chord.key.mode))
+        return self.chord_label_classifier.check_if_is_foreign_note_chord(rntxt_chord,
+                                                                          allow_for_mixture=self.allow_for_mixture,
+                                                                          allow_aug6_chords=self.allow_aug6_chords,
+                                                                          allow_neapolitan_chords=self.allow_neapolitan_chords)
 
     def check_if_is_neapolitan_chord(self, chord_label):
         """ Check if the current chord label is a
@@ -160,12 +143,7 @@ class ForeignNoteDetector:
         ----------
         chord_label : str
         """
-        neapolitan_chord_search = re.search(self.neapolitan_chords_regex, chord_label)
-        if (neapolitan_chord_search
-            and chord_label == neapolitan_chord_search.group(0)):
-            return True
-        else:
-            return False
+        return self.chord_label_classifier.check_if_is_neapolitan_chord(chord_label)
 
     def check_if_is_non_diatonic_chord_in_major_key(self, chord_label):
         """ Check if the current chord label is considered to be a
@@ -175,16 +153,7 @@ class ForeignNoteDetector:
         ----------
         chord_label : str
         """
-        major_key_diatonic_triad_search = re.search(self.major_key_diatonic_triads_regex, chord_label)
-        major_key_diatonic_seventh_chord_search = re.search(self.major_key_diatonic_seventh_chords_regex, chord_label)
-        if (major_key_diatonic_triad_search
-            and chord_label == major_key_diatonic_triad_search.group(0)):
-            return False
-        elif (major_key_diatonic_seventh_chord_search
-              and chord_label == major_key_diatonic_seventh_chord_search.group(0)):
-            return False
-        else:
-            return True 
+        return self.chord_label_classifier.check_if_is_non_diatonic_chord_in_major_key(chord_label)
 
     def check_if_is_non_tonicized_augmented_6th_chord(self, chord_label):
         """ Check if the current chord label is a non-tonicized
@@ -194,16 +163,7 @@ class ForeignNoteDetector:
         ----------
         chord_label : str
         """
-        lowercase_chord_label = chord_label.lower()
-
-        if self.check_if_is_tonicization_chord(chord_label):
-            return False
-        elif ("ger" in lowercase_chord_label
-              or "fr" in lowercase_chord_label
-              or "it" in lowercase_chord_label):
-            return True
-        else:
-            return False
+        return self.chord_label_classifier.check_if_is_non_tonicized_augmented_6th_chord(chord_label)
 
     def check_if_is_tonicization_chord(self, chord_label):
         """ Check if the chord label indicates a tonicization
@@ -215,11 +175,7 @@ class ForeignNoteDetector:
         ----------
         chord_label : str
         """
-        tonicization_chord_search = re.search("/[vi]+", chord_label.lower())
-        if tonicization_chord_search:
-            return True
-        else:
-            return False
+        return self.chord_label_classifier.check_if_is_tonicization_chord(chord_label)
 
     def check_if_is_non_diatonic_chord_in_minor_key(self, chord_label):
         """ Check if the current chord label is considered to be a
@@ -229,16 +185,7 @@ class ForeignNoteDetector:
         ----------
         chord_label : str
         """
-        minor_key_diatonic_triad_search = re.search(self.minor_key_diatonic_triads_regex, chord_label)
-        minor_key_diatonic_seventh_chord_search = re.search(self.minor_key_diatonic_seventh_chords_regex, chord_label)
-        if (minor_key_diatonic_triad_search
-            and chord_label == minor_key_diatonic_triad_search.group(0)):
-            return False
-        elif (minor_key_diatonic_seventh_chord_search
-              and chord_label == minor_key_diatonic_seventh_chord_search.group(0)):
-            return False
-        else:
-            return True 
+        return self.chord_label_classifier.check_if_is_non_diatonic_chord_in_minor_key(chord_label)
 
     def split_key_segment_based_on_non_foreign_note_chord_ranges(self, key_segment, split_key_segments,  
                                                                  non_foreign_note_chords_key_segment_ranges):
@@ -257,14 +204,14 @@ class ForeignNoteDetector:
             `end_rntxt_chord_idx` is exclusive.
         """
         for (start_idx, end_idx) in non_foreign_note_chords_key_segment_ranges:
-            split_key_segment = KeySegment(first_rntxt_chord=key_segment.rntxt_chords[start_idx],
-                                           score_starts_on_measure_zero=key_segment.score_starts_on_measure_zero)
+            split_key_segment = KeySegment(score_starts_on_measure_zero=key_segment.score_starts_on_measure_zero)
+            split_key_segment.initialize_key_segment_using_chord_table(key_segment.rntxt_chords, start_idx)
 
             if end_idx == len(key_segment.rntxt_chords):
                 split_key_segment.set_offset_and_stop_measure_num(key_segment.offset,
                                                                   key_segment.stop_measure_num)
             else:
-                split_key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(key_segment.rntxt_chords[end_idx])
+                split_key_segment.set_offset_and_stop_measure_num_w_chord_table(key_segment.rntxt_chords, end_idx)
 
             split_key_segment.set_rntxt_chords(key_segment_rntxt_chords=key_segment.rntxt_chords[start_idx:end_idx])
             split_key_segments.append(split_key_segment)
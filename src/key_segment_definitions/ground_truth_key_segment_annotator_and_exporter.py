@@ -14,10 +14,13 @@ from key_segment_indices_writer import KeySegmentIndicesWriter
 from measure_onset_finder import MeasureOnsetFinder
 from mixture_key_segment_annotator import MixtureKeySegmentAnnotator
 from neapolitan_chords_key_segment_annotator import NeapolitanChordsKeySegmentAnnotator
+from parallel_song_annotator import ParallelSongAnnotator
+from parsed_score_cache import DEFAULT_CACHE_DIR, ParsedScoreCache
 from relaxed_key_segment_annotator import RelaxedKeySegmentAnnotator
 from strict_key_segment_annotator import StrictKeySegmentAnnotator
 from tonicization_key_segment_annotator import TonicizationKeySegmentAnnotator
-from utils import load_filepaths_from_txt_file, load_mxl_file_w_m21, load_rntxt_file_w_m21
+from utils import load_filepaths_from_txt_file, load_mxl_file_w_m21, load_rntxt_file_w_m21, \
+                  strip_songname_from_path
 
 class GroundTruthKeySegmentAnnotatorAndExporter:
     """ Extract clear key segments from specified songs in Micchi, et al.'s
@@ -27,7 +30,8 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
 
     def __init__(self, txt_file_with_mxl_filepaths, key_segment_annotator_class,
                  min_key_segment_quarter_length, output_method,
-                 ground_truth_key_labels_npz_path=None, allow_root_position_viio_chords=False):
+                 ground_truth_key_labels_npz_path=None, allow_root_position_viio_chords=False,
+                 parsed_score_cache_dir=DEFAULT_CACHE_DIR, num_workers=1):
         """
 
         Parameters
@@ -38,6 +42,11 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
         output_method : str
         ground_truth_key_labels_npz_path : str
         allow_root_position_viio_chords : bool
+        parsed_score_cache_dir : str
+            If None, the MusicXML and RomanText files are always parsed
+            from source.
+        num_workers : int
+            Number of worker processes to annotate the songs with.
         """
         self.mxl_filepaths = load_filepaths_from_txt_file(txt_file_with_mxl_filepaths)
         self.rntxt_filepaths = self.convert_mxl_filepaths_to_rntxt_filepaths(self.mxl_filepaths)
@@ -49,6 +58,10 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
 
         self.output_method = output_method
 
+        self.parsed_score_cache = ParsedScoreCache(parsed_score_cache_dir) if parsed_score_cache_dir else None
+
+        self.parallel_song_annotator = ParallelSongAnnotator(num_workers)
+
         if self.output_method == "output_events_to_exclude":
             self.excluded_events_writer = ExcludedEventsWriter(key_segment_annotator_class,
                                                                ground_truth_key_labels_npz_path,
@@ -76,19 +89,42 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
     def annotate_and_export_key_segments_for_all_songs(self):
         """ Extract and export key segments for all specified songs.
         """
-        for mxl_filepath, rntxt_filepath in zip(self.mxl_filepaths, self.rntxt_filepaths):
-            #print("mxl file:", mxl_filepath.split('/')[-1], "rntxt file:", rntxt_filepath.split('/')[-1])
+        songnames = [strip_songname_from_path(mxl_filepath) for mxl_filepath in self.mxl_filepaths]
+        song_outputs = self.parallel_song_annotator.annotate_songs(self, songnames)
 
-            parsed_mxl = load_mxl_file_w_m21(mxl_filepath)
-            rntxt_analysis = load_rntxt_file_w_m21(rntxt_filepath)
+        # merged in song order, so the Npz file is the same for any number of workers
+        for mxl_filepath, song_output in zip(self.mxl_filepaths, song_outputs):
+            if song_output is None:
+                continue
 
-            self.annotate_and_export_key_segments_for_song(mxl_filepath, parsed_mxl, rntxt_analysis)
+            if self.output_method == "output_events_to_exclude":
+                self.excluded_events_writer.add_excluded_events_for_song(song_output, mxl_filepath)
+            elif self.output_method == "output_key_segment_indices":
+                self.key_segment_indices_writer.add_key_segment_indices_for_song(song_output, mxl_filepath)
 
         if self.output_method == "output_events_to_exclude":
             self.excluded_events_writer.write_songs_to_excluded_events_dict_to_npz_file()
         elif self.output_method == "output_key_segment_indices":
             self.key_segment_indices_writer.write_songs_to_key_segment_indices_dict_to_npz_file()
 
+    def annotate_and_export_key_segments_for_song_idx(self, song_idx):
+        """ Load a single song and extract and export its key segments.
+        Called by `self.parallel_song_annotator`, possibly in a worker
+        process.
+
+        Parameters
+        ----------
+        song_idx : int
+            Index of the song in `self.mxl_filepaths`.
+        """
+        mxl_filepath, rntxt_filepath = self.mxl_filepaths[song_idx], self.rntxt_filepaths[song_idx]
+        #print("mxl file:", mxl_filepath.split('/')[-1], "rntxt file:", rntxt_filepath.split('/')[-1])
+
+        parsed_mxl = load_mxl_file_w_m21(mxl_filepath, self.parsed_score_cache)
+        rntxt_analysis = load_rntxt_file_w_m21(rntxt_filepath, self.parsed_score_cache)
+
+        return self.annotate_and_export_key_segments_for_song(mxl_filepath, parsed_mxl, rntxt_analysis)
+
     def annotate_and_export_key_segments_for_song(self, mxl_filepath, parsed_mxl, rntxt_analysis):
         """ Extract and export key segments for a single song.
 
@@ -97,6 +133,13 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
         mxl_filepath : str
         parsed_mxl : music21.stream.Score
         rntxt_analysis : music21.stream.iterator.RecursiveIterator
+
+        Returns
+        -------
+        song_output : np.ndarray
+            The song's excluded events or key segment indices, depending
+            on `self.output_method`. None if the key segments were
+            exported to MusicXML files.
         """
         measure_onset_finder = MeasureOnsetFinder(parsed_mxl)
 
@@ -111,9 +154,11 @@ class GroundTruthKeySegmentAnnotatorAndExporter:
             song_key_segment_exporter = KeySegmentExporter(parsed_mxl, measure_onset_finder, mxl_filepath)
             song_key_segment_exporter.extract_and_export_key_segments_to_mxl_files(key_segments)
         elif self.output_method == "output_events_to_exclude":
-            self.excluded_events_writer.get_excluded_events_for_song(key_segments, mxl_filepath)
+            return self.excluded_events_writer.compute_excluded_events_for_song(key_segments, mxl_filepath)
         elif self.output_method == "output_key_segment_indices":
-            self.key_segment_indices_writer.get_key_segment_indices_for_song(key_segments, mxl_filepath)
+            return self.key_segment_indices_writer.compute_key_segment_indices_for_song(key_segments)
+
+        return None
 
 def get_commandline_args():
     """ Get commandline arguments from user.
@@ -169,6 +214,18 @@ def get_commandline_args():
                         help='Only relevant when `output_events_to_exclude` '
                              'option is chosen for `--key_segments_output_method`.')
 
+    parser.add_argument('--parsed_score_cache_dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Directory used to cache the parsed MusicXML and '
+                             'RomanText files between runs.')
+    parser.add_argument('--no_parsed_score_cache', action='store_true',
+                        help='Always parse the MusicXML and RomanText files from '
+                             'source instead of using `--parsed_score_cache_dir`.')
+
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to annotate the songs '
+                             'with. Songs are annotated one at a time in the '
+                             'current process if 1.')
+
     commandline_args = parser.parse_args()
 
     return commandline_args
@@ -187,10 +244,16 @@ if __name__ == '__main__':
 
     ground_truth_key_labels_npz_path = args.ground_truth_key_labels_npz_path
 
+    parsed_score_cache_dir = None if args.no_parsed_score_cache else args.parsed_score_cache_dir
+
+    num_workers = args.workers
+
     key_segment_annotator_and_exporter = GroundTruthKeySegmentAnnotatorAndExporter(txt_file_with_mxl_filepaths,
                                                                                    key_segment_annotator_class,
                                                                                    min_key_segment_quarter_length,
                                                                                    output_method,
                                                                                    ground_truth_key_labels_npz_path,
-                                                                                   allow_root_position_viio_chords)
+                                                                                   allow_root_position_viio_chords,
+                                                                                   parsed_score_cache_dir,
+                                                                                   num_workers)
     key_segment_annotator_and_exporter.annotate_and_export_key_segments_for_all_songs()
\ No newline at end of file
@@ -1,12 +1,23 @@
 """ Contains the class to represent a clear key segment object.
 """
 
+from chord_table import ChordTable
+
 ROUNDING_VALUE = 5  # used to round the onset and offset times of a key segment
 
 class KeySegment:
     """ Class to represent a clear key segment object.
+
+    The RomanText chords of the key segment aren't stored directly. Instead,
+    the key segment keeps a reference to the chords of the whole song plus
+    a [start, stop) index range into them, so trimming or splitting a key
+    segment only updates integers.
     """
 
+    __slots__ = ['key_name', 'onset', 'offset', 'start_measure_num', 'stop_measure_num',
+                 'song_rntxt_chords', 'rntxt_chords_start_idx', 'rntxt_chords_stop_idx',
+                 'score_starts_on_measure_zero']
+
     def __init__(self, key_name=None, onset=-1.0, offset=-1.0, start_measure_num=-1,
                  stop_measure_num=-1, rntxt_chords_start_idx=-1, rntxt_chords=[],
                  score_starts_on_measure_zero=False, first_rntxt_chord=None):
@@ -28,10 +39,12 @@ class KeySegment:
             The index of the stop measure of the key segment. Inclusive.
         rntxt_chords_start_idx : int
             Index of the first RomanText chord in the key segment. Index relative to
-            the `rntxt_chords` list.
-        rntxt_chords : list of music21.roman.RomanNumeral
-            List of RomanText chords that comprise the key segment. May 
-            be an empty list until `KeySegment.set_rntxt_chords()` is called.
+            the RomanText chords of the whole song.
+        rntxt_chords : ChordTable or list of music21.roman.RomanNumeral
+            RomanText chords that comprise the key segment. May be an empty
+            list until `KeySegment.set_rntxt_chords()` is called. If a ChordTable
+            view is given, the key segment refers to the song's ChordTable that
+            the view was sliced from.
         score_starts_on_measure_zero : bool
             True if first measure in Music21 has index 0 instead of index 1. If true,
             `start_measure_num` and `stop_measure_num` are shifted one to the right.
@@ -47,8 +60,12 @@ class KeySegment:
         self.start_measure_num = start_measure_num
         self.stop_measure_num = stop_measure_num 
 
+        self.song_rntxt_chords = None
         self.rntxt_chords_start_idx = rntxt_chords_start_idx
-        self.rntxt_chords = rntxt_chords 
+        self.rntxt_chords_stop_idx = -1
+
+        if isinstance(rntxt_chords, ChordTable) or len(rntxt_chords) > 0:
+            self.set_rntxt_chords(key_segment_rntxt_chords=rntxt_chords)
 
         self.score_starts_on_measure_zero = score_starts_on_measure_zero
         
@@ -71,6 +88,23 @@ class KeySegment:
         self.onset = first_rntxt_chord.offset
         self.start_measure_num = first_rntxt_chord.measureNumber
 
+    def initialize_key_segment_using_chord_table(self, chord_table, first_chord_idx):
+        """ Initialize the key name, the key segment onset time, and the
+        start measure number of a KeySegment object using the first
+        chord of the key segment in a ChordTable.
+
+        Parameters
+        ----------
+        chord_table : ChordTable
+        first_chord_idx : int
+        """
+        self.key_name = chord_table.get_key_name(first_chord_idx)
+        self.onset = chord_table.get_onset(first_chord_idx)
+        self.start_measure_num = chord_table.get_measure_num(first_chord_idx)
+
+        if self.score_starts_on_measure_zero:
+            self.start_measure_num += 1
+
     def adjust_start_and_stop_measure_nums_if_score_starts_on_measure_zero(self):
         """ Shift the start and stop measure numbers by 1, unless their value
         is -1 (meaning the measure numbers are unset).
@@ -91,10 +125,11 @@ class KeySegment:
         onset : float
         start_measure_num : int
         new_rntxt_chords_start_idx : int
+            Index relative to the current RomanText chords of the key segment.
         """
         self.onset = onset
         self.start_measure_num = start_measure_num
-        self.rntxt_chords = self.rntxt_chords[new_rntxt_chords_start_idx:]
+        self.rntxt_chords_start_idx += new_rntxt_chords_start_idx
 
     def set_offset_and_stop_measure_num(self, offset, stop_measure_num):
         """ Set the offset time and the stop measure number for
@@ -123,6 +158,32 @@ class KeySegment:
         if self.score_starts_on_measure_zero:
             self.stop_measure_num += 1
 
+    def set_offset_and_stop_measure_num_w_chord_table(self, chord_table, chord_after_stop_chord_idx):
+        """ Set the offset time and the stop measure number for
+        an existing KeySegment object using the chord in `chord_table`
+        that occurs immediately after the object in the song.
+
+        Parameters
+        ----------
+        chord_table : ChordTable
+        chord_after_stop_chord_idx : int
+        """
+        self.offset = chord_table.get_onset(chord_after_stop_chord_idx)
+        self.stop_measure_num = chord_table.get_measure_num(chord_after_stop_chord_idx)
+
+        if self.score_starts_on_measure_zero:
+            self.stop_measure_num += 1
+
+    @property
+    def rntxt_chords(self):
+        """ RomanText chords that comprise the key segment, as a view of
+        the song's chords (or an empty list if they haven't been set yet).
+        """
+        if self.song_rntxt_chords is None:
+            return []
+
+        return self.song_rntxt_chords[self.rntxt_chords_start_idx:self.rntxt_chords_stop_idx]
+
     def set_rntxt_chords(self, song_rntxt_chords=None, rntxt_chords_stop_idx=None,
                          key_segment_rntxt_chords=None):
         """ Set the list of RomanText chords that the key segment is
@@ -133,18 +194,29 @@ class KeySegment:
 
         Parameters
         ----------
-        song_rntxt_chords : list of music21.roman.RomanNumeral
+        song_rntxt_chords : ChordTable or list of music21.roman.RomanNumeral
         rntxt_chords_stop_idx : int
             Exclusive.
-        key_segment_rntxt_chords : list of music21.roman.RomanNumeral
+        key_segment_rntxt_chords : ChordTable or list of music21.roman.RomanNumeral
+            If a ChordTable view, the key segment refers to the song's
+            ChordTable instead of the view.
         """
         if song_rntxt_chords is not None:
             if self.rntxt_chords_start_idx == -1:
                 raise Exception("Before calling `set_rntxt_chords()`, `self.rntxt_chords_start_idx` should have a positive value (current value: {}).".format(self.rntxt_chords_start_idx))
 
-            self.rntxt_chords = song_rntxt_chords[self.rntxt_chords_start_idx:rntxt_chords_stop_idx]
+            self.song_rntxt_chords = song_rntxt_chords
+            if rntxt_chords_stop_idx is None:
+                rntxt_chords_stop_idx = len(song_rntxt_chords)
+            self.rntxt_chords_stop_idx = rntxt_chords_stop_idx
+        elif isinstance(key_segment_rntxt_chords, ChordTable):
+            self.song_rntxt_chords = key_segment_rntxt_chords.song_chord_table
+            self.rntxt_chords_start_idx = key_segment_rntxt_chords.song_start_idx
+            self.rntxt_chords_stop_idx = key_segment_rntxt_chords.song_start_idx + len(key_segment_rntxt_chords)
         elif key_segment_rntxt_chords is not None:
-            self.rntxt_chords = key_segment_rntxt_chords
+            self.song_rntxt_chords = key_segment_rntxt_chords
+            self.rntxt_chords_start_idx = 0
+            self.rntxt_chords_stop_idx = len(key_segment_rntxt_chords)
 
     def adjust_end_of_rntxt_chords(self, new_rntxt_chords_stop_idx):
         """ Cut off some of the RomanText chords at the end of the key
@@ -153,8 +225,10 @@ class KeySegment:
         Parameters
         ----------
         new_rntxt_chords_stop_idx : int
+            Index relative to the current RomanText chords of the key segment.
         """
-        self.rntxt_chords = self.rntxt_chords[:new_rntxt_chords_stop_idx]
+        self.rntxt_chords_stop_idx = min(self.rntxt_chords_start_idx + new_rntxt_chords_stop_idx,
+                                         self.rntxt_chords_stop_idx)
 
     def __repr__(self):
         """ String representation of KeySegment object.
@@ -0,0 +1,75 @@
+""" Array of the key segments of a song, used for bulk operations on
+their onsets and offsets (e.g. filtering by length or converting to
+eighth note beat indices) without looping over the KeySegment objects.
+"""
+
+import numpy as np
+
+class KeySegmentArray:
+    """ Array of the key segments of a song, used for bulk operations on
+    their onsets and offsets (e.g. filtering by length or converting to
+    eighth note beat indices) without looping over the KeySegment objects.
+    """
+
+    def __init__(self, key_segments):
+        """
+
+        Parameters
+        ----------
+        key_segments : list of KeySegment
+        """
+        self.key_segments = list(key_segments)
+
+        self.onsets = np.fromiter((key_segment.onset for key_segment in self.key_segments),
+                                  dtype='float64', count=len(self.key_segments))
+        self.offsets = np.fromiter((key_segment.offset for key_segment in self.key_segments),
+                                   dtype='float64', count=len(self.key_segments))
+
+    def __len__(self):
+        """ Number of key segments in the array.
+        """
+        return len(self.key_segments)
+
+    def __getitem__(self, key_segment_idx):
+        """ Get a single key segment.
+
+        Parameters
+        ----------
+        key_segment_idx : int
+        """
+        return self.key_segments[key_segment_idx]
+
+    def get_quarter_lengths(self):
+        """ Get the length of each key segment in quarter note duration.
+        """
+        return self.offsets - self.onsets
+
+    def filter_key_segments(self, key_segment_mask):
+        """ Get the key segments for which `key_segment_mask` is true.
+
+        Parameters
+        ----------
+        key_segment_mask : np.ndarray (dtype='bool', shape=(no. key segments,))
+
+        Returns
+        -------
+        key_segments : list of KeySegment
+        """
+        return [self.key_segments[key_segment_idx] for key_segment_idx in np.flatnonzero(key_segment_mask)]
+
+    def get_eighth_note_beat_indices(self):
+        """ Get the eighth note beat index start time and end time of
+        each key segment.
+
+        Returns
+        -------
+        key_segment_indices : np.ndarray (shape=(no. key segments, 2))
+            Empty float array (shape=(0,)) if there are no key segments.
+        """
+        if len(self.key_segments) == 0:
+            return np.asarray([])
+
+        onset_eighth_note_indices = (self.onsets // 0.5).astype('int64')
+        offset_eighth_note_indices = (self.offsets // 0.5).astype('int64')
+
+        return np.stack([onset_eighth_note_indices, offset_eighth_note_indices], axis=1)
@@ -4,9 +4,8 @@ the start and stop time of each key segment (NOTE: stop
 index is exclusive).
 """
 
-import numpy as np
-
 from file_handlers import NpzFileHandler
+from key_segment_array import KeySegmentArray
 from utils import convert_camel_case_to_snake_case, \
                   key_segment_annotator_class_to_def, \
                   strip_songname_from_path
@@ -19,7 +18,8 @@ class KeySegmentIndicesWriter:
     """
 
     def __init__(self, key_segment_annotator_class, micchi_predictions=False,
-                 allow_root_position_viio_chords=False, thresholded=False):
+                 allow_root_position_viio_chords=False, thresholded=False,
+                 output_definition_name=None):
         """
 
         Parameters
@@ -31,6 +31,10 @@ class KeySegmentIndicesWriter:
             used to create the clear key segments.
         allow_root_position_viio_chords : bool
         thresholded : bool
+        output_definition_name : str
+            Clear Key Segment Definition name to put in the outputted Npz
+            filename (e.g. `def3v1`). If None, it is derived from
+            `key_segment_annotator_class` and `allow_root_position_viio_chords`.
         """
         self.songs_to_key_segment_indices_dict = {}
 
@@ -40,10 +44,12 @@ class KeySegmentIndicesWriter:
         self.output_npz_filename = self.get_output_npz_filename(key_segment_annotator_class,
                                                                 micchi_predictions,
                                                                 allow_root_position_viio_chords,
-                                                                thresholded)
+                                                                thresholded,
+                                                                output_definition_name)
 
     def get_output_npz_filename(self, key_segment_annotator_class, micchi_predictions,
-                                allow_root_position_viio_chords, thresholded=False):
+                                allow_root_position_viio_chords, thresholded=False,
+                                output_definition_name=None):
         """ Get the name of the outputted Npz file.
 
         Parameters
@@ -52,6 +58,7 @@ class KeySegmentIndicesWriter:
         micchi_predictions : bool
         allow_root_position_viio_chords : bool
         thresholded : bool
+        output_definition_name : str
         """
         output_npz_filename = "out/meta-corpus_validation_"
 
@@ -64,10 +71,13 @@ class KeySegmentIndicesWriter:
 
         output_npz_filename += "key_segment_boundaries_"
 
-        output_npz_filename += key_segment_annotator_class_to_def[key_segment_annotator_class]
+        if output_definition_name is not None:
+            output_npz_filename += output_definition_name
+        else:
+            output_npz_filename += key_segment_annotator_class_to_def[key_segment_annotator_class]
 
-        if allow_root_position_viio_chords:
-            output_npz_filename += "v2"
+            if allow_root_position_viio_chords:
+                output_npz_filename += "v2"
 
         output_npz_filename += ".npz"
 
@@ -82,16 +92,34 @@ class KeySegmentIndicesWriter:
         key_segments : list of KeySegment
         mxl_filepath : str
         """
-        songname = strip_songname_from_path(mxl_filepath)
+        song_key_segment_indices = self.compute_key_segment_indices_for_song(key_segments)
+        self.add_key_segment_indices_for_song(song_key_segment_indices, mxl_filepath)
+
+    def compute_key_segment_indices_for_song(self, key_segments):
+        """ Get the eighth note beat index start time and end time of
+        each clear key segment in a song.
+
+        Parameters
+        ----------
+        key_segments : list of KeySegment
 
-        song_key_segment_indices = []
+        Returns
+        -------
+        song_key_segment_indices : np.ndarray (shape=(no. key segments, 2))
+        """
+        return KeySegmentArray(key_segments).get_eighth_note_beat_indices()
 
-        for key_segment in key_segments:
-            key_segment_onset_eighth_note_idx = self.convert_onset_to_eighth_note_beat_idx(key_segment.onset)
-            key_segment_offset_eighth_note_idx = self.convert_onset_to_eighth_note_beat_idx(key_segment.offset)
-            song_key_segment_indices.append((key_segment_onset_eighth_note_idx, key_segment_offset_eighth_note_idx))
+    def add_key_segment_indices_for_song(self, song_key_segment_indices, mxl_filepath):
+        """ Add the key segment indices of a song to the dict that
+        is written to the Npz file.
 
-        self.songs_to_key_segment_indices_dict[songname] = np.asarray(song_key_segment_indices)
+        Parameters
+        ----------
+        song_key_segment_indices : np.ndarray
+        mxl_filepath : str
+        """
+        songname = strip_songname_from_path(mxl_filepath)
+        self.songs_to_key_segment_indices_dict[songname] = song_key_segment_indices
 
     def convert_onset_to_eighth_note_beat_idx(self, onset):
         """ Convert onset in quarters to eighth note beat index.
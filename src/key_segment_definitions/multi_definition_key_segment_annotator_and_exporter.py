@@ -0,0 +1,243 @@
+""" Extract clear key segments for several Clear Key Segment Definitions
+at once from specified songs in Micchi, et al.'s Meta-Corpus. Each song
+is parsed once and its annotated modulations are only split up once,
+then shared by every requested definition. Outputs one key segment
+boundaries Npz file per definition.
+"""
+
+from argparse import ArgumentParser
+
+from augmented_6th_key_segment_annotator import Augmented6thKeySegmentAnnotator
+from basic_key_segment_annotator import BasicKeySegmentAnnotator
+from chord_table import ChordTable
+from chromatic_key_segment_annotator import ChromaticKeySegmentAnnotator
+from key_segment_indices_writer import KeySegmentIndicesWriter
+from measure_onset_finder import MeasureOnsetFinder
+from mixture_key_segment_annotator import MixtureKeySegmentAnnotator
+from neapolitan_chords_key_segment_annotator import NeapolitanChordsKeySegmentAnnotator
+from parallel_song_annotator import ParallelSongAnnotator
+from parsed_score_cache import DEFAULT_CACHE_DIR, ParsedScoreCache
+from relaxed_key_segment_annotator import RelaxedKeySegmentAnnotator
+from strict_key_segment_annotator import StrictKeySegmentAnnotator
+from tonicization_key_segment_annotator import TonicizationKeySegmentAnnotator
+from utils import load_filepaths_from_txt_file, load_mxl_file_w_m21, load_rntxt_file_w_m21, \
+                  strip_songname_from_path
+
+# Clear Key Segment Definition name -> (key segment annotator class, allow root position viio chords)
+key_segment_definitions = {'def1': ('BasicKeySegmentAnnotator', False),
+                           'def2': ('StrictKeySegmentAnnotator', False),
+                           'def3v1': ('RelaxedKeySegmentAnnotator', False),
+                           'def3v2': ('RelaxedKeySegmentAnnotator', True),
+                           'def4v2': ('ChromaticKeySegmentAnnotator', True),
+                           'def5v2': ('MixtureKeySegmentAnnotator', True),
+                           'def6v2': ('NeapolitanChordsKeySegmentAnnotator', True),
+                           'def7v2': ('Augmented6thKeySegmentAnnotator', True),
+                           'def8': ('TonicizationKeySegmentAnnotator', False)}
+
+class MultiDefinitionKeySegmentAnnotatorAndExporter:
+    """ Extract clear key segments for several Clear Key Segment Definitions
+    at once from specified songs in Micchi, et al.'s Meta-Corpus. Each song
+    is parsed once and its annotated modulations are only split up once,
+    then shared by every requested definition. Outputs one key segment
+    boundaries Npz file per definition.
+    """
+
+    def __init__(self, txt_file_with_mxl_filepaths, key_segment_definition_names,
+                 min_key_segment_quarter_length, predicted_rntxt_filepaths_dir=None,
+                 parsed_score_cache_dir=DEFAULT_CACHE_DIR, num_workers=1):
+        """
+
+        Parameters
+        ----------
+        txt_file_with_mxl_filepaths : str
+        key_segment_definition_names : list of str
+            Keys of `key_segment_definitions`.
+        min_key_segment_quarter_length : int
+        predicted_rntxt_filepaths_dir : str
+            If given, the key segments are extracted from the Frog model's
+            predicted RomanText files in this directory. Otherwise, the
+            ground truth RomanText files from the Meta-Corpus are used.
+        parsed_score_cache_dir : str
+            If None, the MusicXML and RomanText files are always parsed
+            from source.
+        num_workers : int
+            Number of worker processes to annotate the songs with.
+        """
+        self.mxl_filepaths = load_filepaths_from_txt_file(txt_file_with_mxl_filepaths)
+        self.rntxt_filepaths = self.convert_mxl_filepaths_to_rntxt_filepaths(self.mxl_filepaths,
+                                                                             predicted_rntxt_filepaths_dir)
+
+        self.key_segment_definition_names = key_segment_definition_names
+        self.min_key_segment_quarter_length = min_key_segment_quarter_length
+
+        self.parsed_score_cache = ParsedScoreCache(parsed_score_cache_dir) if parsed_score_cache_dir else None
+
+        self.parallel_song_annotator = ParallelSongAnnotator(num_workers)
+
+        self.key_segment_indices_writers = {}
+        for key_segment_definition_name in self.key_segment_definition_names:
+            key_segment_annotator_class, allow_root_position_viio_chords = key_segment_definitions[key_segment_definition_name]
+            self.key_segment_indices_writers[key_segment_definition_name] = KeySegmentIndicesWriter(key_segment_annotator_class,
+                                                                                                   micchi_predictions=predicted_rntxt_filepaths_dir is not None,
+                                                                                                   allow_root_position_viio_chords=allow_root_position_viio_chords,
+                                                                                                   output_definition_name=key_segment_definition_name)
+
+    def convert_mxl_filepaths_to_rntxt_filepaths(self, mxl_filepaths, predicted_rntxt_filepaths_dir):
+        """ Get path to RomanText file for each song.
+
+        Parameters
+        ----------
+        mxl_filepaths : list of str
+        predicted_rntxt_filepaths_dir : str
+        """
+        rntxt_filepaths = []
+        for mxl_filepath in mxl_filepaths:
+            if predicted_rntxt_filepaths_dir is not None:
+                songname = strip_songname_from_path(mxl_filepath)
+                rntxt_filepath = predicted_rntxt_filepaths_dir + songname + '.rntxt'
+            else:
+                rntxt_filepath = mxl_filepath.replace('scores', 'txt')
+                rntxt_filepath = rntxt_filepath.replace('mxl', 'txt')
+            rntxt_filepaths.append(rntxt_filepath)
+
+        return rntxt_filepaths
+
+    def annotate_and_export_key_segments_for_all_songs(self):
+        """ Extract and export key segments for all specified songs
+        and definitions.
+        """
+        songnames = [strip_songname_from_path(mxl_filepath) for mxl_filepath in self.mxl_filepaths]
+        song_outputs = self.parallel_song_annotator.annotate_songs(self, songnames)
+
+        for mxl_filepath, definitions_to_song_key_segment_indices in zip(self.mxl_filepaths, song_outputs):
+            if definitions_to_song_key_segment_indices is None:
+                continue
+
+            for key_segment_definition_name, song_key_segment_indices in definitions_to_song_key_segment_indices.items():
+                self.key_segment_indices_writers[key_segment_definition_name].add_key_segment_indices_for_song(song_key_segment_indices,
+                                                                                                              mxl_filepath)
+
+        for key_segment_indices_writer in self.key_segment_indices_writers.values():
+            key_segment_indices_writer.write_songs_to_key_segment_indices_dict_to_npz_file()
+
+    def annotate_and_export_key_segments_for_song_idx(self, song_idx):
+        """ Load a single song and extract its key segments for every
+        definition. Called by `self.parallel_song_annotator`, possibly in
+        a worker process.
+
+        Parameters
+        ----------
+        song_idx : int
+            Index of the song in `self.mxl_filepaths`.
+        """
+        mxl_filepath, rntxt_filepath = self.mxl_filepaths[song_idx], self.rntxt_filepaths[song_idx]
+        print("mxl file:", mxl_filepath.split('/')[-1], "rntxt file:", rntxt_filepath.split('/')[-1])
+
+        parsed_mxl = load_mxl_file_w_m21(mxl_filepath, self.parsed_score_cache)
+        rntxt_analysis = load_rntxt_file_w_m21(rntxt_filepath, self.parsed_score_cache)
+
+        return self.annotate_and_export_key_segments_for_song(parsed_mxl, rntxt_analysis)
+
+    def annotate_and_export_key_segments_for_song(self, parsed_mxl, rntxt_analysis):
+        """ Extract the key segments of a single song for every definition.
+        The chord table and the key segments created from the annotated
+        modulations are computed once and shared by all definitions.
+
+        Parameters
+        ----------
+        parsed_mxl : music21.stream.Score
+        rntxt_analysis : music21.stream.iterator.RecursiveIterator
+
+        Returns
+        -------
+        definitions_to_song_key_segment_indices : dict of { str : np.ndarray }
+        """
+        measure_onset_finder = MeasureOnsetFinder(parsed_mxl)
+        chord_table = ChordTable(rntxt_analysis)
+        modulation_key_segments = None
+
+        definitions_to_song_key_segment_indices = {}
+        for key_segment_definition_name in self.key_segment_definition_names:
+            key_segment_annotator_class, allow_root_position_viio_chords = key_segment_definitions[key_segment_definition_name]
+            song_key_segment_annotator = eval(key_segment_annotator_class)(parsed_mxl,
+                                                                           rntxt_analysis,
+                                                                           measure_onset_finder,
+                                                                           min_key_segment_quarter_length=self.min_key_segment_quarter_length,
+                                                                           allow_root_position_viio_chords=allow_root_position_viio_chords,
+                                                                           chord_table=chord_table)
+
+            if modulation_key_segments is None:
+                modulation_key_segments = song_key_segment_annotator.create_key_segments_from_annotated_modulations()
+
+            key_segments = song_key_segment_annotator.get_key_segments(modulation_key_segments)
+
+            key_segment_indices_writer = self.key_segment_indices_writers[key_segment_definition_name]
+            definitions_to_song_key_segment_indices[key_segment_definition_name] = key_segment_indices_writer.compute_key_segment_indices_for_song(key_segments)
+
+        return definitions_to_song_key_segment_indices
+
+def get_commandline_args():
+    """ Get commandline arguments from user.
+    """
+    parser = ArgumentParser(description='Extract clear key segments for several Clear Key Segment '
+                                        'Definitions at once from specified songs in Micchi, et al.\'s '
+                                        'Meta-Corpus, parsing each song only once.')
+    parser.add_argument('--txt_file_with_mxl_filepaths', type=str,
+                        help='Text file containing paths to MusicXML files to '
+                             'extract key segments from.')
+    parser.add_argument('--key_segment_definitions', type=str, nargs='+',
+                        choices=list(key_segment_definitions.keys()),
+                        default=list(key_segment_definitions.keys()),
+                        help='Clear Key Segment Definitions to extract key segments '
+                             'for. Defaults to all definitions. `v2` definitions '
+                             'allow VII chords in root position to be counted as '
+                             'part of dominant harmony.')
+    parser.add_argument('--min_key_segment_quarter_length', type=int,
+                        help='The minimum length an extracted key segment should be in '
+                             'quarter note duration. Key segments with a shorter '
+                             'duration than `min_key_segment_quarter_length` are '
+                             'thrown out.')
+    parser.add_argument('--predicted_rntxt_filepaths_dir', type=str,
+                        help='Path to the Frog model\'s predicted RomanText files '
+                             'corresponding to songs specified in '
+                             '`--txt_file_with_mxl_filepaths`. If not given, the '
+                             'ground truth RomanText files are used.')
+
+    parser.add_argument('--parsed_score_cache_dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Directory used to cache the parsed MusicXML and '
+                             'RomanText files between runs.')
+    parser.add_argument('--no_parsed_score_cache', action='store_true',
+                        help='Always parse the MusicXML and RomanText files from '
+                             'source instead of using `--parsed_score_cache_dir`.')
+
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to annotate the songs '
+                             'with. Songs are annotated one at a time in the '
+                             'current process if 1.')
+
+    commandline_args = parser.parse_args()
+
+    return commandline_args
+
+if __name__ == '__main__':
+    args = get_commandline_args()
+    print(args)
+
+    txt_file_with_mxl_filepaths = args.txt_file_with_mxl_filepaths
+    key_segment_definition_names = args.key_segment_definitions
+
+    min_key_segment_quarter_length = args.min_key_segment_quarter_length
+
+    predicted_rntxt_filepaths_dir = args.predicted_rntxt_filepaths_dir
+
+    parsed_score_cache_dir = None if args.no_parsed_score_cache else args.parsed_score_cache_dir
+
+    num_workers = args.workers
+
+    key_segment_annotator_and_exporter = MultiDefinitionKeySegmentAnnotatorAndExporter(txt_file_with_mxl_filepaths,
+                                                                                       key_segment_definition_names,
+                                                                                       min_key_segment_quarter_length,
+                                                                                       predicted_rntxt_filepaths_dir,
+                                                                                       parsed_score_cache_dir,
+                                                                                       num_workers)
+    key_segment_annotator_and_exporter.annotate_and_export_key_segments_for_all_songs()
@@ -0,0 +1,10 @@
+# GROUND TRUTH KEY SEGMENTS, ALL DEFINITIONS
+# Parses each song once and outputs one key segment boundaries .npz file per definition.
+# NOTE: this takes a while to run (Definition 2 is the slowest).
+python3 multi_definition_key_segment_annotator_and_exporter.py --txt_file_with_mxl_filepaths 'in/meta-corpus_valid_mxl_filepaths.txt' \
+                                                               --workers 8
+
+# PREDICTED KEY SEGMENTS, ALL DEFINITIONS
+#python3 multi_definition_key_segment_annotator_and_exporter.py --txt_file_with_mxl_filepaths 'in/meta-corpus_valid_mxl_filepaths.txt' \
+#                                                               --predicted_rntxt_filepaths_dir '../frog/out/_2022-05-20_13-45-17/' \
+#                                                               --workers 8
@@ -0,0 +1,162 @@
+""" Run a key segment annotator and exporter over every song in the
+corpus, either in the current process or fanned out to a pool of
+worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import traceback
+
+from chord_label_classifier import shared_chord_label_classifier
+
+# Set in each worker process by `initialize_worker()`, so that the
+# annotator and exporter is only sent to each worker once.
+worker_song_annotator_and_exporter = None
+
+def initialize_worker(song_annotator_and_exporter):
+    """ Store the annotator and exporter that the current worker
+    process should run songs through.
+
+    Parameters
+    ----------
+    song_annotator_and_exporter : object
+        Must implement `annotate_and_export_key_segments_for_song_idx(song_idx)`.
+    """
+    global worker_song_annotator_and_exporter
+    worker_song_annotator_and_exporter = song_annotator_and_exporter
+
+def get_worker_counters(song_annotator_and_exporter):
+    """ Get the current values of the counters kept in the current
+    worker process (e.g. the parsed score cache's and the chord label
+    classifier's hits and misses).
+
+    Parameters
+    ----------
+    song_annotator_and_exporter : object
+
+    Returns
+    -------
+    worker_counters : dict of { str : int }
+    """
+    worker_counters = {}
+
+    parsed_score_cache = getattr(song_annotator_and_exporter, 'parsed_score_cache', None)
+    if parsed_score_cache is not None:
+        worker_counters["Parsed score cache hits"] = parsed_score_cache.num_hits
+        worker_counters["Parsed score cache misses"] = parsed_score_cache.num_misses
+
+    worker_counters["Chord label classifier hits"] = shared_chord_label_classifier.num_hits
+    worker_counters["Chord label classifier misses"] = shared_chord_label_classifier.num_misses
+
+    return worker_counters
+
+def annotate_song_in_worker(song_idx):
+    """ Annotate a single song in the current worker process. Any
+    exception is caught and returned, so that one bad song doesn't
+    stop the rest of the corpus from being processed.
+
+    Parameters
+    ----------
+    song_idx : int
+
+    Returns
+    -------
+    song_output : object
+        None if the song failed.
+    song_error : str
+        None if the song succeeded.
+    song_counters : dict of { str : int }
+        How much each of the worker's counters went up while annotating
+        the song, since the worker's copies are thrown away afterwards.
+    """
+    counters_before_song = get_worker_counters(worker_song_annotator_and_exporter)
+
+    try:
+        song_output = worker_song_annotator_and_exporter.annotate_and_export_key_segments_for_song_idx(song_idx)
+        song_error = None
+    except Exception:
+        song_output = None
+        song_error = traceback.format_exc()
+
+    counters_after_song = get_worker_counters(worker_song_annotator_and_exporter)
+    song_counters = {counter_name : counter_value - counters_before_song.get(counter_name, 0)
+                     for counter_name, counter_value in counters_after_song.items()}
+
+    return song_output, song_error, song_counters
+
+class ParallelSongAnnotator:
+    """ Run a key segment annotator and exporter over every song in the
+    corpus, either in the current process or fanned out to a pool of
+    worker processes.
+
+    The per-song outputs are returned in song order regardless of the
+    order the workers finish in, so the NPZ files written from them are
+    identical to those of a serial run.
+    """
+
+    def __init__(self, num_workers=1):
+        """
+
+        Parameters
+        ----------
+        num_workers : int
+            Number of worker processes. If 1 (or less), songs are
+            annotated one at a time in the current process.
+        """
+        self.num_workers = num_workers
+
+        # { counter name : total over all songs of the last `annotate_songs()` call }
+        self.counters = {}
+
+    def annotate_songs(self, song_annotator_and_exporter, songnames):
+        """ Annotate every song and collect the per-song outputs.
+
+        Parameters
+        ----------
+        song_annotator_and_exporter : object
+            Must implement `annotate_and_export_key_segments_for_song_idx(song_idx)`,
+            which returns the song's output (e.g. its key segment indices).
+        songnames : list of str
+            Used to identify failed songs.
+
+        Returns
+        -------
+        song_outputs : list of object
+            Output of each song, in the order of `songnames`. None for
+            songs that failed.
+        """
+        song_indices = range(len(songnames))
+
+        if self.num_workers <= 1:
+            initialize_worker(song_annotator_and_exporter)
+            song_outcomes = [annotate_song_in_worker(song_idx) for song_idx in song_indices]
+        else:
+            with ProcessPoolExecutor(max_workers=self.num_workers,
+                                     initializer=initialize_worker,
+                                     initargs=(song_annotator_and_exporter,)) as executor:
+                song_outcomes = list(executor.map(annotate_song_in_worker, song_indices))
+
+        song_outputs = []
+        failed_songnames = []
+        self.counters = {}
+        for songname, (song_output, song_error, song_counters) in zip(songnames, song_outcomes):
+            if song_error is not None:
+                print("Error: Failed to annotate song {}\n{}".format(songname, song_error))
+                failed_songnames.append(songname)
+            song_outputs.append(song_output)
+
+            for counter_name, counter_value in song_counters.items():
+                self.counters[counter_name] = self.counters.get(counter_name, 0) + counter_value
+
+        if failed_songnames:
+            print("Warning: {} of {} songs failed: {}".format(len(failed_songnames), len(songnames),
+                                                             ", ".join(failed_songnames)))
+
+        self.output_counters()
+
+        return song_outputs
+
+    def output_counters(self):
+        """ Print the counters summed over all songs.
+        """
+        for counter_name, counter_value in self.counters.items():
+            print("{}: {}".format(counter_name, counter_value))
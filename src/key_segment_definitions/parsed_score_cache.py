@@ -0,0 +1,190 @@
+""" On-disk cache of Music21-parsed MusicXML and RomanText files.
+Entries are keyed by the content hash of the parsed file and the
+installed Music21 version, and the cache is kept under a maximum
+size by evicting the least recently used entries.
+"""
+
+import hashlib
+import os
+
+import music21 as m21
+
+DEFAULT_CACHE_DIR = "out/cache/parsed_scores"
+DEFAULT_MAX_CACHE_SIZE_BYTES = 2 * 1024 ** 3  # 2 GB
+CACHE_ENTRY_EXTENSION = ".p"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class ParsedScoreCache:
+    """ On-disk cache of Music21-parsed MusicXML and RomanText files.
+    Entries are keyed by the content hash of the parsed file and the
+    installed Music21 version, and the cache is kept under a maximum
+    size by evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_cache_size_bytes=DEFAULT_MAX_CACHE_SIZE_BYTES):
+        """
+
+        Parameters
+        ----------
+        cache_dir : str
+            Directory the pickled scores are stored in. Created on first
+            write if it doesn't already exist.
+        max_cache_size_bytes : int
+            Maximum total size of the cache directory. Once exceeded, the
+            least recently used entries are removed.
+        """
+        self.cache_dir = cache_dir
+        self.max_cache_size_bytes = max_cache_size_bytes
+
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def load_score(self, filepath, parse_format=None):
+        """ Return the parsed Music21 score for `filepath`, either
+        thawed from the cache or parsed from source (and then added
+        to the cache).
+
+        Parameters
+        ----------
+        filepath : str
+        parse_format : str
+            Passed to `music21.converter.parse` as `format`
+            (e.g. 'romanText'). None lets Music21 infer it.
+        """
+        cache_entry_path = self.get_cache_entry_path(filepath, parse_format)
+
+        if os.path.isfile(cache_entry_path):
+            try:
+                parsed_score = self.thaw_score(cache_entry_path)
+            except Exception:
+                print("Warning: corrupt cache entry {}, re-parsing {}".format(cache_entry_path, filepath))
+                self.remove_cache_entry(cache_entry_path)
+            else:
+                self.mark_cache_entry_as_recently_used(cache_entry_path)
+                self.num_hits += 1
+                return parsed_score
+
+        self.num_misses += 1
+        parsed_score = m21.converter.parse(filepath, format=parse_format)
+
+        self.freeze_score(parsed_score, cache_entry_path)
+        self.evict_least_recently_used_cache_entries()
+
+        return parsed_score
+
+    def get_cache_entry_path(self, filepath, parse_format):
+        """ Get the path of the cache entry for `filepath`.
+
+        Parameters
+        ----------
+        filepath : str
+        parse_format : str
+        """
+        cache_key = self.compute_cache_key(filepath, parse_format)
+        return os.path.join(self.cache_dir, cache_key + CACHE_ENTRY_EXTENSION)
+
+    def compute_cache_key(self, filepath, parse_format):
+        """ Hash the file content together with the Music21 version
+        and the parse format, so that an edited file or a Music21
+        upgrade never returns a stale score.
+
+        Parameters
+        ----------
+        filepath : str
+        parse_format : str
+        """
+        file_hash = hashlib.sha1()
+        file_hash.update(m21.__version__.encode())
+        file_hash.update(str(parse_format).encode())
+
+        with open(filepath, 'rb') as file_to_hash:
+            for chunk in iter(lambda: file_to_hash.read(HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+
+        return file_hash.hexdigest()
+
+    def thaw_score(self, cache_entry_path):
+        """ Load a pickled Music21 score from the cache.
+
+        Parameters
+        ----------
+        cache_entry_path : str
+        """
+        with open(cache_entry_path, 'rb') as cache_entry_file:
+            frozen_score = cache_entry_file.read()
+
+        stream_thawer = m21.freezeThaw.StreamThawer()
+        stream_thawer.openStr(frozen_score)
+        return stream_thawer.stream
+
+    def freeze_score(self, parsed_score, cache_entry_path):
+        """ Pickle a Music21 score into the cache. The entry is written
+        to a temporary file first and then moved into place, so that
+        concurrent readers never see a partially written entry.
+
+        Parameters
+        ----------
+        parsed_score : music21.stream.Score
+        cache_entry_path : str
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        stream_freezer = m21.freezeThaw.StreamFreezer(parsed_score)
+        frozen_score = stream_freezer.writeStr(fmt='pickle')
+
+        tmp_cache_entry_path = "{}.{}.tmp".format(cache_entry_path, os.getpid())
+        with open(tmp_cache_entry_path, 'wb') as cache_entry_file:
+            cache_entry_file.write(frozen_score)
+        os.replace(tmp_cache_entry_path, cache_entry_path)
+
+    def mark_cache_entry_as_recently_used(self, cache_entry_path):
+        """ Update the modification time of a cache entry. The
+        modification time is used as the LRU timestamp.
+
+        Parameters
+        ----------
+        cache_entry_path : str
+        """
+        try:
+            os.utime(cache_entry_path)
+        except OSError:
+            pass
+
+    def remove_cache_entry(self, cache_entry_path):
+        """ Delete a cache entry, ignoring entries that have already
+        been removed by another process.
+
+        Parameters
+        ----------
+        cache_entry_path : str
+        """
+        try:
+            os.remove(cache_entry_path)
+        except OSError:
+            pass
+
+    def evict_least_recently_used_cache_entries(self):
+        """ Remove the least recently used cache entries until the total
+        cache size is at most `self.max_cache_size_bytes`.
+        """
+        cache_entries = []
+        total_cache_size = 0
+        for cache_entry_name in os.listdir(self.cache_dir):
+            if not cache_entry_name.endswith(CACHE_ENTRY_EXTENSION):
+                continue
+
+            cache_entry_path = os.path.join(self.cache_dir, cache_entry_name)
+            try:
+                cache_entry_stat = os.stat(cache_entry_path)
+            except OSError:
+                continue
+
+            cache_entries.append((cache_entry_stat.st_mtime, cache_entry_stat.st_size, cache_entry_path))
+            total_cache_size += cache_entry_stat.st_size
+
+        for _, cache_entry_size, cache_entry_path in sorted(cache_entries):
+            if total_cache_size <= self.max_cache_size_bytes:
+                break
+
+            self.remove_cache_entry(cache_entry_path)
+            total_cache_size -= cache_entry_size
@@ -0,0 +1,134 @@
+""" Time index of the pitches that appear in a score. Answers "which
+pitch names have a note starting in [onset, offset)" in O(log n) time
+after a one-off O(n log n) build, without extracting score excerpts.
+"""
+
+import music21 as m21
+import numpy as np
+
+MAX_NUM_PITCH_NAMES = 64  # one bit per distinct pitch name in a uint64 bitmask
+
+class PitchNameIndex:
+    """ Time index of the pitches that appear in a score. Answers "which
+    pitch names have a note starting in [onset, offset)" in O(log n) time
+    after a one-off O(n log n) build, without extracting score excerpts.
+
+    Each note or chord in the score is stored as its onset and a bitmask
+    of its pitch names (spelled, e.g. 'C#' and 'D-' are different bits).
+    The bitmasks are sorted by onset and kept in a sparse table, so the
+    union of the pitch names over any range of notes is the OR of two
+    table entries. Finding the range of notes that start in
+    [onset, offset) takes two binary searches over the onsets.
+    """
+
+    def __init__(self, parsed_mxl):
+        """
+
+        Parameters
+        ----------
+        parsed_mxl : music21.stream.Score
+            Parsed Music21 score for an entire song.
+        """
+        self.pitch_names_to_bits = {}
+
+        note_onsets = []
+        note_pitch_name_masks = []
+        for note in parsed_mxl.flat.getElementsByClass([m21.note.Note, m21.chord.Chord]):
+            note_onsets.append(float(note.offset))
+            note_pitch_name_masks.append(self.get_pitch_name_mask(self.get_pitch_names_in_note(note),
+                                                                  add_missing_pitch_names=True))
+
+        note_order = np.argsort(np.asarray(note_onsets, dtype='float64'), kind='stable')
+        self.note_onsets = np.asarray(note_onsets, dtype='float64')[note_order]
+        pitch_name_masks = np.asarray(note_pitch_name_masks, dtype='uint64')[note_order]
+
+        self.sparse_table = self.build_sparse_table(pitch_name_masks)
+
+    def get_pitch_names_in_note(self, note):
+        """ Get the names of the pitches in a note or chord.
+
+        Parameters
+        ----------
+        note : music21.note.Note or music21.chord.Chord
+        """
+        if isinstance(note, m21.note.Note):
+            return [note.pitch.name]
+        else:
+            return [pitch.name for pitch in note.pitches]
+
+    def get_pitch_name_mask(self, pitch_names, add_missing_pitch_names=False):
+        """ Get the bitmask of a list of pitch names.
+
+        Parameters
+        ----------
+        pitch_names : list of str
+        add_missing_pitch_names : bool
+            If true, pitch names that haven't been seen yet are given a
+            new bit. If false, None is returned if any pitch name doesn't
+            appear in the score.
+        """
+        pitch_name_mask = 0
+        for pitch_name in pitch_names:
+            if pitch_name not in self.pitch_names_to_bits:
+                if not add_missing_pitch_names:
+                    return None
+                elif len(self.pitch_names_to_bits) == MAX_NUM_PITCH_NAMES:
+                    raise Exception("Score has more than {} distinct pitch names.".format(MAX_NUM_PITCH_NAMES))
+                self.pitch_names_to_bits[pitch_name] = len(self.pitch_names_to_bits)
+
+            pitch_name_mask |= 1 << self.pitch_names_to_bits[pitch_name]
+
+        return pitch_name_mask
+
+    def build_sparse_table(self, pitch_name_masks):
+        """ Build a sparse table where `sparse_table[k][i]` is the OR of the
+        pitch name masks of notes `i` to `i + 2**k` (exclusive).
+
+        Parameters
+        ----------
+        pitch_name_masks : np.ndarray (dtype='uint64', shape=(no. notes,))
+        """
+        sparse_table = [pitch_name_masks]
+        range_length = 1
+        while 2 * range_length <= pitch_name_masks.shape[0]:
+            prev_level = sparse_table[-1]
+            sparse_table.append(prev_level[:-range_length] | prev_level[range_length:])
+            range_length *= 2
+
+        return sparse_table
+
+    def get_pitch_name_mask_in_time_range(self, onset, offset):
+        """ Get the bitmask of all pitch names of the notes that start in
+        [onset, offset), in quarter length relative to the start of the score.
+
+        Parameters
+        ----------
+        onset : float
+        offset : float
+        """
+        start_note_idx = int(np.searchsorted(self.note_onsets, onset, side='left'))
+        stop_note_idx = int(np.searchsorted(self.note_onsets, offset, side='left'))
+
+        num_notes = stop_note_idx - start_note_idx
+        if num_notes <= 0:
+            return 0
+
+        level = num_notes.bit_length() - 1
+        level_range_length = 1 << level
+        return int(self.sparse_table[level][start_note_idx] | self.sparse_table[level][stop_note_idx - level_range_length])
+
+    def check_if_pitch_names_appear_in_time_range(self, pitch_names, onset, offset):
+        """ Check if every pitch name in `pitch_names` appears at least
+        once in a note that starts in [onset, offset).
+
+        Parameters
+        ----------
+        pitch_names : list of str
+        onset : float
+        offset : float
+        """
+        pitch_name_mask = self.get_pitch_name_mask(pitch_names)
+        if pitch_name_mask is None:
+            return False
+
+        return (self.get_pitch_name_mask_in_time_range(onset, offset) & pitch_name_mask) == pitch_name_mask
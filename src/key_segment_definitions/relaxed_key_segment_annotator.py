@@ -49,13 +49,10 @@ class RelaxedKeySegmentAnnotator(BasicKeySegmentAnnotator):
         """
         key_segments_w_dom_harm_to_I_progs = []
         for key_segment in key_segments:
-            dominant_harmony_seen = False
-            for rntxt_chord in key_segment.rntxt_chords:
-                if dominant_harmony_seen and self.check_if_rntxt_chord_is_I_chord(rntxt_chord):
-                    key_segments_w_dom_harm_to_I_progs.append(key_segment)
-                    break
-                elif self.check_if_rntxt_chord_is_V_or_VII_chord(rntxt_chord):
-                    dominant_harmony_seen = True
+            if self.check_if_key_segment_contains_progression(key_segment,
+                                                              self.check_if_rntxt_chord_is_V_or_VII_chord,
+                                                              self.check_if_rntxt_chord_is_I_chord):
+                key_segments_w_dom_harm_to_I_progs.append(key_segment)
 
         return key_segments_w_dom_harm_to_I_progs
 
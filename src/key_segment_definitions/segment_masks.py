@@ -0,0 +1,144 @@
+""" Convert key segment start and stop indices to masks over a song's
+events, and select the events inside key segments, without looping over
+the key segments or events in Python.
+
+Masks are built with a difference array: +1 at each segment start, -1 at
+each segment stop, and a cumulative sum gives the number of segments that
+cover each event. The batched functions do the same for all songs at
+once, on the songs' events concatenated into one array.
+"""
+
+import numpy as np
+
+def get_segment_starts_and_stops(segment_indices, num_events):
+    """ Get the start and stop index of each segment, clipped to the
+    song's events the same way a Python slice would be.
+
+    Parameters
+    ----------
+    segment_indices : np.ndarray (shape=(no. segments, 2))
+        May be an empty array with shape (0,) if the song has no segments.
+    num_events : int
+
+    Returns
+    -------
+    segment_starts : np.ndarray (dtype='int64', shape=(no. segments,))
+    segment_stops : np.ndarray (dtype='int64', shape=(no. segments,))
+        Never less than the corresponding start index.
+    """
+    segment_indices = np.asarray(segment_indices).reshape(-1, 2).astype('int64')
+
+    segment_starts = np.clip(segment_indices[:, 0], 0, num_events)
+    segment_stops = np.clip(segment_indices[:, 1], segment_starts, num_events)
+
+    return segment_starts, segment_stops
+
+def compute_segment_mask(segment_indices, num_events):
+    """ Get a mask that is true for every event inside at least one
+    segment.
+
+    Parameters
+    ----------
+    segment_indices : np.ndarray (shape=(no. segments, 2))
+    num_events : int
+
+    Returns
+    -------
+    segment_mask : np.ndarray (dtype='bool', shape=(no. events,))
+    """
+    segment_starts, segment_stops = get_segment_starts_and_stops(segment_indices, num_events)
+
+    num_covering_segments = np.zeros(num_events + 1, dtype='int64')
+    np.add.at(num_covering_segments, segment_starts, 1)
+    np.add.at(num_covering_segments, segment_stops, -1)
+
+    return np.cumsum(num_covering_segments[:-1]) > 0
+
+def compute_segment_event_indices(segment_indices, num_events):
+    """ Get the indices of the events inside each segment, concatenated
+    in segment order (i.e. the indices that `np.concatenate()` of the
+    segment slices would select).
+
+    Parameters
+    ----------
+    segment_indices : np.ndarray (shape=(no. segments, 2))
+    num_events : int
+
+    Returns
+    -------
+    segment_event_indices : np.ndarray (dtype='int64', shape=(total length of the segments,))
+    """
+    segment_starts, segment_stops = get_segment_starts_and_stops(segment_indices, num_events)
+    segment_lengths = segment_stops - segment_starts
+
+    # Position of each segment's first event in the output array.
+    segment_output_starts = np.cumsum(segment_lengths) - segment_lengths
+
+    return (np.repeat(segment_starts - segment_output_starts, segment_lengths)
+            + np.arange(np.sum(segment_lengths), dtype='int64'))
+
+def compute_song_event_offsets(songs_num_events):
+    """ Get the index of each song's first event in the concatenated
+    event array of all songs, plus the total number of events.
+
+    Parameters
+    ----------
+    songs_num_events : list of int
+
+    Returns
+    -------
+    song_event_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+    """
+    return np.concatenate([[0], np.cumsum(np.asarray(songs_num_events, dtype='int64'))]).astype('int64')
+
+def compute_segment_mask_for_songs(songs_segment_indices, songs_num_events):
+    """ Get the segment mask of every song at once, over the songs'
+    events concatenated in the given order.
+
+    Parameters
+    ----------
+    songs_segment_indices : list of np.ndarray (shape=(no. segments, 2))
+        Segment indices of each song, relative to the start of the song.
+    songs_num_events : list of int
+
+    Returns
+    -------
+    segment_mask : np.ndarray (dtype='bool', shape=(total no. events,))
+    song_event_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+        Song `i`'s events are `segment_mask[song_event_offsets[i]:song_event_offsets[i+1]]`.
+    """
+    song_event_offsets = compute_song_event_offsets(songs_num_events)
+
+    corpus_segment_starts = []
+    corpus_segment_stops = []
+    for song_idx, song_segment_indices in enumerate(songs_segment_indices):
+        segment_starts, segment_stops = get_segment_starts_and_stops(song_segment_indices,
+                                                                     songs_num_events[song_idx])
+        corpus_segment_starts.append(segment_starts + song_event_offsets[song_idx])
+        corpus_segment_stops.append(segment_stops + song_event_offsets[song_idx])
+
+    num_corpus_events = int(song_event_offsets[-1])
+    if len(corpus_segment_starts) == 0:
+        return np.zeros(num_corpus_events, dtype=bool), song_event_offsets
+
+    corpus_segment_indices = np.stack([np.concatenate(corpus_segment_starts),
+                                       np.concatenate(corpus_segment_stops)], axis=1)
+
+    return compute_segment_mask(corpus_segment_indices, num_corpus_events), song_event_offsets
+
+def count_masked_events_for_songs(event_mask, song_event_offsets):
+    """ Count the number of true events in each song of a mask over the
+    concatenated events of all songs.
+
+    Parameters
+    ----------
+    event_mask : np.ndarray (dtype='bool', shape=(total no. events,))
+    song_event_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+
+    Returns
+    -------
+    songs_num_masked_events : np.ndarray (dtype='int64', shape=(no. songs,))
+    """
+    num_masked_events_before = np.concatenate([[0], np.cumsum(event_mask, dtype='int64')])
+
+    return num_masked_events_before[song_event_offsets[1:]] - num_masked_events_before[song_event_offsets[:-1]]
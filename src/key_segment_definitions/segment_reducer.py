@@ -0,0 +1,143 @@
+""" Reduce per-event values over key segments with `np.add.reduceat`,
+e.g. to find which key segments are predicted entirely correctly,
+without slicing out and comparing each key segment in Python.
+"""
+
+import numpy as np
+
+from segment_masks import compute_song_event_offsets, get_segment_starts_and_stops
+
+def convert_to_segment_indices_array(segment_indices):
+    """ Get the segment indices as an int64 array with shape
+    (no. segments, 2), including for songs without segments (which are
+    stored as empty arrays with shape (0,)).
+
+    Parameters
+    ----------
+    segment_indices : np.ndarray or list of [int, int]
+    """
+    return np.asarray(segment_indices).reshape(-1, 2).astype('int64')
+
+def sum_events_in_segments(event_values, segment_starts, segment_stops):
+    """ Sum `event_values` over the events of each segment with a single
+    `np.add.reduceat` call.
+
+    Parameters
+    ----------
+    event_values : np.ndarray (dtype='int64', shape=(no. events,))
+    segment_starts : np.ndarray (dtype='int64', shape=(no. segments,))
+        Must be in [0, no. events].
+    segment_stops : np.ndarray (dtype='int64', shape=(no. segments,))
+        Must be in [segment start, no. events].
+
+    Returns
+    -------
+    segment_sums : np.ndarray (dtype='int64', shape=(no. segments,))
+        0 for empty segments.
+    """
+    if segment_starts.shape[0] == 0:
+        return np.zeros(0, dtype='int64')
+
+    # `reduceat` sums `values[indices[i]:indices[i+1]]`, so interleave the
+    # starts and stops and keep every other sum. The padding lets a stop
+    # index equal the number of events.
+    padded_event_values = np.concatenate([event_values, [0]]).astype('int64')
+    reduce_indices = np.stack([segment_starts, segment_stops], axis=1).ravel()
+    segment_sums = np.add.reduceat(padded_event_values, reduce_indices)[::2]
+
+    # `reduceat` returns `values[start]` instead of 0 when start == stop.
+    segment_sums[segment_starts == segment_stops] = 0
+
+    return segment_sums
+
+def compute_whole_segment_stats(event_key_predictions, ground_truth_event_key_labels, segment_indices):
+    """ For each segment of a song, find whether every event in it is
+    predicted correctly.
+
+    Parameters
+    ----------
+    event_key_predictions : np.ndarray (shape=(no. events,))
+        May have extra events at the end, which are ignored.
+    ground_truth_event_key_labels : np.ndarray (dtype='int64', shape=(no. events,))
+    segment_indices : np.ndarray (shape=(no. segments, 2))
+
+    Returns
+    -------
+    segment_is_correct : np.ndarray (dtype='bool', shape=(no. segments,))
+    segment_lengths : np.ndarray (dtype='int64', shape=(no. segments,))
+        Stop index - start index of each segment.
+    """
+    segment_is_correct, segment_lengths, _ = compute_whole_segment_stats_for_songs([event_key_predictions],
+                                                                                   [ground_truth_event_key_labels],
+                                                                                   [segment_indices])
+
+    return segment_is_correct, segment_lengths
+
+def compute_whole_segment_stats_for_songs(songs_event_key_predictions, songs_ground_truth_event_key_labels,
+                                          songs_segment_indices):
+    """ For every segment of every song, find whether every event in it
+    is predicted correctly. The mismatches of all songs are concatenated,
+    and the mismatches in each segment are counted with one reduction.
+
+    Parameters
+    ----------
+    songs_event_key_predictions : list of np.ndarray (shape=(no. song events,))
+        May have extra events at the end of a song, which are ignored.
+    songs_ground_truth_event_key_labels : list of np.ndarray (dtype='int64', shape=(no. song events,))
+    songs_segment_indices : list of np.ndarray (shape=(no. song segments, 2))
+        Relative to the start of each song.
+
+    Returns
+    -------
+    segment_is_correct : np.ndarray (dtype='bool', shape=(total no. segments,))
+    segment_lengths : np.ndarray (dtype='int64', shape=(total no. segments,))
+        Stop index - start index of each segment.
+    song_segment_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+        Song `i`'s segments are `song_segment_offsets[i]:song_segment_offsets[i+1]`.
+    """
+    songs_num_events = [song_ground_truth_event_key_labels.shape[0]
+                        for song_ground_truth_event_key_labels in songs_ground_truth_event_key_labels]
+    song_event_offsets = compute_song_event_offsets(songs_num_events)
+
+    mismatched_events = []
+    segment_starts = []
+    segment_stops = []
+    segment_lengths = []
+    for song_idx, song_segment_indices in enumerate(songs_segment_indices):
+        num_song_events = songs_num_events[song_idx]
+        song_event_key_predictions = songs_event_key_predictions[song_idx][:num_song_events]
+        mismatched_events.append(song_event_key_predictions != songs_ground_truth_event_key_labels[song_idx])
+
+        song_segment_indices = convert_to_segment_indices_array(song_segment_indices)
+        song_segment_starts, song_segment_stops = get_segment_starts_and_stops(song_segment_indices, num_song_events)
+        segment_starts.append(song_segment_starts + song_event_offsets[song_idx])
+        segment_stops.append(song_segment_stops + song_event_offsets[song_idx])
+        segment_lengths.append(song_segment_indices[:, 1] - song_segment_indices[:, 0])
+
+    if len(segment_starts) == 0:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype='int64'), np.zeros(1, dtype='int64')
+
+    segment_num_mismatched_events = sum_events_in_segments(np.concatenate(mismatched_events),
+                                                           np.concatenate(segment_starts),
+                                                           np.concatenate(segment_stops))
+
+    song_segment_offsets = compute_song_event_offsets([song_segment_starts.shape[0]
+                                                       for song_segment_starts in segment_starts])
+
+    return segment_num_mismatched_events == 0, np.concatenate(segment_lengths), song_segment_offsets
+
+def count_segments_by_length(segment_lengths, count_events=False):
+    """ Create a dictionary where the key is the segment length and the
+    value is the number of segments with that length (or the total
+    number of events in those segments if `count_events` is true).
+
+    Parameters
+    ----------
+    segment_lengths : np.ndarray (dtype='int64', shape=(no. segments,))
+    count_events : bool
+    """
+    unique_segment_lengths, segment_length_counts = np.unique(segment_lengths, return_counts=True)
+    if count_events:
+        segment_length_counts = segment_length_counts * unique_segment_lengths
+
+    return dict(zip(unique_segment_lengths.tolist(), segment_length_counts.tolist()))
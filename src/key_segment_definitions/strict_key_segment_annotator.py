@@ -1,11 +1,10 @@
 """ Implementation of Clear Key Segment Definition 2 from thesis.
 """
 
-import music21
+import numpy as np
 
 from basic_key_segment_annotator import BasicKeySegmentAnnotator
-from key_segment import KeySegment
-from key_segment_exporter import KeySegmentExporter 
+from pitch_name_index import PitchNameIndex
 
 NUM_TRIAD_NOTES = 3
 
@@ -34,7 +33,7 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
             The minimum length a key segment should be in quarter note
             duration.
         """
-        self.song_key_segment_exporter = KeySegmentExporter(parsed_mxl, measure_onset_finder)
+        self.pitch_name_index = PitchNameIndex(parsed_mxl)
         super().__init__(parsed_mxl, rntxt_analysis, measure_onset_finder,
                          **kwargs)
 
@@ -47,10 +46,10 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
         key_segment : KeySegment
         """
         new_key_onset, new_start_measure_num, new_rntxt_chord_idx = None, None, None
-        for rntxt_chord_idx, rntxt_chord in enumerate(key_segment.rntxt_chords):
+        for rntxt_chord_idx in self.get_I_or_V_chord_indices(key_segment.rntxt_chords):
             if self.check_if_rntxt_chord_is_allowable_start_chord(rntxt_chord_idx, key_segment.rntxt_chords, key_segment):
-                new_key_onset = rntxt_chord.offset 
-                new_start_measure_num = rntxt_chord.measureNumber
+                new_key_onset = key_segment.rntxt_chords.get_onset(rntxt_chord_idx)
+                new_start_measure_num = key_segment.rntxt_chords.get_measure_num(rntxt_chord_idx)
 
                 if self.score_starts_on_measure_zero:
                     new_start_measure_num += 1
@@ -67,6 +66,18 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
                                                                         new_rntxt_chord_idx)
             return key_segment 
 
+    def get_I_or_V_chord_indices(self, rntxt_chords):
+        """ Get the indices of the I and V chords in `rntxt_chords`,
+        i.e. the only chords that can be complete I or V chords.
+
+        Parameters
+        ----------
+        rntxt_chords : ChordTable
+        """
+        I_chords_mask = rntxt_chords.compute_chord_mask(self.check_if_rntxt_chord_is_I_chord)
+        V_chords_mask = rntxt_chords.compute_chord_mask(self.check_if_rntxt_chord_is_V_chord)
+        return np.flatnonzero(I_chords_mask | V_chords_mask).tolist()
+
     def check_if_rntxt_chord_is_allowable_start_chord(self, rntxt_chord_idx, rntxt_chords, key_segment):
         """ Check if RomanText chord is an allowable start chord (i.e.
         a complete I or V chord).
@@ -74,7 +85,7 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
         Parameters
         ----------
         rntxt_chord_idx : int
-        rntxt_chords : list of music21.roman.RomanNumeral
+        rntxt_chords : ChordTable
         key_segment : KeySegment
         """
         return self.check_if_rntxt_chord_is_allowable_start_or_end_chord(rntxt_chord_idx, rntxt_chords,
@@ -95,10 +106,10 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
         Parameters
         ----------
         rntxt_chord_idx : int
-        rntxt_chords : list of music21.roman.RomanNumeral
+        rntxt_chords : ChordTable
         key_segment : KeySegment
         """
-        current_rntxt_chord = rntxt_chords[rntxt_chord_idx]
+        current_rntxt_chord = rntxt_chords.get_representative_rntxt_chord(rntxt_chord_idx)
 
         if (self.check_if_rntxt_chord_is_I_chord(current_rntxt_chord)
             or self.check_if_rntxt_chord_is_V_chord(current_rntxt_chord)):
@@ -106,38 +117,36 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
             if len(chord_triad_pitches) < NUM_TRIAD_NOTES:
                 return False
 
-            key_segment = self.get_key_segment_from_single_rntxt_chord(rntxt_chord_idx, rntxt_chords, key_segment)
-            parsed_mxl_key_segment = self.song_key_segment_exporter.extract_key_segment_from_parsed_mxl(key_segment)
-            return self.check_if_rntxt_chord_is_complete_triad(parsed_mxl_key_segment, chord_triad_pitches)
+            rntxt_chord_onset, rntxt_chord_offset = self.get_rntxt_chord_onset_and_offset(rntxt_chord_idx, rntxt_chords,
+                                                                                          key_segment)
+            return self.check_if_rntxt_chord_is_complete_triad(rntxt_chord_onset, rntxt_chord_offset, chord_triad_pitches)
         else:
             return False
 
-    def get_key_segment_from_single_rntxt_chord(self, rntxt_chord_idx, rntxt_chords, key_segment):
-        """ Create a KeySegment object out of a single RomanText chord.
-        This KeySegment object is later used to help check the MusicXML
-        score to see if all notes of the start/end chord truly appear
-        on the score (i.e. to verify if the start/end chords are truly
-        complete according to the notes that appear in this section of
-        the score).
+    def get_rntxt_chord_onset_and_offset(self, rntxt_chord_idx, rntxt_chords, key_segment):
+        """ Get the onset and offset time (in quarters) of a single RomanText
+        chord. These are later used to check the MusicXML score to see if
+        all notes of the start/end chord truly appear on the score (i.e. to
+        verify if the start/end chords are truly complete according to the
+        notes that appear in this section of the score).
 
         Parameters
         ----------
         rntxt_chord_idx : int
-        rntxt_chords : list of music21.roman.RomanNumeral
+        rntxt_chords : ChordTable
         key_segment : KeySegment
+            Key segment that `rntxt_chords` belongs to. Its offset is used
+            as the offset of the last chord.
         """
-        current_rntxt_chord = rntxt_chords[rntxt_chord_idx]
-        current_key_segment = KeySegment(first_rntxt_chord=current_rntxt_chord,
-                                         score_starts_on_measure_zero=self.score_starts_on_measure_zero,
-                                         rntxt_chords_start_idx=rntxt_chord_idx)
+        rntxt_chord_onset = rntxt_chords.get_onset(rntxt_chord_idx)
+
         next_rntxt_chord_idx = rntxt_chord_idx + 1
         if next_rntxt_chord_idx == len(rntxt_chords):
-            current_key_segment.set_offset_and_stop_measure_num(key_segment.offset, key_segment.stop_measure_num)
+            rntxt_chord_offset = key_segment.offset
         else:
-            next_rntxt_chord = rntxt_chords[next_rntxt_chord_idx]
-            current_key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(next_rntxt_chord)
+            rntxt_chord_offset = rntxt_chords.get_onset(next_rntxt_chord_idx)
 
-        return current_key_segment
+        return rntxt_chord_onset, rntxt_chord_offset
 
     def get_triad_pitches_in_rntxt_chord(self, rntxt_chord):
         """ Get the chord tones of the RomanText chord.
@@ -159,32 +168,20 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
 
         return rntxt_triad_pitches
 
-    def check_if_rntxt_chord_is_complete_triad(self, parsed_mxl_key_segment, chord_triad_pitches):
+    def check_if_rntxt_chord_is_complete_triad(self, rntxt_chord_onset, rntxt_chord_offset, chord_triad_pitches):
         """ Check to see which notes appear on the score in the
         start/end chord segment and see if they form a complete
         triad.
 
         Parameters
         ----------
-        parsed_mxl_key_segment : music21.stream.Score
+        rntxt_chord_onset : float
+        rntxt_chord_offset : float
         chord_triad_pitches : list of str
         """
-        key_segment_notes = parsed_mxl_key_segment.flat.getElementsByClass([music21.note.Note, music21.chord.Chord])
-        key_segment_pitches = set()
-        for note in key_segment_notes:
-            if isinstance(note, music21.note.Note):
-                key_segment_pitches.add(note.pitch.name)
-            elif isinstance(note, music21.chord.Chord):
-                for pitch in note.pitches:
-                    key_segment_pitches.add(pitch.name)
-
-        full_triad_coverage = True
-        for pitch in chord_triad_pitches:
-            if pitch not in key_segment_pitches:
-                full_triad_coverage = False
-                break
-
-        return full_triad_coverage
+        return self.pitch_name_index.check_if_pitch_names_appear_in_time_range(chord_triad_pitches,
+                                                                               rntxt_chord_onset,
+                                                                               rntxt_chord_offset)
 
     def trim_key_segment_to_end_on_allowable_chord(self, key_segment):
         """ Trim key segment to end on a complete I or V chord
@@ -196,13 +193,12 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
         ----------
         key_segment : KeySegment
         """
-        for rntxt_chord_reverse_idx, rntxt_chord in enumerate(key_segment.rntxt_chords[::-1]):
-            rntxt_chord_idx = len(key_segment.rntxt_chords) - rntxt_chord_reverse_idx - 1
+        for rntxt_chord_idx in reversed(self.get_I_or_V_chord_indices(key_segment.rntxt_chords)):
             if self.check_if_rntxt_chord_is_allowable_end_chord(rntxt_chord_idx, key_segment.rntxt_chords, key_segment):
-                if rntxt_chord_reverse_idx != 0:
-                    rntxt_chord_one_ahead_stop_idx = rntxt_chord_idx + 1
-                    rntxt_chord_one_ahead = key_segment.rntxt_chords[rntxt_chord_one_ahead_stop_idx]
-                    key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(rntxt_chord_one_ahead)
+                rntxt_chord_one_ahead_stop_idx = rntxt_chord_idx + 1
+                if rntxt_chord_one_ahead_stop_idx != len(key_segment.rntxt_chords):
+                    key_segment.set_offset_and_stop_measure_num_w_chord_table(key_segment.rntxt_chords,
+                                                                              rntxt_chord_one_ahead_stop_idx)
                     key_segment.adjust_end_of_rntxt_chords(rntxt_chord_one_ahead_stop_idx)
                 break
 
@@ -215,7 +211,7 @@ class StrictKeySegmentAnnotator(BasicKeySegmentAnnotator):
         Parameters
         ----------
         rntxt_chord_idx : int
-        rntxt_chords : list of music21.roman.RomanNumeral
+        rntxt_chords : ChordTable
         key_segment : KeySegment
         """
         return self.check_if_rntxt_chord_is_allowable_start_or_end_chord(rntxt_chord_idx, rntxt_chords, key_segment)
\ No newline at end of file
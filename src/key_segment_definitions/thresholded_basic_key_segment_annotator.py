@@ -2,7 +2,10 @@
 Definition 1 from thesis.
 """
 
+import numpy as np
+
 from basic_key_segment_annotator import BasicKeySegmentAnnotator
+from chord_table import ChordTable
 from foreign_note_detector import ForeignNoteDetector
 from key_segment import KeySegment
 
@@ -36,6 +39,7 @@ class ThresholdedBasicKeySegmentAnnotator(BasicKeySegmentAnnotator):
             The minimum length a key segment should be in quarter note duration.
         """
         self.rntxt_analysis = rntxt_analysis
+        self.chord_table = ChordTable(rntxt_analysis)
 
         if rntxt_analysis[0].offset != 0.0:
             print("Warning: `rntxt_analysis[0].offset` starts on {}, not 0.0".format(rntxt_analysis[0].offset))
@@ -62,76 +66,64 @@ class ThresholdedBasicKeySegmentAnnotator(BasicKeySegmentAnnotator):
         ----------
         key_segment_indices : list of [int, int]
         """
+        key_segment_indices = np.asarray(key_segment_indices).reshape(-1, 2)
+        key_segment_start_onsets = self.convert_eighth_note_beat_idx_to_onset(key_segment_indices[:, 0])
+        key_segment_stop_offsets = self.convert_eighth_note_beat_idx_to_onset(key_segment_indices[:, 1])
+
+        start_rntxt_chord_indices = self.get_start_rntxt_chord_indices(key_segment_start_onsets)
+        stop_rntxt_chord_indices = self.get_stop_rntxt_chord_indices(key_segment_stop_offsets)
+
         key_segments = []
-        for key_segment_idx in key_segment_indices:
-            start_eighth_note_beat_idx, stop_eighth_note_beat_idx = key_segment_idx[0], key_segment_idx[1]
-            key_segment_start_onset = self.convert_eighth_note_beat_idx_to_onset(start_eighth_note_beat_idx)
-            start_rntxt_chord, start_rntxt_chord_idx = self.get_start_rntxt_chord_and_idx(key_segment_start_onset)
-            key_segment_stop_offset = self.convert_eighth_note_beat_idx_to_onset(stop_eighth_note_beat_idx)
-            stop_rntxt_chord_idx = self.get_stop_rntxt_chord_idx(key_segment_stop_offset)
-            key_segment = KeySegment(key_name=start_rntxt_chord.key.tonicPitchNameWithCase,
+        for key_segment_start_onset, key_segment_stop_offset, start_rntxt_chord_idx, stop_rntxt_chord_idx in zip(key_segment_start_onsets.tolist(),
+                                                                                                                key_segment_stop_offsets.tolist(),
+                                                                                                                start_rntxt_chord_indices.tolist(),
+                                                                                                                stop_rntxt_chord_indices.tolist()):
+            key_segment = KeySegment(key_name=self.chord_table.get_key_name(start_rntxt_chord_idx),
                                      onset=key_segment_start_onset, offset=key_segment_stop_offset,
-                                     start_measure_num=start_rntxt_chord.measureNumber,
+                                     start_measure_num=self.chord_table.get_measure_num(start_rntxt_chord_idx),
                                      score_starts_on_measure_zero=self.score_starts_on_measure_zero,
                                      rntxt_chords_start_idx=start_rntxt_chord_idx,
-                                     rntxt_chords=self.rntxt_analysis[start_rntxt_chord_idx:stop_rntxt_chord_idx])
+                                     rntxt_chords=self.chord_table[start_rntxt_chord_idx:stop_rntxt_chord_idx])
             key_segments.append(key_segment)
 
         return key_segments
 
-    def get_start_rntxt_chord_and_idx(self, key_segment_start_onset):
-        """ Using the onset time of the current key segment in quarters,
-        find the first RomanText chord that occurs in this key segment,
-        as well as the index of this RomanText chord.
+    def get_start_rntxt_chord_indices(self, key_segment_start_onsets):
+        """ Using the onset time of each key segment in quarters, find the
+        index of the first RomanText chord that occurs in each key segment,
+        i.e. the last chord that starts at or before the key segment onset
+        (or the first chord of the song if there is none).
+
+        Uses a binary search over the sorted chord onsets of the song.
 
         Parameters
         ----------
-        key_segment_start_onset : float
+        key_segment_start_onsets : np.ndarray (dtype='float64')
         """
-        prev_rntxt_chord = self.rntxt_analysis[0]
-        start_rntxt_chord = None
-        start_rntxt_chord_idx = 0
-        for idx, rntxt_chord in enumerate(self.rntxt_analysis[1:]):
-            current_rntxt_chord_idx = (idx + 1)
-            if rntxt_chord.offset > key_segment_start_onset:
-                start_rntxt_chord = prev_rntxt_chord
-                start_rntxt_chord_idx = current_rntxt_chord_idx - 1
-                break
-            prev_rntxt_chord = rntxt_chord
-
-        if start_rntxt_chord is None:
-            start_rntxt_chord = self.rntxt_analysis[-1]
-            start_rntxt_chord_idx = len(self.rntxt_analysis) - 1
-
-        return start_rntxt_chord, start_rntxt_chord_idx
-
-    def get_stop_rntxt_chord_idx(self, key_segment_stop_offset):
-        """ Using the offset time of the current key segment in quarters,
-        find the index of the first RomanText chord that occurs immediately
-        after the current key segment. 
+        # position in `onsets[1:]` of the first chord after the onset is the index
+        # (in `onsets`) of the chord just before it.
+        return np.searchsorted(self.chord_table.onsets[1:], key_segment_start_onsets, side='right')
+
+    def get_stop_rntxt_chord_indices(self, key_segment_stop_offsets):
+        """ Using the offset time of each key segment in quarters, find the
+        index of the first RomanText chord (after the first chord of the song)
+        that occurs immediately after each key segment, or the number of
+        chords if there is none.
+
+        Uses a binary search over the sorted chord onsets of the song.
 
         Parameters
         ----------
-        key_segment_stop_offset : float
+        key_segment_stop_offsets : np.ndarray (dtype='float64')
         """
-        stop_rntxt_chord_idx = None 
-        for idx, rntxt_chord in enumerate(self.rntxt_analysis[1:]):
-            current_rntxt_chord_idx = (idx + 1)
-            if rntxt_chord.offset >= key_segment_stop_offset:
-                stop_rntxt_chord_idx = current_rntxt_chord_idx
-                break
-
-        if stop_rntxt_chord_idx is None:
-            stop_rntxt_chord_idx = len(self.rntxt_analysis)
-
-        return stop_rntxt_chord_idx
+        return np.searchsorted(self.chord_table.onsets[1:], key_segment_stop_offsets, side='left') + 1
 
     def convert_eighth_note_beat_idx_to_onset(self, eighth_note_beat_idx):
         """ Convert eighth note beat index to onset time in quarter notes.
 
         Parameters
         ----------
-        eighth_note_beat_idx : int
+        eighth_note_beat_idx : int or np.ndarray
         """
         return eighth_note_beat_idx / 2 
 
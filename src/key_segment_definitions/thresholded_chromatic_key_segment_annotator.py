@@ -2,6 +2,7 @@
 Definition 4 from thesis.
 """
 
+from chord_table import ChordTable
 from foreign_note_detector import ForeignNoteDetector
 from thresholded_relaxed_key_segment_annotator import ThresholdedRelaxedKeySegmentAnnotator
 
@@ -35,6 +36,7 @@ class ThresholdedChromaticKeySegmentAnnotator(ThresholdedRelaxedKeySegmentAnnota
         self.inverted_chord_regex = "(732|742|765|6432|643|642|654|65|6/5|64|6/4|63|6/3|62|6|532|54|5|43|4/3|42|4/2|4|3|2)"
 
         self.rntxt_analysis = rntxt_analysis
+        self.chord_table = ChordTable(rntxt_analysis)
 
         if rntxt_analysis[0].offset != 0.0:
             print("Warning: `rntxt_analysis[0].offset` starts on {}, not 0.0".format(rntxt_analysis[0].offset))
@@ -6,13 +6,13 @@ from argparse import ArgumentParser
 
 import numpy as np
 
-from accuracy_computer_utils import get_consecutive_groups_of_indices, \
-                                    get_key_segments_from_consecutive_idx_groups, \
+from accuracy_computer_utils import get_key_segments_from_threshold_mask, \
                                     remove_songs_to_ignore_from_dict, \
                                     truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
 from file_handlers import NpzFileHandler
 from fragmentation_computer import FragmentationComputer, \
                                    SegmentLengthToFrequencyPlotter
+from threshold_sweeper import ThresholdSweeper
 from whole_segment_key_accuracy_computer import WholeSegmentKeyAccuracyComputer
 
 class ThresholdedMicchiModel:
@@ -39,7 +39,9 @@ class ThresholdedMicchiModel:
 
         self.threshold = threshold
 
-        self.truncate_off_by_one_event_key_probs() 
+        self.truncate_off_by_one_event_key_probs()
+
+        self.threshold_sweeper = None
 
     def truncate_off_by_one_event_key_probs(self):
         """ Several songs contain one more event at end in
@@ -176,6 +178,18 @@ class ThresholdedMicchiModel:
         recall = (num_correctly_predicted_events / total_num_events) * 100.0
         return accuracy, recall, num_correctly_predicted_events, num_predicted_events, total_num_events
 
+    def get_threshold_sweeper(self):
+        """ Get the ThresholdSweeper over all songs, which computes the
+        coverage, accuracy and recall for many thresholds at once. Built
+        on first use.
+        """
+        if self.threshold_sweeper is None:
+            self.threshold_sweeper = ThresholdSweeper(self.event_key_probs_dict,
+                                                      self.event_key_preds_dict,
+                                                      self.ground_truth_key_labels_dict)
+
+        return self.threshold_sweeper
+
     def update_threshold(self, threshold):
         """ Update the threshold.
 
@@ -195,13 +209,10 @@ class ThresholdedMicchiModel:
         for songname in self.event_key_probs_dict:
             song_event_key_probs = self.event_key_probs_dict[songname]
             song_max_key_prob_for_each_event = self.compute_max_key_prob_for_each_event(song_event_key_probs)
-            indices_of_events_w_key_prob_gt_threshold = self.get_indices_of_events_w_max_key_prob_greater_than_or_equal_to_threshold(
-                                                                                                    song_max_key_prob_for_each_event) 
-
-            consecutive_idx_groups = get_consecutive_groups_of_indices(indices_of_events_w_key_prob_gt_threshold[0])
+            threshold_mask = song_max_key_prob_for_each_event >= self.threshold
 
             song_key_pred_for_each_event = self.event_key_preds_dict[songname]
-            key_segments = get_key_segments_from_consecutive_idx_groups(song_key_pred_for_each_event, consecutive_idx_groups)
+            key_segments = get_key_segments_from_threshold_mask(song_key_pred_for_each_event, threshold_mask)
 
             key_segment_indices_dict[songname] = key_segments
 
@@ -235,16 +246,25 @@ def compute_accuracy_and_coverage_for_all_thresholds(thresholded_micchi_model,
     thresholds : list of float
     """
     print("Accuracy and Coverage:")
-    coverages = []
-    accuracies = []
-    for threshold in thresholds:
-        thresholded_micchi_model.update_threshold(threshold)
+    threshold_sweeper = thresholded_micchi_model.get_threshold_sweeper()
 
-        coverage = thresholded_micchi_model.compute_and_output_coverage()
-        coverages.append(coverage)
+    coverages, \
+    accuracies, \
+    recalls, \
+    num_correctly_predicted_events, \
+    num_predicted_events = threshold_sweeper.compute_coverage_accuracy_and_recall(thresholds)
+
+    for threshold_idx, threshold in enumerate(thresholds):
+        thresholded_micchi_model.update_threshold(threshold)
 
-        accuracy = thresholded_micchi_model.compute_and_output_accuracy_and_recall()
-        accuracies.append(accuracy)
+        print("Coverage (threshold = {:.3f}): {:.2f}% ({}/{})".format(threshold,
+                                                                      coverages[threshold_idx],
+                                                                      num_predicted_events[threshold_idx],
+                                                                      threshold_sweeper.total_num_events))
+        print("Accuracy: {:.2f}% ({}/{})".format(accuracies[threshold_idx], num_correctly_predicted_events[threshold_idx],
+                                                 num_predicted_events[threshold_idx]))
+        print("Recall: {:.2f}% ({}/{})".format(recalls[threshold_idx], num_correctly_predicted_events[threshold_idx],
+                                               threshold_sweeper.total_num_events))
 
         print()
 
@@ -9,6 +9,8 @@ from file_handlers import NpzFileHandler
 from key_segment import KeySegment
 from key_segment_indices_writer import KeySegmentIndicesWriter
 from measure_onset_finder import MeasureOnsetFinder
+from parallel_song_annotator import ParallelSongAnnotator
+from parsed_score_cache import DEFAULT_CACHE_DIR, ParsedScoreCache
 from thresholded_basic_key_segment_annotator import ThresholdedBasicKeySegmentAnnotator
 from thresholded_chromatic_key_segment_annotator import ThresholdedChromaticKeySegmentAnnotator
 from thresholded_relaxed_key_segment_annotator import ThresholdedRelaxedKeySegmentAnnotator
@@ -25,7 +27,8 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
 
     def __init__(self, event_key_probs_dict, ground_truth_key_labels_dict,
                  threshold, txt_file_with_mxl_filepaths, predicted_rntxt_filepaths_dir,
-                 key_segment_annotator_class, min_key_segment_quarter_length):
+                 key_segment_annotator_class, min_key_segment_quarter_length,
+                 parsed_score_cache_dir=DEFAULT_CACHE_DIR, num_workers=1):
         """
 
         Parameters
@@ -37,6 +40,11 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
         predicted_rntxt_filepaths_dir : str
         key_segment_annotator_class : str
         min_key_segment_quarter_length : float
+        parsed_score_cache_dir : str
+            If None, the MusicXML and RomanText files are always parsed
+            from source.
+        num_workers : int
+            Number of worker processes to annotate the songs with.
         """
         self.songs_to_ignore = ["Mozart_Wolfgang_Amadeus_-___-_K455"]
 
@@ -52,6 +60,10 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
         self.key_segment_annotator_class = key_segment_annotator_class
         self.min_key_segment_quarter_length = min_key_segment_quarter_length
 
+        self.parsed_score_cache = ParsedScoreCache(parsed_score_cache_dir) if parsed_score_cache_dir else None
+
+        self.parallel_song_annotator = ParallelSongAnnotator(num_workers)
+
         self.key_segment_indices_writer = KeySegmentIndicesWriter(key_segment_annotator_class,
                                                                   micchi_predictions=True,
                                                                   allow_root_position_viio_chords=False,
@@ -109,20 +121,39 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
     def annotate_and_export_key_segments_for_all_songs(self):
         """ Extract and export key segments for all specified songs.
         """
-        for mxl_filepath, rntxt_filepath in zip(self.mxl_filepaths, self.rntxt_filepaths):
-            print("mxl file:", mxl_filepath.split('/')[-1], "rntxt file:", rntxt_filepath.split('/')[-1])
+        songnames = [strip_songname_from_path(mxl_filepath) for mxl_filepath in self.mxl_filepaths]
+        song_outputs = self.parallel_song_annotator.annotate_songs(self, songnames)
 
-            parsed_mxl = load_mxl_file_w_m21(mxl_filepath)
-            rntxt_analysis = load_rntxt_file_w_m21(rntxt_filepath)
+        # merged in song order, so the Npz file is the same for any number of workers
+        for mxl_filepath, song_key_segment_indices in zip(self.mxl_filepaths, song_outputs):
+            if song_key_segment_indices is not None:
+                self.key_segment_indices_writer.add_key_segment_indices_for_song(song_key_segment_indices,
+                                                                                 mxl_filepath)
 
-            songname = strip_songname_from_path(mxl_filepath)
+        self.key_segment_indices_writer.write_songs_to_key_segment_indices_dict_to_npz_file()
 
-            song_thresholded_key_segment_indices = self.thresholded_key_segment_indices_dict[songname]
+    def annotate_and_export_key_segments_for_song_idx(self, song_idx):
+        """ Load a single song and extract its thresholded key segments.
+        Called by `self.parallel_song_annotator`, possibly in a worker
+        process.
 
-            self.annotate_and_export_key_segments_for_song(mxl_filepath, parsed_mxl, rntxt_analysis,
-                                                           song_thresholded_key_segment_indices)
+        Parameters
+        ----------
+        song_idx : int
+            Index of the song in `self.mxl_filepaths`.
+        """
+        mxl_filepath, rntxt_filepath = self.mxl_filepaths[song_idx], self.rntxt_filepaths[song_idx]
+        print("mxl file:", mxl_filepath.split('/')[-1], "rntxt file:", rntxt_filepath.split('/')[-1])
 
-        self.key_segment_indices_writer.write_songs_to_key_segment_indices_dict_to_npz_file()
+        parsed_mxl = load_mxl_file_w_m21(mxl_filepath, self.parsed_score_cache)
+        rntxt_analysis = load_rntxt_file_w_m21(rntxt_filepath, self.parsed_score_cache)
+
+        songname = strip_songname_from_path(mxl_filepath)
+
+        song_thresholded_key_segment_indices = self.thresholded_key_segment_indices_dict[songname]
+
+        return self.annotate_and_export_key_segments_for_song(mxl_filepath, parsed_mxl, rntxt_analysis,
+                                                              song_thresholded_key_segment_indices)
 
     def annotate_and_export_key_segments_for_song(self, mxl_filepath, parsed_mxl, rntxt_analysis,
                                                   thresholded_key_segment_indices):
@@ -134,6 +165,10 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
         parsed_mxl : music21.stream.Score
         rntxt_analysis : music21.stream.iterator.RecursiveIterator
         thresholded_key_segment_indices : list of [int, int]
+
+        Returns
+        -------
+        song_key_segment_indices : np.ndarray
         """
         measure_onset_finder = MeasureOnsetFinder(parsed_mxl)
 
@@ -144,7 +179,7 @@ class ThresholdedMicchiModelKeySegmentAnnotatorAndExporter:
                                                                             min_key_segment_quarter_length=self.min_key_segment_quarter_length)
         key_segments = song_key_segment_annotator.get_key_segments()
 
-        self.key_segment_indices_writer.get_key_segment_indices_for_song(key_segments, mxl_filepath)
+        return self.key_segment_indices_writer.compute_key_segment_indices_for_song(key_segments)
 
 def get_commandline_args():
     """ Get commandline arguments from user.
@@ -189,6 +224,18 @@ def get_commandline_args():
     parser.add_argument('--threshold', type=float,
                         help='Threshold to use for extracting events.')
 
+    parser.add_argument('--parsed_score_cache_dir', type=str, default=DEFAULT_CACHE_DIR,
+                        help='Directory used to cache the parsed MusicXML and '
+                             'RomanText files between runs.')
+    parser.add_argument('--no_parsed_score_cache', action='store_true',
+                        help='Always parse the MusicXML and RomanText files from '
+                             'source instead of using `--parsed_score_cache_dir`.')
+
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes to annotate the songs '
+                             'with. Songs are annotated one at a time in the '
+                             'current process if 1.')
+
     commandline_args = parser.parse_args()
 
     return commandline_args
@@ -209,12 +256,18 @@ if __name__ == '__main__':
 
     threshold = args.threshold
 
+    parsed_score_cache_dir = None if args.no_parsed_score_cache else args.parsed_score_cache_dir
+
+    num_workers = args.workers
+
     thresholded_micchi_model_key_segment_annotator_and_exporter = ThresholdedMicchiModelKeySegmentAnnotatorAndExporter(event_key_probs_dict,
                                                                                                                        ground_truth_key_labels_dict,
                                                                                                                        threshold,
                                                                                                                        txt_file_with_mxl_filepaths,
                                                                                                                        predicted_rntxt_filepaths_dir,
                                                                                                                        key_segment_annotator_class,
-                                                                                                                       min_key_segment_quarter_length)
+                                                                                                                       min_key_segment_quarter_length,
+                                                                                                                       parsed_score_cache_dir,
+                                                                                                                       num_workers)
 
     thresholded_micchi_model_key_segment_annotator_and_exporter.annotate_and_export_key_segments_for_all_songs()
\ No newline at end of file
@@ -1,6 +1,8 @@
 """ Implementation of Clear Key Segment Definition 8 from thesis.
 """
 
+import numpy as np
+
 from basic_key_segment_annotator import BasicKeySegmentAnnotator
 from key_segment import KeySegment
 
@@ -10,26 +12,44 @@ class TonicizationKeySegmentAnnotator(BasicKeySegmentAnnotator):
     that does not contain tonicization events."
     """
 
-    def get_key_segments(self):
+    def get_key_segments(self, modulation_key_segments=None):
         """ Get all key segments from current song that satisfy the criteria for
         Definition 8.
+
+        Parameters
+        ----------
+        modulation_key_segments : list of KeySegment
+            Unused, since Definition 8 doesn't split the song on annotated
+            modulations. Accepted for consistency with the other definitions.
         """
+        tonicization_chords_mask = self.chord_table.compute_chord_mask(self.check_if_rntxt_chord_is_tonicization_chord)
+
+        # a key segment starts at the first chord of each run of non-tonicization chords
+        # and stops at the next tonicization chord (or the end of the score).
+        padded_non_tonicization_chords_mask = np.concatenate(([False], ~tonicization_chords_mask, [False]))
+        run_boundaries = np.flatnonzero(padded_non_tonicization_chords_mask[1:] != padded_non_tonicization_chords_mask[:-1])
+
         key_segments = []
-        current_key_segment = None
-        for rntxt_chord_idx, rntxt_chord in enumerate(self.rntxt_analysis):
-            is_tonicization_chord = self.foreign_note_detector.check_if_is_tonicization_chord(rntxt_chord.figure)
-            if is_tonicization_chord and current_key_segment:
-                current_key_segment.set_offset_and_stop_measure_num_w_rntxt_chord(rntxt_chord)
-                key_segments.append(current_key_segment)
-                current_key_segment = None
-            elif not is_tonicization_chord and current_key_segment is None:
-                current_key_segment = KeySegment(first_rntxt_chord=rntxt_chord,
-                                                 score_starts_on_measure_zero=self.score_starts_on_measure_zero,
-                                                 rntxt_chords_start_idx=rntxt_chord_idx) 
-
-        if current_key_segment:
-            current_key_segment.set_offset_and_stop_measure_num(self.end_of_score_offset, self.last_measure_num)
-            current_key_segment.set_rntxt_chords(self.rntxt_analysis, len(self.rntxt_analysis))
-            key_segments.append(current_key_segment)
-
-        return key_segments
\ No newline at end of file
+        for start_idx, stop_idx in zip(run_boundaries[0::2].tolist(), run_boundaries[1::2].tolist()):
+            key_segment = KeySegment(score_starts_on_measure_zero=self.score_starts_on_measure_zero,
+                                     rntxt_chords_start_idx=start_idx)
+            key_segment.initialize_key_segment_using_chord_table(self.chord_table, start_idx)
+
+            if stop_idx == len(self.chord_table):
+                key_segment.set_offset_and_stop_measure_num(self.end_of_score_offset, self.last_measure_num)
+                key_segment.set_rntxt_chords(self.chord_table, len(self.chord_table))
+            else:
+                key_segment.set_offset_and_stop_measure_num_w_chord_table(self.chord_table, stop_idx)
+            key_segments.append(key_segment)
+
+        return key_segments
+
+    def check_if_rntxt_chord_is_tonicization_chord(self, rntxt_chord):
+        """ Check if a RomanText chord is a tonicization chord
+        (e.g. V/V).
+
+        Parameters
+        ----------
+        rntxt_chord : music21.roman.RomanNumeral
+        """
+        return self.foreign_note_detector.check_if_is_tonicization_chord(rntxt_chord.figure)
@@ -31,24 +31,37 @@ def check_and_make_output_dir(filepath):
     if not os.path.isdir(file_dir):
         os.mkdir(file_dir)
 
-def load_mxl_file_w_m21(mxl_filepath):
+def load_mxl_file_w_m21(mxl_filepath, parsed_score_cache=None):
     """ Parse MusicXML file using music21.
 
     Parameters
     ----------
     mxl_filepath : str
+    parsed_score_cache : ParsedScoreCache
+        If given, the parsed score is read from/added to this cache.
     """
+    if parsed_score_cache is not None:
+        return parsed_score_cache.load_score(mxl_filepath)
+
     parsed_mxl = m21.converter.parse(mxl_filepath)
     return parsed_mxl
 
-def load_rntxt_file_w_m21(rntxt_filepath):
+def load_rntxt_file_w_m21(rntxt_filepath, parsed_score_cache=None):
     """ Parse RomanText file using music21.
 
     Parameters
     ----------
     rntxt_filepath : str
+    parsed_score_cache : ParsedScoreCache
+        If given, the parsed RomanText score is read from/added to
+        this cache. The whole score is cached (not only the flattened
+        RomanNumeral list) since the measure numbers of the chords are
+        looked up through their enclosing measures.
     """
-    rntxt_analysis = m21.converter.parse(rntxt_filepath, format='romanText')
+    if parsed_score_cache is not None:
+        rntxt_analysis = parsed_score_cache.load_score(rntxt_filepath, parse_format='romanText')
+    else:
+        rntxt_analysis = m21.converter.parse(rntxt_filepath, format='romanText')
     return rntxt_analysis.flat.getElementsByClass('RomanNumeral')
 
 def load_filepaths_from_txt_file(txt_file_with_filepaths):
@@ -4,9 +4,11 @@ whole segment event-based accuracy for all songs.
 
 import numpy as np
 
-from accuracy_computer_utils import compute_key_segment_length, \
-                                    truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
+from accuracy_computer_utils import truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
 from fragmentation_computer import FragmentationComputer
+from segment_reducer import compute_whole_segment_stats, \
+                            compute_whole_segment_stats_for_songs, \
+                            convert_to_segment_indices_array
 
 class SongWholeSegmentKeyAccuracyComputer:
     """ Compute and output the whole segment accuracy and the
@@ -36,20 +38,23 @@ class SongWholeSegmentKeyAccuracyComputer:
 
         self.verbose = verbose
 
-    def get_correct_whole_segments(self):
+    def get_correct_whole_segments(self, segment_is_correct=None):
         """ Get the list of key segments that are predicted
         entirely correctly.
-        """
-        correct_whole_segments = []
-        for key_segment_idx in self.key_segment_indices:
-            start_idx, stop_idx = key_segment_idx[0], key_segment_idx[1]
-            pred_event_key_segment_labels = self.event_key_predictions[start_idx:stop_idx]
-            ground_truth_event_key_segment_labels = self.ground_truth_event_key_labels[start_idx:stop_idx]
 
-            if np.all(pred_event_key_segment_labels == ground_truth_event_key_segment_labels):
-                correct_whole_segments.append(key_segment_idx)
+        Parameters
+        ----------
+        segment_is_correct : np.ndarray (dtype='bool', shape=(no. key segments,))
+            Whether each key segment is predicted entirely correctly, if it
+            was already computed for all songs at once. Computed for this
+            song if None.
+        """
+        if segment_is_correct is None:
+            segment_is_correct, _ = compute_whole_segment_stats(self.event_key_predictions,
+                                                                self.ground_truth_event_key_labels,
+                                                                self.key_segment_indices)
 
-        return correct_whole_segments
+        return convert_to_segment_indices_array(self.key_segment_indices)[segment_is_correct]
 
     def compute_whole_segment_key_accuracy_stats(self, correct_whole_key_segment_indices):
         """ Compute the statistics needed to compute the whole segment accuracy
@@ -76,11 +81,9 @@ class SongWholeSegmentKeyAccuracyComputer:
         ----------
         key_segments : list of [int, int]
         """
-        num_segment_events = 0
-        for key_segment in key_segments:
-            num_segment_events += compute_key_segment_length(key_segment)
+        key_segments = convert_to_segment_indices_array(key_segments)
 
-        return num_segment_events
+        return int(np.sum(key_segments[:, 1] - key_segments[:, 0]))
 
     def compute_and_output_whole_segment_key_accuracies(self, song_num_correct_whole_segments,
                                                         song_num_segments,
@@ -141,11 +144,41 @@ class WholeSegmentKeyAccuracyComputer:
 
         self.correct_whole_key_segments_dict = {}
 
+    def compute_segment_is_correct_for_all_songs(self):
+        """ Find whether each key segment of each song is predicted entirely
+        correctly, for all songs at once.
+
+        Returns
+        -------
+        songs_segment_is_correct : dict of { str : np.ndarray (dtype='bool') }
+            Only contains the songs in `self.key_segment_indices_dict`.
+        """
+        if not self.key_segment_indices_dict:
+            return {}
+
+        songnames = [songname for songname in self.song_event_key_preds_dict
+                     if songname in self.key_segment_indices_dict]
+
+        segment_is_correct, \
+        _, \
+        song_segment_offsets = compute_whole_segment_stats_for_songs(
+                                        [self.song_event_key_preds_dict[songname] for songname in songnames],
+                                        [self.ground_truth_key_labels_dict[songname] for songname in songnames],
+                                        [self.key_segment_indices_dict[songname] for songname in songnames])
+
+        songs_segment_is_correct = {}
+        for song_idx, songname in enumerate(songnames):
+            songs_segment_is_correct[songname] = segment_is_correct[song_segment_offsets[song_idx]:song_segment_offsets[song_idx+1]]
+
+        return songs_segment_is_correct
+
     def compute_whole_segment_key_accuracies_for_each_song(self):
         """ Compute the statistics needed to compute the whole segment
         accuracy and the whole segment event-based accuracy for all
         songs in consideration.
         """
+        songs_segment_is_correct = self.compute_segment_is_correct_for_all_songs()
+
         for songname in self.song_event_key_preds_dict: 
 
             if self.verbose:
@@ -169,7 +202,8 @@ class WholeSegmentKeyAccuracyComputer:
                                                                 song_key_segment_indices,
                                                                 self.verbose)
 
-            correct_whole_key_segments = song_whole_segment_key_accuracy_computer.get_correct_whole_segments()
+            correct_whole_key_segments = song_whole_segment_key_accuracy_computer.get_correct_whole_segments(
+                                                                songs_segment_is_correct.get(songname))
 
             self.correct_whole_key_segments_dict[songname] = correct_whole_key_segments 
 
@@ -6,6 +6,7 @@ from argparse import ArgumentParser
 
 import numpy as np
 
+from corpus_metrics_kernel import CorpusMetricsKernel
 from file_handlers import NpzFileHandler
 from utils import convert_key_indices_to_excluded_events_vector, \
                   exclude_specified_events_from_event_key_labels, \
@@ -120,11 +121,12 @@ class SongClearKeyPrecisionRecallComputer:
 class ClearKeyPrecisionRecallComputer:
     """ Compute the clear key precision and recall for each song.
     Also compute and output the overall clear key precision and recall.
+    The per-song counts are read from a `CorpusMetricsKernel`.
     """
 
     def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict,
                  ground_truth_key_segment_excluded_events, predicted_key_segment_excluded_events,
-                 verbose=False):
+                 verbose=False, metrics_kernel=None):
         """
 
         Parameters
@@ -134,6 +136,9 @@ class ClearKeyPrecisionRecallComputer:
         ground_truth_key_segment_excluded_events : dict of { str : np.ndarray }
         predicted_key_segment_excluded_events : { str : np.ndarray }
         verbose : bool
+        metrics_kernel : CorpusMetricsKernel
+            Kernel for the same predictions and ground truth labels, shared with
+            other results computers. Created if None.
         """
         assert song_event_key_preds_dict.keys() == ground_truth_key_labels_dict.keys()
 
@@ -150,31 +155,32 @@ class ClearKeyPrecisionRecallComputer:
 
         self.verbose = verbose
 
+        if metrics_kernel is None:
+            metrics_kernel = CorpusMetricsKernel(song_event_key_preds_dict, ground_truth_key_labels_dict)
+        self.metrics_kernel = metrics_kernel
+
     def compute_precision_and_recall_for_each_song(self):
         """ Compute the clear key precision and recall for each song.
         """
+        songs_num_correct_pred_events_in_gt_segments, \
+        songs_total_num_pred_events, \
+        songs_total_num_gt_events = self.metrics_kernel.compute_precision_recall_metrics(self.ground_truth_key_segment_excluded_events,
+                                                                                         self.predicted_key_segment_excluded_events)
+
         for songname in self.song_event_key_preds_dict:
             if self.verbose:
                 print("Song:", songname)
 
-            song_event_key_preds = self.song_event_key_preds_dict[songname]
-            song_gt_key_labels = self.ground_truth_key_labels_dict[songname]
+            for key_segment_boundaries_dict in [self.ground_truth_key_segment_excluded_events,
+                                                self.predicted_key_segment_excluded_events]:
+                if songname not in key_segment_boundaries_dict:
+                    raise KeyError(songname)
 
-            song_gt_key_segment_events = self.ground_truth_key_segment_excluded_events[songname]
-            song_predicted_key_segment_excluded_events = self.predicted_key_segment_excluded_events[songname]
+            song_idx = self.metrics_kernel.song_indices[songname]
 
-            song_key_precision_recall_computer = SongClearKeyPrecisionRecallComputer(song_event_key_preds,
-                                                                                     song_gt_key_labels,
-                                                                                     song_gt_key_segment_events,
-                                                                                     song_predicted_key_segment_excluded_events)
-
-            num_correct_pred_events_in_gt_segments, \
-            total_num_pred_events, \
-            total_num_gt_events = song_key_precision_recall_computer.compute_key_precision_recall_stats()
-
-            song_key_precision_recall_computer.compute_key_event_level_precision_and_recall(num_correct_pred_events_in_gt_segments,
-                                                                                            total_num_pred_events,
-                                                                                            total_num_gt_events)
+            num_correct_pred_events_in_gt_segments = songs_num_correct_pred_events_in_gt_segments[song_idx]
+            total_num_pred_events = songs_total_num_pred_events[song_idx]
+            total_num_gt_events = songs_total_num_gt_events[song_idx]
 
             self.overall_num_correct_pred_events_in_gt_segments += num_correct_pred_events_in_gt_segments
             self.overall_total_num_pred_events += total_num_pred_events
@@ -195,6 +201,9 @@ class ClearKeyPrecisionRecallComputer:
                                                       self.overall_total_num_gt_events))
         print()
 
+        return (self.overall_num_correct_pred_events_in_gt_segments, self.overall_total_num_pred_events,
+                self.overall_total_num_gt_events)
+
 def get_commandline_args():
     """ Get commandline argument values from user.
     """
@@ -0,0 +1,249 @@
+""" Compute the results in Tables 6.1, 6.3, 6.5 and 6.7 of the thesis
+for several clear key segment definitions in one process.
+
+The event key predictions and ground truth key labels are shared by
+every definition, so they are read (and the one-hot predictions are
+converted to key labels) only once, instead of once per definition and
+table as in `clear_key_segment_results_computer.sh` and friends. The
+definitions can be computed in parallel, and all of the results are
+written to one JSON file.
+"""
+
+from argparse import ArgumentParser
+
+from clear_key_segment_results_computer import ClearKeySegmentResultsComputer
+from file_handlers import CorpusStoreFileHandler, JsonFileHandler, NpzFileHandler
+from utils import convert_one_hot_vector_events_to_event_key_labels, SONGS_TO_IGNORE
+from worker_pool import run_in_worker_pool
+
+TABLES = ["6.1", "6.3", "6.5", "6.7"]
+
+class ClearKeySegmentBatchResultsComputer:
+    """ Compute the results in Tables 6.1, 6.3, 6.5 and 6.7 of the thesis
+    for several clear key segment definitions, sharing the event key
+    predictions and ground truth key labels between all of them.
+    """
+
+    def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict, num_workers=1,
+                 verbose=False):
+        """
+
+        Parameters
+        ----------
+        song_event_key_preds_dict : dict of { str : np.ndarray (dtype='float32', shape=(no. events, 24 keys)) }
+            Each event is a one-hot vector.
+        ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
+        num_workers : int
+            Number of worker processes. If 1 (or less), the definitions are
+            computed one at a time in the current process.
+        verbose : bool
+        """
+        self.song_event_key_pred_labels_dict = convert_one_hot_vector_events_to_event_key_labels(song_event_key_preds_dict)
+        self.ground_truth_key_labels_dict = ground_truth_key_labels_dict
+
+        self.num_workers = num_workers
+        self.verbose = verbose
+
+        self.npz_file_handler = NpzFileHandler()
+
+    def read_key_segment_boundaries(self, key_segment_boundaries_npz_path):
+        """ Read a key segment boundaries NPZ file, if there is one.
+
+        Parameters
+        ----------
+        key_segment_boundaries_npz_path : str
+            None for definition 9.
+        """
+        if not key_segment_boundaries_npz_path:
+            return None
+
+        return self.npz_file_handler.read_npz_file(key_segment_boundaries_npz_path)
+
+    def compute_definition_results(self, key_segment_definition, tables):
+        """ Compute and output the results tables for one definition.
+
+        Parameters
+        ----------
+        key_segment_definition : (str, str, str)
+            Definition name, predicted key segment boundaries NPZ path and
+            ground truth key segment boundaries NPZ path.
+        tables : list of str
+
+        Returns
+        -------
+        definition_results : dict of { str : dict }
+            Results of each table.
+        """
+        _, pred_key_segment_boundaries_npz_path, ground_truth_key_segment_boundaries_npz_path = key_segment_definition
+
+        pred_key_segment_boundaries_dict = self.read_key_segment_boundaries(pred_key_segment_boundaries_npz_path)
+        ground_truth_key_segment_boundaries_dict = self.read_key_segment_boundaries(ground_truth_key_segment_boundaries_npz_path)
+
+        definition_results = {}
+        for table in tables:
+            print("Table {}:".format(table))
+
+            # Computing Tables 6.3-6.7 for definition 9 fills in the predicted key segment
+            # boundaries, so each table gets its own results computer.
+            clear_key_segment_results_computer = ClearKeySegmentResultsComputer(self.song_event_key_pred_labels_dict,
+                                                                                self.ground_truth_key_labels_dict.copy(),
+                                                                                pred_key_segment_boundaries_dict,
+                                                                                ground_truth_key_segment_boundaries_dict,
+                                                                                verbose=self.verbose,
+                                                                                convert_event_key_preds=False)
+            if table == "6.1":
+                definition_results[table] = clear_key_segment_results_computer.compute_clear_key_segment_results()
+            elif table == "6.3":
+                definition_results[table] = clear_key_segment_results_computer.compute_fragmentation_for_clear_key_segments()
+            elif table == "6.5":
+                definition_results[table] = clear_key_segment_results_computer.compute_whole_key_segment_results()
+            elif table == "6.7":
+                definition_results[table] = clear_key_segment_results_computer.compute_fragmentation_for_whole_key_segments()
+
+        return definition_results
+
+    def compute_results(self, key_segment_definitions, tables=TABLES):
+        """ Compute and output the results tables for every definition.
+        The output is printed in definition order regardless of the order
+        the workers finish in.
+
+        Parameters
+        ----------
+        key_segment_definitions : list of (str, str, str)
+            Definition name, predicted key segment boundaries NPZ path and
+            ground truth key segment boundaries NPZ path of each definition.
+        tables : list of str
+
+        Returns
+        -------
+        all_results : list of dict
+            The paths and results of each definition that succeeded, in
+            the order of `key_segment_definitions`.
+        """
+        definition_outcomes = run_in_worker_pool(self, "compute_definition_results", key_segment_definitions,
+                                                 self.num_workers, method_args=(tables,))
+
+        all_results = []
+        for definition_idx, (key_segment_definition, definition_outcome) in enumerate(zip(key_segment_definitions,
+                                                                                         definition_outcomes)):
+            definition_name, pred_key_segment_boundaries_npz_path, ground_truth_key_segment_boundaries_npz_path = key_segment_definition
+            definition_output, definition_results, definition_error = definition_outcome
+
+            if definition_idx > 0:
+                print("\n")
+            print("Definition {}".format(definition_name))
+            print(definition_output, end='')
+
+            if definition_error is not None:
+                print("Error: Failed to compute the results for definition {}\n{}".format(definition_name, definition_error))
+                continue
+
+            all_results.append({
+                "definition": definition_name,
+                "pred_key_segment_boundaries_npz_path": pred_key_segment_boundaries_npz_path,
+                "ground_truth_key_segment_boundaries_npz_path": ground_truth_key_segment_boundaries_npz_path,
+                "tables": definition_results,
+            })
+
+        return all_results
+
+def read_key_segment_definitions(key_segment_definitions_txt_path):
+    """ Read the definitions to compute results for. Each line of the
+    file has a definition name, the path of its predicted key segment
+    boundaries NPZ file and the path of its ground truth key segment
+    boundaries NPZ file, separated by whitespace. A line with only a
+    definition name (i.e. definition 9) uses all events as a single key
+    segment. Empty lines and lines starting with '#' are skipped.
+
+    Parameters
+    ----------
+    key_segment_definitions_txt_path : str
+
+    Returns
+    -------
+    key_segment_definitions : list of (str, str, str)
+    """
+    key_segment_definitions = []
+    with open(key_segment_definitions_txt_path, 'r') as key_segment_definitions_txt_file:
+        for line in key_segment_definitions_txt_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            line_fields = line.split()
+            if len(line_fields) == 1:
+                key_segment_definitions.append((line_fields[0], None, None))
+            elif len(line_fields) == 3:
+                key_segment_definitions.append(tuple(line_fields))
+            else:
+                raise ValueError("Expected a definition name and 0 or 2 NPZ paths, got: {}".format(line))
+
+    return key_segment_definitions
+
+def get_commandline_args():
+    """ Get commandline arguments from user.
+    """
+    parser = ArgumentParser(description='Compute the results included in Tables 6.1, 6.3, 6.5 and 6.7 '
+                                        'of thesis for several clear key segment definitions at once.')
+    parser.add_argument('--event_key_preds_npz_path', type=str,
+                        help='Path to .npz file containing the event key '
+                             'predictions for all of the events in a song.')
+    parser.add_argument('--ground_truth_event_key_labels_npz_path', type=str,
+                        help='Path to .npz file containing the ground '
+                             'truth key labels for the same songs as '
+                             '`--event_key_preds_npz_path`.')
+    parser.add_argument('--corpus_store_dir', type=str,
+                        help='Path to a corpus store (see `corpus_store_writer.py`) '
+                             'with `event_key_preds` and `ground_truth_event_key_labels` '
+                             'fields to read instead of the two .npz files.')
+    parser.add_argument('--key_segment_definitions_txt_path', type=str,
+                        help='Path to .txt file where each line contains a '
+                             'definition name, the path to its predicted key '
+                             'segment boundaries .npz file and the path to '
+                             'its ground truth key segment boundaries .npz '
+                             'file. Leave out both paths for definition 9.')
+    parser.add_argument('--tables', type=str, nargs='+',
+                        choices=TABLES, default=TABLES,
+                        help='Tables to compute for each definition.')
+    parser.add_argument('--results_json_path', type=str,
+                        default='out/clear_key_segment_results.json',
+                        help='Path to .json file to write the results of '
+                             'all definitions to.')
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help='Number of worker processes to compute the '
+                             'definitions with. 1 computes them one at a '
+                             'time in the current process.')
+    commandline_args = parser.parse_args()
+
+    return commandline_args
+
+if __name__ == '__main__':
+    args = get_commandline_args()
+
+    if args.corpus_store_dir:
+        corpus_store_file_handler = CorpusStoreFileHandler()
+        song_event_key_preds_dict = corpus_store_file_handler.read_corpus_store_field(args.corpus_store_dir,
+                                                                                      "event_key_preds")
+        ground_truth_key_labels_dict = corpus_store_file_handler.read_corpus_store_field(args.corpus_store_dir,
+                                                                                         "ground_truth_event_key_labels")
+    else:
+        npz_file_handler = NpzFileHandler()
+        song_event_key_preds_dict = npz_file_handler.read_npz_file(args.event_key_preds_npz_path, lazy=True, mmap=True,
+                                                                   songs_to_ignore=SONGS_TO_IGNORE)
+        ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_event_key_labels_npz_path, lazy=True,
+                                                                      mmap=True, songs_to_ignore=SONGS_TO_IGNORE)
+
+    key_segment_definitions = read_key_segment_definitions(args.key_segment_definitions_txt_path)
+
+    clear_key_segment_batch_results_computer = ClearKeySegmentBatchResultsComputer(song_event_key_preds_dict,
+                                                                                   ground_truth_key_labels_dict,
+                                                                                   num_workers=args.num_workers)
+    all_results = clear_key_segment_batch_results_computer.compute_results(key_segment_definitions, args.tables)
+
+    json_file_handler = JsonFileHandler()
+    json_file_handler.write_content_to_json_file({
+        "corpus_store_dir": args.corpus_store_dir,
+        "event_key_preds_npz_path": args.event_key_preds_npz_path,
+        "ground_truth_event_key_labels_npz_path": args.ground_truth_event_key_labels_npz_path,
+        "results": all_results,
+    }, args.results_json_path)
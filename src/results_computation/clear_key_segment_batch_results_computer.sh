@@ -0,0 +1,7 @@
+# Tables 6.1, 6.3, 6.5 and 6.7 for all clear key segment definitions
+python3 clear_key_segment_batch_results_computer.py --event_key_preds_npz_path 'in/meta-corpus_validation_frog_event_key_preds_2022-05-12_17-00-11.npz' \
+                                                    --ground_truth_event_key_labels_npz_path 'in/meta-corpus_validation_ground_truth_event_key_labels.npz' \
+                                                    --key_segment_definitions_txt_path 'in/clear_key_segment_definitions.txt' \
+                                                    --tables '6.1' '6.3' '6.5' '6.7' \
+                                                    --results_json_path 'out/clear_key_segment_results.json' \
+                                                    --num_workers 4
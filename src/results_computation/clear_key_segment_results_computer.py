@@ -29,11 +29,13 @@ from argparse import ArgumentParser
 
 from clear_key_precision_recall_computer import ClearKeyPrecisionRecallComputer
 from complete_piece_recall_coverage_computer import CompletePieceRecallCoverageComputer
+from corpus_metrics_kernel import CorpusMetricsKernel
 from event_key_accuracy_computer import EventKeyAccuracyComputer
 from file_handlers import NpzFileHandler
 from fragmentation_computer import FragmentationComputer
 from utils import convert_one_hot_vector_events_to_event_key_labels, \
-                  remove_songs_to_ignore_from_dict
+                  remove_songs_to_ignore_from_dict, \
+                  SONGS_TO_IGNORE
 from whole_segment_key_accuracy_computer import WholeSegmentKeyAccuracyComputer
 
 class ClearKeySegmentResultsComputer:
@@ -45,13 +47,14 @@ class ClearKeySegmentResultsComputer:
     def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict,
                  pred_key_segment_boundaries_dict,
                  ground_truth_key_segment_boundaries_dict,
-                 verbose=False):
+                 verbose=False, convert_event_key_preds=True):
         """
 
         Parameters
         ----------
         song_event_key_preds_dict : dict of { str : np.ndarray (dtype='float32', shape=(no. events, 24 keys)) }
-            Each event is a one-hot vector.
+            Each event is a one-hot vector. If `convert_event_key_preds` is false, each event
+            is instead the predicted key label (i.e. shape=(no. events,)).
         ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
             Each event is the ground truth key label (i.e. a number in the range [0, 23]) for that event.
         pred_key_segment_boundaries_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
@@ -59,10 +62,16 @@ class ClearKeySegmentResultsComputer:
         ground_truth_key_segment_boundaries_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
             Each row contains the start and end event index of each key segment.
         verbose : bool
+        convert_event_key_preds : bool
+            False if the one-hot vectors have already been converted to key labels (e.g. once
+            for all definitions by `ClearKeySegmentBatchResultsComputer`).
         """
-        self.songs_to_ignore = ["Mozart_Wolfgang_Amadeus_-___-_K455"]
+        self.songs_to_ignore = list(SONGS_TO_IGNORE)
 
-        self.song_event_key_pred_labels_dict = convert_one_hot_vector_events_to_event_key_labels(song_event_key_preds_dict)
+        if convert_event_key_preds:
+            self.song_event_key_pred_labels_dict = convert_one_hot_vector_events_to_event_key_labels(song_event_key_preds_dict)
+        else:
+            self.song_event_key_pred_labels_dict = song_event_key_preds_dict.copy()
         self.song_event_key_pred_labels_dict = remove_songs_to_ignore_from_dict(self.songs_to_ignore, self.song_event_key_pred_labels_dict)
         self.ground_truth_key_labels_dict = remove_songs_to_ignore_from_dict(self.songs_to_ignore, ground_truth_key_labels_dict)
 
@@ -78,6 +87,10 @@ class ClearKeySegmentResultsComputer:
 
         self.verbose = verbose
 
+        # shared by all of the results computers, so that the events of each
+        # set of key segment boundaries are only reduced once
+        self.metrics_kernel = CorpusMetricsKernel(self.song_event_key_pred_labels_dict, self.ground_truth_key_labels_dict)
+
     def compute_clear_key_segment_results(self):
         """ Compute the results in Table 6.1 of thesis.
 
@@ -87,19 +100,26 @@ class ClearKeySegmentResultsComputer:
         ground truth C-KS; Recall with respect to the complete piece;
         Coverage is the proportion of a complete piece covered by
         predicted C-KS.
+
+        Returns
+        -------
+        clear_key_segment_results : dict of { str : dict of { str : float or int } }
         """
         print("True boundaries accuracy:")
         ground_truth_event_key_acc_computer = EventKeyAccuracyComputer(self.song_event_key_pred_labels_dict,
                                                                        self.ground_truth_key_labels_dict,
                                                                        self.ground_truth_key_segment_boundaries_dict,
-                                                                       self.verbose)
-        ground_truth_event_key_acc_computer.compute_event_level_key_accuracy_for_all_songs()
+                                                                       self.verbose,
+                                                                       metrics_kernel=self.metrics_kernel)
+        num_correct_events_in_ground_truth_segments, \
+        num_events_in_ground_truth_segments = ground_truth_event_key_acc_computer.compute_event_level_key_accuracy_for_all_songs()
 
         print("System boundaries accuracy:")
         predicted_event_key_acc_computer = EventKeyAccuracyComputer(self.song_event_key_pred_labels_dict,
                                                                     self.ground_truth_key_labels_dict,
                                                                     self.pred_key_segment_boundaries_dict,
-                                                                    verbose=self.verbose)
+                                                                    verbose=self.verbose,
+                                                                    metrics_kernel=self.metrics_kernel)
 
         num_correctly_predicted_events, \
         num_events_in_predicted_segments = predicted_event_key_acc_computer.compute_event_level_key_accuracy_for_all_songs()
@@ -107,20 +127,70 @@ class ClearKeySegmentResultsComputer:
         print("Clear key segments precision and recall:")
         if self.check_if_computing_def9_results():
             self.compute_def9_precision_and_recall(num_correctly_predicted_events, num_events_in_predicted_segments)
+            num_correct_pred_events_in_gt_segments = num_correctly_predicted_events
+            num_pred_events = num_events_in_predicted_segments
+            num_gt_events = num_events_in_predicted_segments
         else:
             clear_key_precision_recall_computer = ClearKeyPrecisionRecallComputer(self.song_event_key_pred_labels_dict,
                                                                                   self.ground_truth_key_labels_dict,
                                                                                   self.ground_truth_key_segment_boundaries_dict,
                                                                                   self.pred_key_segment_boundaries_dict,
-                                                                                  self.verbose)
-            clear_key_precision_recall_computer.compute_precision_and_recall_for_all_songs()
+                                                                                  self.verbose,
+                                                                                  metrics_kernel=self.metrics_kernel)
+            num_correct_pred_events_in_gt_segments, \
+            num_pred_events, \
+            num_gt_events = clear_key_precision_recall_computer.compute_precision_and_recall_for_all_songs()
 
         print("Complete piece recall and coverage:")
         complete_piece_recall_coverage_computer = CompletePieceRecallCoverageComputer(num_correctly_predicted_events,
                                                                                       num_events_in_predicted_segments,
-                                                                                      self.ground_truth_key_labels_dict)
+                                                                                      self.ground_truth_key_labels_dict,
+                                                                                      metrics_kernel=self.metrics_kernel)
         complete_piece_recall_coverage_computer.compute_and_output_recall_and_coverage()
 
+        total_num_events = complete_piece_recall_coverage_computer.total_num_events
+
+        return {
+            "true_boundaries_accuracy": self.get_percentage_result(num_correct_events_in_ground_truth_segments,
+                                                                   num_events_in_ground_truth_segments),
+            "system_boundaries_accuracy": self.get_percentage_result(num_correctly_predicted_events,
+                                                                     num_events_in_predicted_segments),
+            "precision": self.get_percentage_result(num_correct_pred_events_in_gt_segments, num_pred_events),
+            "recall": self.get_percentage_result(num_correct_pred_events_in_gt_segments, num_gt_events),
+            "complete_piece_recall": self.get_percentage_result(num_correctly_predicted_events, total_num_events),
+            "coverage": self.get_percentage_result(num_events_in_predicted_segments, total_num_events),
+        }
+
+    def get_percentage_result(self, count, total_count):
+        """ Create a machine-readable result for a percentage computed
+        as (`count` / `total_count`) * 100.
+
+        Parameters
+        ----------
+        count : int
+        total_count : int
+        """
+        return {
+            "percentage": (int(count) / int(total_count)) * 100.0,
+            "count": int(count),
+            "total_count": int(total_count),
+        }
+
+    def get_fragmentation_result(self, avg_segment_len, total_num_segment_events, num_segments):
+        """ Create a machine-readable fragmentation result.
+
+        Parameters
+        ----------
+        avg_segment_len : float
+        total_num_segment_events : int
+        num_segments : int
+        """
+        return {
+            "avg_segment_len": float(avg_segment_len),
+            "total_num_segment_events": int(total_num_segment_events),
+            "num_segments": int(num_segments),
+        }
+
     def check_if_computing_def9_results(self):
         """ If both key segment boundaries dictionaries are empty,
         this means we are computing the precision and recall for
@@ -154,12 +224,19 @@ class ClearKeySegmentResultsComputer:
         Length of C-KS; total number of Segment Events in C-KS; total
         number of C-KS Segments. Each event is the length of an eighth
         note.
+
+        Returns
+        -------
+        fragmentation_results : dict of { str : dict of { str : float or int } }
         """
         if self.pred_key_segment_boundaries_dict is None:
             self.pred_key_segment_boundaries_dict = self.get_pred_key_segment_boundaries_dict_for_all_events()
 
         fragmentation_computer = FragmentationComputer(self.pred_key_segment_boundaries_dict)
-        fragmentation_computer.compute_and_output_avg_segment_len()
+
+        return {
+            "fragmentation": self.get_fragmentation_result(*fragmentation_computer.compute_and_output_avg_segment_len()),
+        }
 
     def compute_whole_key_segment_results(self):
         """ Compute the results in Table 6.5 of thesis.
@@ -168,6 +245,10 @@ class ClearKeySegmentResultsComputer:
         Segment Accuracy; Whole Segment Event-Level Accuracy. Extracted
         segment is correct if the key labels for all events in the
         segment are correct.
+
+        Returns
+        -------
+        whole_key_segment_results : dict of { str : dict of { str : float or int } }
         """
         if self.pred_key_segment_boundaries_dict is None:
             self.pred_key_segment_boundaries_dict = self.get_pred_key_segment_boundaries_dict_for_all_events()
@@ -175,9 +256,19 @@ class ClearKeySegmentResultsComputer:
         whole_segment_key_acc_computer = WholeSegmentKeyAccuracyComputer(self.song_event_key_pred_labels_dict,
                                                                          self.ground_truth_key_labels_dict,
                                                                          self.pred_key_segment_boundaries_dict,
-                                                                         self.verbose)
+                                                                         self.verbose,
+                                                                         metrics_kernel=self.metrics_kernel)
+
+        num_correct_whole_segments, \
+        num_segments, \
+        num_correct_whole_segment_events, \
+        num_segment_events = whole_segment_key_acc_computer.compute_whole_segment_key_accuracies_for_all_songs()
 
-        whole_segment_key_acc_computer.compute_whole_segment_key_accuracies_for_all_songs()
+        return {
+            "whole_segment_accuracy": self.get_percentage_result(num_correct_whole_segments, num_segments),
+            "whole_segment_event_accuracy": self.get_percentage_result(num_correct_whole_segment_events,
+                                                                       num_segment_events),
+        }
 
     def compute_fragmentation_for_whole_key_segments(self):
         """ Compute the results in Table 6.7 of thesis.
@@ -186,6 +277,10 @@ class ClearKeySegmentResultsComputer:
         Length of WC-KS; total number of Segment Events in WC-KS; total
         number of WC-KS Segments. Each event is the length of an eighth
         note.
+
+        Returns
+        -------
+        fragmentation_results : dict of { str : dict of { str : float or int } }
         """
         print("Whole key segments fragmentation results:")
 
@@ -195,9 +290,13 @@ class ClearKeySegmentResultsComputer:
         whole_segment_key_acc_computer = WholeSegmentKeyAccuracyComputer(self.song_event_key_pred_labels_dict,
                                                                          self.ground_truth_key_labels_dict,
                                                                          self.pred_key_segment_boundaries_dict,
-                                                                         self.verbose)
+                                                                         self.verbose,
+                                                                         metrics_kernel=self.metrics_kernel)
         whole_segment_key_acc_computer.compute_whole_segment_key_accuracies_for_all_songs(verbose=False)
-        whole_segment_key_acc_computer.compute_fragmentation_for_all_songs()
+
+        return {
+            "fragmentation": self.get_fragmentation_result(*whole_segment_key_acc_computer.compute_fragmentation_for_all_songs()),
+        }
 
     def get_pred_key_segment_boundaries_dict_for_all_events(self):
         """ Get key segment eighth note beat start and stop indices
@@ -251,8 +350,10 @@ if __name__ == '__main__':
     #print(args)
 
     npz_file_handler = NpzFileHandler()
-    song_event_key_preds_dict = npz_file_handler.read_npz_file(args.event_key_preds_npz_path)
-    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_event_key_labels_npz_path)
+    song_event_key_preds_dict = npz_file_handler.read_npz_file(args.event_key_preds_npz_path, lazy=True, mmap=True,
+                                                               songs_to_ignore=SONGS_TO_IGNORE)
+    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_event_key_labels_npz_path, lazy=True,
+                                                                  mmap=True, songs_to_ignore=SONGS_TO_IGNORE)
 
     if args.pred_key_segment_boundaries_npz_path:
         pred_key_segment_boundaries_dict = npz_file_handler.read_npz_file(args.pred_key_segment_boundaries_npz_path)
@@ -8,7 +8,7 @@ class CompletePieceRecallCoverageComputer:
     """
 
     def __init__(self, num_correctly_predicted_events, num_events_in_predicted_segments,
-                 ground_truth_key_labels_dict):
+                 ground_truth_key_labels_dict, metrics_kernel=None):
         """
 
         Parameters
@@ -19,10 +19,17 @@ class CompletePieceRecallCoverageComputer:
             Total no. events in the predicted segments over all of the songs.
         ground_truth_key_labels_dict : dict of { str : np.ndarray }
             Used to predict the total number of events over all of the songs.
+        metrics_kernel : CorpusMetricsKernel
+            If given, the total number of events is read from the kernel
+            (which must be for the same songs as `ground_truth_key_labels_dict`).
         """
         self.num_correctly_predicted_events = num_correctly_predicted_events
         self.num_events_in_predicted_segments = num_events_in_predicted_segments
-        self.total_num_events = self.compute_total_num_events(ground_truth_key_labels_dict)
+
+        if metrics_kernel is not None:
+            self.total_num_events = metrics_kernel.total_num_events
+        else:
+            self.total_num_events = self.compute_total_num_events(ground_truth_key_labels_dict)
 
     def compute_total_num_events(self, ground_truth_key_labels_dict):
         """ Compute the total number of events over all of the
@@ -48,4 +55,6 @@ class CompletePieceRecallCoverageComputer:
 
         coverage = (self.num_events_in_predicted_segments / self.total_num_events) * 100.0
         print("Coverage: {:.1f}% ({}/{})".format(coverage, self.num_events_in_predicted_segments,
-                                                 self.total_num_events))
\ No newline at end of file
+                                                 self.total_num_events))
+
+        return recall, coverage
\ No newline at end of file
@@ -0,0 +1,143 @@
+""" Dictionary interface over one field of a corpus store (see
+`CorpusStoreFileHandler`), so that existing code that expects
+dict of { songname : np.ndarray } works unchanged while vectorised code
+operates on the flat event array.
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from segment_masks import compute_song_event_offsets
+
+class CorpusFieldDict(MutableMapping):
+    """ Dictionary interface over one field of a corpus store. The events
+    of all songs are stored in a single flat array (which may be
+    memory-mapped), and each song's array is a view into it.
+
+    Songs can be removed (e.g. by `remove_songs_to_ignore_from_dict()`)
+    and replaced like in a normal dictionary. A replaced song is stored
+    separately, and is no longer part of the flat events returned by
+    `get_events_for_songs()`.
+    """
+
+    def __init__(self, songnames, events, song_event_offsets):
+        """
+
+        Parameters
+        ----------
+        songnames : list of str
+        events : np.ndarray (shape=(total no. events, ...))
+            The events of all songs, concatenated in the order of `songnames`.
+        song_event_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+            Song `i`'s events are `events[song_event_offsets[i]:song_event_offsets[i+1]]`.
+        """
+        self.songnames = list(songnames)
+        self.song_indices = {songname : song_idx for song_idx, songname in enumerate(self.songnames)}
+        self.events = events
+        self.song_event_offsets = np.asarray(song_event_offsets, dtype='int64')
+
+        # { songname : None (song is a view into `self.events`) or replaced np.ndarray }
+        self.song_arrays = {songname : None for songname in self.songnames}
+
+    def __getitem__(self, songname):
+        song_array = self.song_arrays[songname]
+        if song_array is None:
+            song_idx = self.song_indices[songname]
+            song_array = self.events[self.song_event_offsets[song_idx]:self.song_event_offsets[song_idx + 1]]
+
+        return song_array
+
+    def __setitem__(self, songname, song_array):
+        self.song_arrays[songname] = song_array
+
+    def __delitem__(self, songname):
+        del self.song_arrays[songname]
+
+    def __iter__(self):
+        return iter(self.song_arrays)
+
+    def __len__(self):
+        return len(self.song_arrays)
+
+    def copy(self):
+        """ Create a shallow copy that shares the flat events, so that songs
+        can be removed from the copy without affecting this dictionary.
+        """
+        field_dict_copy = CorpusFieldDict(self.songnames, self.events, self.song_event_offsets)
+        field_dict_copy.song_arrays = dict(self.song_arrays)
+
+        return field_dict_copy
+
+    def check_if_songs_are_flat(self, songnames):
+        """ Check that none of `songnames` have been replaced, i.e. that
+        their events are all in the flat event array.
+
+        Parameters
+        ----------
+        songnames : list of str
+        """
+        return all(songname in self.song_arrays and self.song_arrays[songname] is None
+                   for songname in songnames)
+
+    def get_events_for_songs(self, songnames):
+        """ Get the concatenated events of `songnames`. If they are all of
+        the songs in the store in their original order, this is the flat
+        event array itself (no copy). Otherwise, the events are gathered
+        with a single fancy index.
+
+        Parameters
+        ----------
+        songnames : list of str
+
+        Returns
+        -------
+        events : np.ndarray (shape=(no. events of `songnames`, ...))
+            None if any of the songs have been replaced or removed.
+        song_event_offsets : np.ndarray (dtype='int64', shape=(len(songnames) + 1,))
+        """
+        if not self.check_if_songs_are_flat(songnames):
+            return None, None
+
+        songnames = list(songnames)
+        if songnames == self.songnames:
+            return self.events, self.song_event_offsets
+
+        song_indices = np.asarray([self.song_indices[songname] for songname in songnames], dtype='int64')
+        song_starts = self.song_event_offsets[song_indices]
+        songs_num_events = self.song_event_offsets[song_indices + 1] - song_starts
+
+        song_event_offsets = compute_song_event_offsets(songs_num_events)
+        event_indices = (np.repeat(song_starts - song_event_offsets[:-1], songs_num_events)
+                         + np.arange(song_event_offsets[-1]))
+
+        return self.events[event_indices], song_event_offsets
+
+    def map_events(self, event_function):
+        """ Apply `event_function` to the flat events of every song at
+        once, e.g. `np.argmax(events, axis=1)`, instead of once per song.
+
+        Parameters
+        ----------
+        event_function : function
+            Maps an array of events to an array with one element (or row)
+            per event.
+
+        Returns
+        -------
+        mapped_field_dict : CorpusFieldDict
+            Has the same songs as this dictionary. Replaced songs are mapped
+            one at a time.
+        """
+        mapped_field_dict = CorpusFieldDict(self.songnames, event_function(self.events), self.song_event_offsets)
+        for songname in self.songnames:
+            if songname not in self.song_arrays:
+                del mapped_field_dict[songname]
+            elif self.song_arrays[songname] is not None:
+                mapped_field_dict[songname] = event_function(self.song_arrays[songname])
+
+        for songname in self.song_arrays:
+            if songname not in self.song_indices:
+                mapped_field_dict[songname] = event_function(self.song_arrays[songname])
+
+        return mapped_field_dict
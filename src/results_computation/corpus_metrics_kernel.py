@@ -0,0 +1,282 @@
+""" Compute every per-song counter behind the clear key segment results
+(Tables 6.1-6.8 in the thesis) for all songs at once.
+"""
+
+import hashlib
+
+import numpy as np
+
+from corpus_field_dict import CorpusFieldDict
+from segment_masks import compute_segment_mask, compute_song_event_offsets, get_segment_starts_and_stops
+from segment_reducer import convert_to_segment_indices_array, sum_events_in_segments
+from utils import truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
+
+class CorpusMetricsKernel:
+    """ Compute every per-song counter behind the clear key segment results
+    (Tables 6.1-6.8 in the thesis) for all songs at once.
+
+    The songs' events are concatenated once, along with whether each
+    event's key prediction is correct. Each set of key segments (e.g. the
+    predicted or ground truth boundaries of a definition) is then reduced
+    over those events with a few vectorised passes, and its counters and
+    event mask are cached on the set's contents so that every results
+    computer that shares the kernel reuses them. If the predictions and
+    ground truth key labels are `CorpusFieldDict`s, the events are compared
+    on their flat event arrays instead of one song at a time.
+    `EventKeyAccuracyComputer`, `ClearKeyPrecisionRecallComputer`,
+    `CompletePieceRecallCoverageComputer` and
+    `WholeSegmentKeyAccuracyComputer` read their counters from here.
+
+    All per-song arrays are in the order of `self.songnames`.
+    """
+
+    def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict):
+        """
+
+        Parameters
+        ----------
+        song_event_key_preds_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
+            Key label predictions. May have one more event at the end of a song than
+            `ground_truth_key_labels_dict`.
+        ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
+        """
+        self.songnames = list(song_event_key_preds_dict.keys())
+        self.song_indices = {songname : song_idx for song_idx, songname in enumerate(self.songnames)}
+
+        flat_event_is_correct = self.compute_flat_event_is_correct(song_event_key_preds_dict, ground_truth_key_labels_dict)
+        if flat_event_is_correct is not None:
+            songs_num_events, self.event_is_correct = flat_event_is_correct
+        else:
+            songs_num_events = []
+            event_is_correct = [np.zeros(0, dtype=bool)]
+            for songname in self.songnames:
+                song_ground_truth_key_labels = ground_truth_key_labels_dict[songname]
+                song_event_key_preds = truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels(
+                                                                          song_event_key_preds_dict[songname],
+                                                                          song_ground_truth_key_labels)
+
+                songs_num_events.append(song_ground_truth_key_labels.shape[0])
+                event_is_correct.append(song_event_key_preds == song_ground_truth_key_labels)
+
+            self.event_is_correct = np.concatenate(event_is_correct)
+
+        self.songs_num_events = np.asarray(songs_num_events, dtype='int64')
+        self.song_event_offsets = compute_song_event_offsets(songs_num_events)
+
+        self.total_num_events = int(self.song_event_offsets[-1])
+
+        # { key segment indices digest : key segment metrics }
+        self.key_segment_metrics_cache = {}
+
+    def compute_flat_event_is_correct(self, song_event_key_preds_dict, ground_truth_key_labels_dict):
+        """ If both dictionaries are `CorpusFieldDict`s whose songs are all
+        in their flat event arrays, compare the predictions and ground truth
+        key labels of every song at once.
+
+        Parameters
+        ----------
+        song_event_key_preds_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
+        ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. events,)) }
+
+        Returns
+        -------
+        songs_num_events : np.ndarray (dtype='int64', shape=(no. songs,))
+        event_is_correct : np.ndarray (dtype='bool', shape=(total no. events,))
+            None (instead of the tuple) if either dictionary isn't flat.
+        """
+        if not (isinstance(song_event_key_preds_dict, CorpusFieldDict)
+                and isinstance(ground_truth_key_labels_dict, CorpusFieldDict)):
+            return None
+
+        event_key_preds, pred_song_event_offsets = song_event_key_preds_dict.get_events_for_songs(self.songnames)
+        ground_truth_key_labels, song_event_offsets = ground_truth_key_labels_dict.get_events_for_songs(self.songnames)
+        if event_key_preds is None or ground_truth_key_labels is None:
+            return None
+
+        songs_num_events = np.diff(song_event_offsets)
+
+        # Several songs contain one more event at the end in the predictions,
+        # which is skipped like in `truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels()`.
+        songs_num_extra_pred_events = np.diff(pred_song_event_offsets) - songs_num_events
+        mismatched_song_indices = np.flatnonzero((songs_num_extra_pred_events != 0) & (songs_num_extra_pred_events != 1))
+        if mismatched_song_indices.size > 0:
+            raise ValueError("Key predictions must have as many events as the ground truth key labels, or one more, "
+                             "for songs: {}".format(", ".join(self.songnames[song_idx]
+                                                              for song_idx in mismatched_song_indices)))
+
+        pred_event_indices = (np.repeat(pred_song_event_offsets[:-1] - song_event_offsets[:-1], songs_num_events)
+                              + np.arange(song_event_offsets[-1]))
+
+        return songs_num_events, np.asarray(event_key_preds[pred_event_indices] == ground_truth_key_labels)
+
+    def sum_over_songs(self, values, song_offsets):
+        """ Sum `values` over each song.
+
+        Parameters
+        ----------
+        values : np.ndarray (shape=(total no. elements,))
+        song_offsets : np.ndarray (dtype='int64', shape=(no. songs + 1,))
+            Song `i`'s elements are `values[song_offsets[i]:song_offsets[i+1]]`.
+
+        Returns
+        -------
+        song_sums : np.ndarray (dtype='int64', shape=(no. songs,))
+        """
+        num_before = np.concatenate([[0], np.cumsum(values, dtype='int64')])
+
+        return num_before[song_offsets[1:]] - num_before[song_offsets[:-1]]
+
+    def compute_key_segment_indices_digest(self, key_segment_indices_dict):
+        """ Hash the key segments of every song, so that sets of key segments
+        with the same contents share their counters, and a dictionary that
+        is changed after its counters are computed gets new ones.
+
+        Parameters
+        ----------
+        key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
+            If None or empty, each song is a single key segment.
+
+        Returns
+        -------
+        key_segment_indices_digest : str
+            None if `key_segment_indices_dict` is None or empty.
+        """
+        if not key_segment_indices_dict:
+            return None
+
+        digest = hashlib.sha1()
+        for songname in self.songnames:
+            if songname not in key_segment_indices_dict:
+                digest.update(b'-')
+                continue
+
+            song_key_segment_indices = convert_to_segment_indices_array(key_segment_indices_dict[songname])
+            digest.update(b'+')
+            digest.update(np.int64(song_key_segment_indices.shape[0]).tobytes())
+            digest.update(song_key_segment_indices.tobytes())
+
+        return digest.hexdigest()
+
+    def get_key_segment_metrics(self, key_segment_indices_dict):
+        """ Get the counters of a set of key segments, computing them the
+        first time a set with the same contents is seen.
+
+        Parameters
+        ----------
+        key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
+            If None or empty, each song is a single key segment.
+        """
+        cache_key = self.compute_key_segment_indices_digest(key_segment_indices_dict)
+        if cache_key not in self.key_segment_metrics_cache:
+            self.key_segment_metrics_cache[cache_key] = self.compute_key_segment_metrics(key_segment_indices_dict)
+
+        return self.key_segment_metrics_cache[cache_key]
+
+    def compute_key_segment_metrics(self, key_segment_indices_dict):
+        """ Compute the counters of a set of key segments for every song.
+
+        Parameters
+        ----------
+        key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
+            If None or empty, each song is a single key segment.
+
+        Returns
+        -------
+        key_segment_metrics : dict of { str : np.ndarray }
+            song_has_key_segments : whether the song is in `key_segment_indices_dict`.
+            song_key_segment_offsets : song `i`'s key segments are
+                `key_segment_indices[song_key_segment_offsets[i]:song_key_segment_offsets[i+1]]`.
+            key_segment_indices : start and stop index of each key segment, relative to its song.
+            key_segment_is_correct : whether every event in each key segment is predicted correctly.
+            song_num_correct_events, song_num_events : correct and total no. events in the song's
+                key segments, counting events in overlapping key segments once per key segment
+                (event-level accuracy).
+            song_num_key_segments, song_num_key_segment_events : no. key segments and total key
+                segment length in the song (whole segment accuracy).
+            song_num_correct_whole_key_segments, song_num_correct_whole_key_segment_events : the
+                same for the key segments that are predicted entirely correctly.
+            event_mask : whether each event is inside at least one key segment, over the
+                concatenated events of all songs.
+            song_num_masked_events : no. events in the song's key segments, counting each event once.
+        """
+        song_has_key_segments = np.ones(len(self.songnames), dtype=bool)
+
+        songs_key_segment_indices = [np.zeros((0, 2), dtype='int64')]
+        segment_starts = [np.zeros(0, dtype='int64')]
+        segment_stops = [np.zeros(0, dtype='int64')]
+        songs_num_key_segments = []
+        for song_idx, songname in enumerate(self.songnames):
+            num_song_events = int(self.songs_num_events[song_idx])
+
+            if not key_segment_indices_dict:
+                song_key_segment_indices = np.asarray([[0, num_song_events]], dtype='int64')
+            elif songname not in key_segment_indices_dict:
+                song_has_key_segments[song_idx] = False
+                song_key_segment_indices = np.zeros((0, 2), dtype='int64')
+            else:
+                song_key_segment_indices = convert_to_segment_indices_array(key_segment_indices_dict[songname])
+
+            song_segment_starts, song_segment_stops = get_segment_starts_and_stops(song_key_segment_indices,
+                                                                                   num_song_events)
+
+            songs_key_segment_indices.append(song_key_segment_indices)
+            segment_starts.append(song_segment_starts + self.song_event_offsets[song_idx])
+            segment_stops.append(song_segment_stops + self.song_event_offsets[song_idx])
+            songs_num_key_segments.append(song_key_segment_indices.shape[0])
+
+        key_segment_indices = np.concatenate(songs_key_segment_indices)
+        segment_starts = np.concatenate(segment_starts)
+        segment_stops = np.concatenate(segment_stops)
+        song_key_segment_offsets = compute_song_event_offsets(songs_num_key_segments)
+
+        segment_num_correct_events = sum_events_in_segments(self.event_is_correct, segment_starts, segment_stops)
+        segment_num_events = segment_stops - segment_starts
+        key_segment_is_correct = segment_num_correct_events == segment_num_events
+
+        key_segment_lengths = key_segment_indices[:, 1] - key_segment_indices[:, 0]
+
+        event_mask = compute_segment_mask(np.stack([segment_starts, segment_stops], axis=1), self.total_num_events)
+
+        return {
+            "song_has_key_segments": song_has_key_segments,
+            "song_key_segment_offsets": song_key_segment_offsets,
+            "key_segment_indices": key_segment_indices,
+            "key_segment_is_correct": key_segment_is_correct,
+            "song_num_correct_events": self.sum_over_songs(segment_num_correct_events, song_key_segment_offsets),
+            "song_num_events": self.sum_over_songs(segment_num_events, song_key_segment_offsets),
+            "song_num_key_segments": np.diff(song_key_segment_offsets),
+            "song_num_key_segment_events": self.sum_over_songs(key_segment_lengths, song_key_segment_offsets),
+            "song_num_correct_whole_key_segments": self.sum_over_songs(key_segment_is_correct,
+                                                                       song_key_segment_offsets),
+            "song_num_correct_whole_key_segment_events": self.sum_over_songs(key_segment_lengths * key_segment_is_correct,
+                                                                             song_key_segment_offsets),
+            "event_mask": event_mask,
+            "song_num_masked_events": self.sum_over_songs(event_mask, self.song_event_offsets),
+        }
+
+    def compute_precision_recall_metrics(self, ground_truth_key_segment_indices_dict, pred_key_segment_indices_dict):
+        """ Compute the counters of the clear key precision and recall for
+        every song.
+
+        Parameters
+        ----------
+        ground_truth_key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
+        pred_key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64', shape=(no. key segments, 2)) }
+
+        Returns
+        -------
+        song_num_correct_pred_events_in_gt_segments : np.ndarray (dtype='int64', shape=(no. songs,))
+            No. correctly predicted events inside both a predicted and a ground truth key segment.
+        song_num_pred_events : np.ndarray (dtype='int64', shape=(no. songs,))
+        song_num_gt_events : np.ndarray (dtype='int64', shape=(no. songs,))
+        """
+        ground_truth_key_segment_metrics = self.get_key_segment_metrics(ground_truth_key_segment_indices_dict)
+        pred_key_segment_metrics = self.get_key_segment_metrics(pred_key_segment_indices_dict)
+
+        correct_overlapping_events = (ground_truth_key_segment_metrics["event_mask"]
+                                      & pred_key_segment_metrics["event_mask"]
+                                      & self.event_is_correct)
+
+        return (self.sum_over_songs(correct_overlapping_events, self.song_event_offsets),
+                pred_key_segment_metrics["song_num_masked_events"],
+                ground_truth_key_segment_metrics["song_num_masked_events"])
@@ -0,0 +1,58 @@
+""" Convert Npz files of event-level arrays (e.g. event key labels, key
+probabilities, key predictions) to a corpus store, with one field per
+Npz file. See `CorpusStoreFileHandler`.
+"""
+
+from argparse import ArgumentParser
+
+from file_handlers import CorpusStoreFileHandler, NpzFileHandler
+
+def parse_field_npz_paths(field_npz_paths):
+    """ Split each "<field>=<npz path>" argument into the field name and
+    the Npz path.
+
+    Parameters
+    ----------
+    field_npz_paths : list of str
+
+    Returns
+    -------
+    field_npz_paths_dict : dict of { str : str }
+    """
+    field_npz_paths_dict = {}
+    for field_npz_path in field_npz_paths:
+        field, separator, npz_path = field_npz_path.partition('=')
+        if not separator or not field or not npz_path:
+            raise ValueError("Expected <field>=<npz path>, got: {}".format(field_npz_path))
+
+        field_npz_paths_dict[field] = npz_path
+
+    return field_npz_paths_dict
+
+def get_commandline_args():
+    """ Get commandline arguments from user.
+    """
+    parser = ArgumentParser(description='Convert Npz files of event-level arrays to a corpus store '
+                                        'that can be memory-mapped.')
+    parser.add_argument('--field_npz_paths', type=str, nargs='+',
+                        help='Field name and path to the .npz file containing the '
+                             'field for every song, e.g. '
+                             '`ground_truth_event_key_labels=in/labels.npz`. '
+                             'Every .npz file must contain the same songs.')
+    parser.add_argument('--corpus_store_dir', type=str,
+                        help='Directory to write the corpus store to.')
+    commandline_args = parser.parse_args()
+
+    return commandline_args
+
+if __name__ == '__main__':
+    args = get_commandline_args()
+
+    field_npz_paths_dict = parse_field_npz_paths(args.field_npz_paths)
+
+    npz_file_handler = NpzFileHandler()
+    fields_dict = {field : npz_file_handler.read_npz_file(npz_path)
+                   for field, npz_path in field_npz_paths_dict.items()}
+
+    corpus_store_file_handler = CorpusStoreFileHandler()
+    corpus_store_file_handler.write_content_to_corpus_store(fields_dict, args.corpus_store_dir)
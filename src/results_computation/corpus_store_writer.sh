@@ -0,0 +1,5 @@
+# Corpus store of the meta-corpus validation set, used by `clear_key_segment_batch_results_computer.py --corpus_store_dir`
+python3 corpus_store_writer.py --field_npz_paths 'event_key_preds=in/meta-corpus_validation_frog_event_key_preds_2022-05-12_17-00-11.npz' \
+                                                 'event_key_probs=in/meta-corpus_validation_frog_event_key_probs_2022-06-08_11-29-18.npz' \
+                                                 'ground_truth_event_key_labels=in/meta-corpus_validation_ground_truth_event_key_labels.npz' \
+                               --corpus_store_dir 'out/meta-corpus_validation_corpus_store'
@@ -6,10 +6,33 @@ from argparse import ArgumentParser
 
 import numpy as np
 
+from corpus_metrics_kernel import CorpusMetricsKernel
 from file_handlers import NpzFileHandler
 from utils import exclude_events_outside_of_key_segments_from_event_key_labels, \
                   truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
 
+def compute_song_key_event_level_accuracy(num_correct_events, total_num_events, verbose=False):
+    """ Compute the event-level key accuracy for one song.
+
+    Parameters
+    ----------
+    num_correct_events : int
+    total_num_events : int
+    verbose : bool
+    """
+    if total_num_events == 0:
+        if verbose:
+            print("Warning: total no. events computed as 0.\n")
+        return 0
+
+    event_level_accuracy = (num_correct_events / total_num_events) * 100.0
+
+    if verbose:
+        print("Event-level key accuracy: {:.4f}% ({}/{})".format(event_level_accuracy, num_correct_events, total_num_events))
+        print()
+
+    return event_level_accuracy
+
 class SongEventKeyAccuracyComputer:
     """ Compute the event-level key accuracy for one song.
     """
@@ -59,25 +82,15 @@ class SongEventKeyAccuracyComputer:
         num_correct_events : int
         total_num_events : int
         """
-        if total_num_events == 0:
-            if self.verbose:
-                print("Warning: total no. events computed as 0.\n")
-            return 0
-
-        event_level_accuracy = (num_correct_events / total_num_events) * 100.0
-
-        if self.verbose:
-            print("Event-level key accuracy: {:.4f}% ({}/{})".format(event_level_accuracy, num_correct_events, total_num_events))
-            print()
-
-        return event_level_accuracy
+        return compute_song_key_event_level_accuracy(num_correct_events, total_num_events, self.verbose)
 
 class EventKeyAccuracyComputer:
     """ Compute the event-level key accuracy for all songs.
+    The per-song counts are read from a `CorpusMetricsKernel`.
     """
 
     def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict,
-                 key_segment_indices_dict, verbose=False):
+                 key_segment_indices_dict, verbose=False, metrics_kernel=None):
         """
 
         Parameters
@@ -86,6 +99,9 @@ class EventKeyAccuracyComputer:
         ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64') }
         key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64') }
         verbose : bool
+        metrics_kernel : CorpusMetricsKernel
+            Kernel for the same predictions and ground truth labels, shared with
+            other results computers. Created if None.
         """
         assert song_event_key_preds_dict.keys() == ground_truth_key_labels_dict.keys()
 
@@ -99,6 +115,10 @@ class EventKeyAccuracyComputer:
 
         self.verbose = verbose
 
+        if metrics_kernel is None:
+            metrics_kernel = CorpusMetricsKernel(song_event_key_preds_dict, ground_truth_key_labels_dict)
+        self.metrics_kernel = metrics_kernel
+
     def check_songnames_in_key_predictions_vs_ground_truth_labels(self):
         """ For debugging: output if there are any songs in
         `self.song_event_key_preds_dict` that aren't in `self.ground_truth_key_labels_dict`,
@@ -114,33 +134,23 @@ class EventKeyAccuracyComputer:
     def compute_event_level_key_accuracy_for_each_song(self):
         """ Compute the event-level key accuracy for each song.
         """
+        key_segment_metrics = self.metrics_kernel.get_key_segment_metrics(self.key_segment_indices_dict)
+
         for songname in self.song_event_key_preds_dict:
 
             if self.verbose:
                 print("Song:", songname)
 
-            song_event_key_preds = self.song_event_key_preds_dict[songname]
-            song_gt_key_labels = self.ground_truth_key_labels_dict[songname]
-
-            if self.key_segment_indices_dict:
-                if songname not in self.key_segment_indices_dict:
-                    print("Error: {} not in self.key_segment_indices_dict\n".format(songname))
-                    continue
-                else:
-                    song_key_segment_indices = self.key_segment_indices_dict[songname]
-            else:
-                song_key_segment_indices = None
+            song_idx = self.metrics_kernel.song_indices[songname]
 
-            song_event_key_accuracy_computer = SongEventKeyAccuracyComputer(song_event_key_preds,
-                                                                            song_gt_key_labels,
-                                                                            song_key_segment_indices,
-                                                                            self.verbose)
+            if not key_segment_metrics["song_has_key_segments"][song_idx]:
+                print("Error: {} not in self.key_segment_indices_dict\n".format(songname))
+                continue
 
-            song_num_correct_events, \
-            song_total_num_events = song_event_key_accuracy_computer.compute_key_event_level_accuracy_stats()
+            song_num_correct_events = key_segment_metrics["song_num_correct_events"][song_idx]
+            song_total_num_events = key_segment_metrics["song_num_events"][song_idx]
 
-            song_event_key_accuracy_computer.compute_key_event_level_accuracy(song_num_correct_events,
-                                                                              song_total_num_events)
+            compute_song_key_event_level_accuracy(song_num_correct_events, song_total_num_events, self.verbose)
 
             self.overall_num_correct_events += song_num_correct_events
             self.overall_total_num_events += song_total_num_events
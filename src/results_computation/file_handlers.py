@@ -1,10 +1,13 @@
-""" Read and write Npz and JSON files.
+""" Read and write Npz and JSON files, and corpus stores.
 """
 import json
 import os
 
 import numpy as np
 
+from corpus_field_dict import CorpusFieldDict
+from lazy_npz_dict import LazyNpzDict
+
 class FileHandler:
     """ File handler base class.
     """
@@ -25,14 +28,48 @@ class NpzFileHandler(FileHandler):
     """ Reads/writes Npz files.
     """
 
-    def read_npz_file(self, npz_filepath):
+    def read_npz_file(self, npz_filepath, lazy=False, mmap=False, songnames=None, songs_to_ignore=None):
         """ Read Npz file.
 
         Parameters
         ----------
         npz_filepath : str
+        lazy : bool
+            If true, return a `LazyNpzDict` that only reads each song's array
+            the first time it is accessed, instead of reading every array now.
+        mmap : bool
+            If true, memory-map the arrays of uncompressed members instead of
+            reading them.
+        songnames : list of str
+            If not None, only read these songs.
+        songs_to_ignore : list of str
+            Songs to leave out. They are never read.
+        """
+        if not lazy and not mmap and songnames is None and songs_to_ignore is None:
+            return dict(np.load(npz_filepath))
+
+        npz_content_dict = LazyNpzDict(npz_filepath, mmap=mmap, songnames=songnames,
+                                       songs_to_ignore=songs_to_ignore)
+        if lazy:
+            return npz_content_dict
+
+        npz_content = dict(npz_content_dict)
+        npz_content_dict.close()
+
+        return npz_content
+
+    def output_num_bytes_read(self, npz_content_dict):
+        """ Output how much of a lazily read Npz file has been read and
+        memory-mapped so far.
+
+        Parameters
+        ----------
+        npz_content_dict : LazyNpzDict
         """
-        return dict(np.load(npz_filepath))
+        print("Read {} of {} bytes from {} ({} bytes memory-mapped)".format(npz_content_dict.num_bytes_read,
+                                                                             os.path.getsize(npz_content_dict.npz_filepath),
+                                                                             npz_content_dict.npz_filepath,
+                                                                             npz_content_dict.num_bytes_mapped))
 
     def write_content_to_npz_file(self, file_content_dict, npz_filepath):
         """ Write content to Npz file.
@@ -51,6 +88,16 @@ class JsonFileHandler(FileHandler):
     """ Reads/writes JSON files.
     """
 
+    def read_json_file(self, json_filepath):
+        """ Read JSON file.
+
+        Parameters
+        ----------
+        json_filepath : str
+        """
+        with open(json_filepath, 'r') as json_file:
+            return json.load(json_file)
+
     def write_content_to_json_file(self, file_content_dict, json_filepath):
         """ Write content to JSON file.
 
@@ -64,4 +111,94 @@ class JsonFileHandler(FileHandler):
         json_file_content = json.dumps(file_content_dict)
 
         with open(json_filepath, 'w') as json_file:
-            json_file.write(json_file_content)
\ No newline at end of file
+            json_file.write(json_file_content)
+
+class CorpusStoreFileHandler(FileHandler):
+    """ Reads/writes corpus stores. A corpus store is a directory with
+    one raw .npy file per field (e.g. key labels, key probabilities),
+    containing the events of every song concatenated, plus an offsets
+    .npy file per field and a JSON index of the song names:
+
+        songnames.json
+        <field>.npy
+        <field>_offsets.npy
+
+    Unlike an Npz file, a field can be memory-mapped, so reading it
+    doesn't decompress or copy anything until the events are used.
+    """
+
+    def get_corpus_store_filepaths(self, corpus_store_dir, field):
+        """ Get the paths of the events and offsets .npy files of `field`.
+
+        Parameters
+        ----------
+        corpus_store_dir : str
+        field : str
+        """
+        return (os.path.join(corpus_store_dir, "{}.npy".format(field)),
+                os.path.join(corpus_store_dir, "{}_offsets.npy".format(field)))
+
+    def read_corpus_store_songnames(self, corpus_store_dir):
+        """ Read the song name index of a corpus store.
+
+        Parameters
+        ----------
+        corpus_store_dir : str
+        """
+        with open(os.path.join(corpus_store_dir, "songnames.json"), 'r') as songnames_json_file:
+            return json.load(songnames_json_file)
+
+    def read_corpus_store_field(self, corpus_store_dir, field, mmap=True):
+        """ Read one field of a corpus store.
+
+        Parameters
+        ----------
+        corpus_store_dir : str
+        field : str
+        mmap : bool
+            If true, memory-map the events instead of reading them.
+
+        Returns
+        -------
+        field_dict : CorpusFieldDict
+        """
+        events_npy_filepath, offsets_npy_filepath = self.get_corpus_store_filepaths(corpus_store_dir, field)
+
+        songnames = self.read_corpus_store_songnames(corpus_store_dir)
+        events = np.load(events_npy_filepath, mmap_mode='r' if mmap else None)
+        song_event_offsets = np.load(offsets_npy_filepath)
+
+        return CorpusFieldDict(songnames, events, song_event_offsets)
+
+    def write_content_to_corpus_store(self, fields_dict, corpus_store_dir):
+        """ Write content to a corpus store. Every field must have the same
+        songs; the song order is taken from the first field.
+
+        Parameters
+        ----------
+        fields_dict : dict of { str : dict of { str : np.ndarray } }
+            Field name to the field's arrays for each song.
+        corpus_store_dir : str
+        """
+        if not os.path.isdir(corpus_store_dir):
+            os.makedirs(corpus_store_dir)
+
+        songnames = None
+        for field, field_content_dict in fields_dict.items():
+            if songnames is None:
+                songnames = list(field_content_dict.keys())
+            elif set(field_content_dict.keys()) != set(songnames):
+                raise ValueError("Field {} does not have the same songs as the other fields".format(field))
+
+            song_arrays = [np.asarray(field_content_dict[songname]) for songname in songnames]
+            songs_num_events = [song_array.shape[0] for song_array in song_arrays]
+
+            events = np.concatenate(song_arrays) if len(song_arrays) > 0 else np.zeros(0)
+            song_event_offsets = np.concatenate([[0], np.cumsum(songs_num_events)]).astype('int64')
+
+            events_npy_filepath, offsets_npy_filepath = self.get_corpus_store_filepaths(corpus_store_dir, field)
+            np.save(events_npy_filepath, events)
+            np.save(offsets_npy_filepath, song_event_offsets)
+
+        with open(os.path.join(corpus_store_dir, "songnames.json"), 'w') as songnames_json_file:
+            songnames_json_file.write(json.dumps(songnames if songnames is not None else []))
@@ -6,6 +6,7 @@ occurrence of segments of each length.
 from matplotlib import pyplot as plt
 import numpy as np
 
+from segment_reducer import convert_to_segment_indices_array
 from utils import compute_key_segment_length
 
 class FragmentationComputer:
@@ -52,6 +53,8 @@ class FragmentationComputer:
                                                                                         total_num_segment_events,
                                                                                         num_segments))
 
+        return avg_segment_len, total_num_segment_events, num_segments
+
     def compute_avg_segment_len(self):
         """ Compute the average segment length over all songs.
         Computed as (total number of events over all of the
@@ -61,10 +64,10 @@ class FragmentationComputer:
         total_num_segments = 0
 
         for songname in self.key_segments_dict:
-            song_key_segments = self.key_segments_dict[songname]
-            num_segment_events = sum([compute_key_segment_length(key_segment) for key_segment in song_key_segments])
+            song_key_segments = convert_to_segment_indices_array(self.key_segments_dict[songname])
+            num_segment_events = int(np.sum(song_key_segments[:, 1] - song_key_segments[:, 0]))
             total_num_segment_events += num_segment_events
-            num_key_segments = len(song_key_segments)
+            num_key_segments = song_key_segments.shape[0]
             total_num_segments += num_key_segments
 
         avg_segment_len = total_num_segment_events / total_num_segments
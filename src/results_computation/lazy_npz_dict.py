@@ -0,0 +1,182 @@
+""" Dictionary interface over an Npz file that only reads each song's
+array the first time it is accessed.
+"""
+
+from collections.abc import MutableMapping
+import struct
+import zipfile
+
+import numpy as np
+
+# Size of the fixed part of a zip local file header, before the member
+# name and extra field.
+ZIP_LOCAL_HEADER_SIZE = 30
+
+class LazyNpzDict(MutableMapping):
+    """ Dictionary interface over an Npz file that only reads each song's
+    array the first time it is accessed. Songs can be filtered out before
+    anything is read, and uncompressed members (i.e. written with
+    `np.savez`, not `np.savez_compressed`) can be memory-mapped instead of
+    read.
+
+    The number of bytes read from the file (`self.num_bytes_read`) and
+    memory-mapped (`self.num_bytes_mapped`) so far are kept up to date.
+    """
+
+    def __init__(self, npz_filepath, mmap=False, songnames=None, songs_to_ignore=None):
+        """
+
+        Parameters
+        ----------
+        npz_filepath : str
+        mmap : bool
+            If true, memory-map uncompressed members instead of reading them.
+        songnames : list of str
+            If not None, only these songs are included.
+        songs_to_ignore : list of str
+            Songs to leave out.
+        """
+        self.npz_filepath = npz_filepath
+        self.mmap = mmap
+
+        self.npz_file = None
+        self.zip_file = None
+        self.open_npz_file()
+
+        self.member_infos = {}
+        for zip_info in self.zip_file.infolist():
+            songname = zip_info.filename[:-len(".npy")] if zip_info.filename.endswith(".npy") else zip_info.filename
+            if songnames is not None and songname not in songnames:
+                continue
+            if songs_to_ignore is not None and songname in songs_to_ignore:
+                continue
+
+            self.member_infos[songname] = zip_info
+
+        # { songname : None (not read yet) or np.ndarray }
+        self.song_arrays = {songname : None for songname in self.member_infos}
+
+        self.num_bytes_read = 0
+        self.num_bytes_mapped = 0
+
+    def open_npz_file(self):
+        """ Open the Npz file, if it isn't already open (e.g. after being
+        sent to another process).
+        """
+        if self.zip_file is None:
+            self.npz_file = open(self.npz_filepath, 'rb')
+            self.zip_file = zipfile.ZipFile(self.npz_file)
+
+    def close(self):
+        """ Close the Npz file. It is reopened if another song is read.
+        """
+        if self.zip_file is not None:
+            self.zip_file.close()
+            self.npz_file.close()
+            self.zip_file = None
+            self.npz_file = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["npz_file"] = None
+        state["zip_file"] = None
+
+        return state
+
+    def __getitem__(self, songname):
+        song_array = self.song_arrays[songname]
+        if song_array is None:
+            song_array = self.read_song_array(songname)
+            self.song_arrays[songname] = song_array
+
+        return song_array
+
+    def __setitem__(self, songname, song_array):
+        self.song_arrays[songname] = song_array
+
+    def __delitem__(self, songname):
+        del self.song_arrays[songname]
+
+    def __iter__(self):
+        return iter(self.song_arrays)
+
+    def __len__(self):
+        return len(self.song_arrays)
+
+    def __contains__(self, songname):
+        # checked without reading the song (`Mapping.__contains__` would read it)
+        return songname in self.song_arrays
+
+    def copy(self):
+        """ Create a shallow copy that shares the arrays read so far, so
+        that songs can be removed from the copy without affecting this
+        dictionary.
+        """
+        npz_dict_copy = LazyNpzDict.__new__(LazyNpzDict)
+        npz_dict_copy.__dict__.update(self.__getstate__())
+        npz_dict_copy.song_arrays = dict(self.song_arrays)
+        npz_dict_copy.num_bytes_read = 0
+        npz_dict_copy.num_bytes_mapped = 0
+
+        return npz_dict_copy
+
+    def read_song_array(self, songname):
+        """ Read (or memory-map) one song's array from the Npz file.
+
+        Parameters
+        ----------
+        songname : str
+        """
+        self.open_npz_file()
+        zip_info = self.member_infos[songname]
+
+        if self.mmap and zip_info.compress_type == zipfile.ZIP_STORED:
+            song_array = self.map_song_array(zip_info)
+            if song_array is not None:
+                return song_array
+
+        with self.zip_file.open(zip_info) as member_file:
+            song_array = np.lib.format.read_array(member_file)
+        self.num_bytes_read += zip_info.compress_size
+
+        return song_array
+
+    def map_song_array(self, zip_info):
+        """ Memory-map an uncompressed member of the Npz file. Only the
+        zip and .npy headers are read.
+
+        Parameters
+        ----------
+        zip_info : zipfile.ZipInfo
+
+        Returns
+        -------
+        song_array : np.memmap
+            None if the array can't be memory-mapped (e.g. it is empty or
+            contains Python objects).
+        """
+        # The local header's extra field can differ from the central
+        # directory's, so the member's data offset is read from the local header.
+        self.npz_file.seek(zip_info.header_offset)
+        local_header = self.npz_file.read(ZIP_LOCAL_HEADER_SIZE)
+        member_name_len, extra_field_len = struct.unpack('<HH', local_header[26:30])
+        member_data_offset = zip_info.header_offset + ZIP_LOCAL_HEADER_SIZE + member_name_len + extra_field_len
+
+        self.npz_file.seek(member_data_offset)
+        npy_version = np.lib.format.read_magic(self.npz_file)
+        if npy_version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(self.npz_file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(self.npz_file)
+        array_offset = self.npz_file.tell()
+
+        self.num_bytes_read += array_offset - zip_info.header_offset
+
+        if dtype.hasobject or int(np.prod(shape)) == 0:
+            return None
+
+        song_array = np.memmap(self.npz_filepath, dtype=dtype, mode='r', offset=array_offset,
+                               shape=shape, order='F' if fortran_order else 'C')
+        self.num_bytes_mapped += song_array.nbytes
+
+        return song_array
@@ -2,19 +2,26 @@
 get the key label for each event in each song and
 figure out which events in each song occur inside
 a tonicization segment.
+
+The CSV files can be converted in parallel, and the content hash of
+each CSV file is saved in a manifest, so that a re-run only converts the
+CSV files that changed and merges them into the existing NPZ files.
 """
 
 from argparse import ArgumentParser
 from collections import namedtuple
 import csv
+import hashlib
 import math
+import os
 
 import numpy as np
 
-from file_handlers import NpzFileHandler
+from file_handlers import JsonFileHandler, NpzFileHandler
 from label_codec import LabelCodec
 from utils import get_filepaths_from_txt_file, \
                   strip_filename_from_filepath
+from worker_pool import run_in_worker_pool
 
 # Taken from line 11 of preprocess_chords.py from frog:
 Chord = namedtuple("Chord", ["key", "degree", "quality", "inversion", "root"])
@@ -62,6 +69,8 @@ pitch_bass_key_indices = {'C': 0,
 TONICIZATION_PRESENT = 1
 NO_TONICIZATION_PRESENT = 0
 
+HASH_CHUNK_SIZE = 1024 * 1024
+
 class Micchi2021CSVChords2EventKeyLabelsConverter:
     """ From Micchi's CSV files from the Meta-Corpus,
     get the key label for each event in each song and
@@ -69,42 +78,163 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
     a tonicization segment.
     """
 
-    def __init__(self, txt_file_with_csv_filepaths, input_type):
+    def __init__(self, txt_file_with_csv_filepaths, input_type, num_workers=1):
         """
 
         Parameters
         ----------
         txt_file_with_csv_filepaths : str
         input_type : str
+        num_workers : int
+            Number of worker processes. If 1 (or less), the CSV files are
+            converted one at a time in the current process.
         """
         self.csv_filepaths = get_filepaths_from_txt_file(txt_file_with_csv_filepaths)
         self.input_type = input_type
         self.spelling = self.input_type.split("_")[0]
 
-    def get_event_key_labels_from_csv_files_for_all_songs(self):
+        self.label_codec = LabelCodec(spelling=self.spelling == "spelling",
+                                      mode='legacy', strict=False)
+
+        self.num_workers = num_workers
+
+    def get_event_key_labels_from_csv_files_for_all_songs(self, previous_csv_file_hashes=None,
+                                                          previous_songs_to_event_key_labels=None,
+                                                          previous_songs_to_event_tonicization_labels=None):
         """ Create two dictionaries: one that maps each song to
         the key label for each event in the song and another that
         maps each song to a list indicating which events occur inside
         a tonicization.
+
+        If the results of a previous run are given, the songs whose
+        CSV file hasn't changed since are reused instead of converted.
+
+        Parameters
+        ----------
+        previous_csv_file_hashes : dict of { str : str }
+            Content hash of each CSV file converted in the previous run.
+        previous_songs_to_event_key_labels : dict of { str : np.ndarray }
+        previous_songs_to_event_tonicization_labels : dict of { str : np.ndarray }
+
+        Returns
+        -------
+        songs_to_event_key_labels : dict of { str : np.ndarray }
+        songs_to_event_tonicization_labels : dict of { str : np.ndarray }
+        csv_file_hashes : dict of { str : str }
+            Content hash of each CSV file that was converted or reused,
+            to save in the manifest for the next run.
         """
-        label_codec = LabelCodec(spelling=self.spelling == "spelling",
-                                 mode='legacy', strict=False)
+        if previous_csv_file_hashes is None:
+            previous_csv_file_hashes = {}
+            previous_songs_to_event_key_labels = {}
+            previous_songs_to_event_tonicization_labels = {}
+
+        csv_file_hashes = {csv_filepath : self.compute_csv_file_hash(csv_filepath)
+                           for csv_filepath in self.csv_filepaths}
+
+        csv_filepaths_to_convert = []
+        for csv_filepath in self.csv_filepaths:
+            songname = strip_filename_from_filepath(csv_filepath)
+            if (previous_csv_file_hashes.get(csv_filepath) != csv_file_hashes[csv_filepath]
+                or songname not in previous_songs_to_event_key_labels
+                or songname not in previous_songs_to_event_tonicization_labels):
+                csv_filepaths_to_convert.append(csv_filepath)
+
+        converted_song_event_labels = self.convert_csv_files(csv_filepaths_to_convert)
 
         songs_to_event_key_labels = {}
         songs_to_event_tonicization_labels = {}
         for csv_filepath in self.csv_filepaths:
-            song_event_chord_labels = self.import_chords(csv_filepath, label_codec)
-
             songname = strip_filename_from_filepath(csv_filepath)
-            print("Song:", songname)
 
-            song_event_key_labels = self.extract_keys_from_event_chord_labels(song_event_chord_labels)
-            songs_to_event_key_labels[songname] = song_event_key_labels
+            if csv_filepath in converted_song_event_labels:
+                song_event_key_labels, song_event_tonicization_labels = converted_song_event_labels[csv_filepath]
+            elif csv_filepath not in csv_filepaths_to_convert:
+                song_event_key_labels = previous_songs_to_event_key_labels[songname]
+                song_event_tonicization_labels = previous_songs_to_event_tonicization_labels[songname]
+            else:
+                # failed, so it is left out (and converted again next run)
+                csv_file_hashes.pop(csv_filepath)
+                continue
 
-            song_event_tonicization_labels = self.extract_tonicizations_from_event_chord_labels(song_event_chord_labels)
+            songs_to_event_key_labels[songname] = song_event_key_labels
             songs_to_event_tonicization_labels[songname] = song_event_tonicization_labels
 
-        return songs_to_event_key_labels, songs_to_event_tonicization_labels
+        print("Converted {} and reused {} of {} CSV files".format(len(converted_song_event_labels),
+                                                                 len(self.csv_filepaths) - len(csv_filepaths_to_convert),
+                                                                 len(self.csv_filepaths)))
+
+        return songs_to_event_key_labels, songs_to_event_tonicization_labels, csv_file_hashes
+
+    def convert_csv_files(self, csv_filepaths):
+        """ Convert each CSV file, either in the current process or in a
+        pool of worker processes. The output of each CSV file is printed
+        in the order of `csv_filepaths`.
+
+        Parameters
+        ----------
+        csv_filepaths : list of str
+
+        Returns
+        -------
+        converted_song_event_labels : dict of { str : (np.ndarray, np.ndarray) }
+            Event key labels and event tonicization labels of each CSV
+            file that succeeded.
+        """
+        song_outcomes = run_in_worker_pool(self, "convert_csv_file", csv_filepaths, self.num_workers)
+
+        converted_song_event_labels = {}
+        for csv_filepath, (song_output, song_event_labels, song_error) in zip(csv_filepaths, song_outcomes):
+            print(song_output, end='')
+
+            if song_error is not None:
+                print("Error: Failed to convert {}\n{}".format(csv_filepath, song_error))
+                continue
+
+            converted_song_event_labels[csv_filepath] = song_event_labels
+
+        return converted_song_event_labels
+
+    def convert_csv_file(self, csv_filepath):
+        """ Get the key label and tonicization label of each event in one
+        song.
+
+        Parameters
+        ----------
+        csv_filepath : str
+
+        Returns
+        -------
+        song_event_key_labels : np.ndarray (dtype='int64', shape=(no. events,))
+        song_event_tonicization_labels : np.ndarray (dtype='int64', shape=(no. events,))
+        """
+        song_distinct_chords, song_event_chord_indices = self.import_interned_chords(csv_filepath, self.label_codec)
+
+        songname = strip_filename_from_filepath(csv_filepath)
+        print("Song:", songname)
+
+        song_event_key_labels = self.extract_keys_from_distinct_chords(song_distinct_chords, song_event_chord_indices)
+        song_event_tonicization_labels = self.extract_tonicizations_from_distinct_chords(song_distinct_chords,
+                                                                                        song_event_chord_indices)
+
+        return song_event_key_labels, song_event_tonicization_labels
+
+    def compute_csv_file_hash(self, csv_filepath):
+        """ Hash the contents of a CSV file, along with the input type
+        (which changes the key labels).
+
+        Parameters
+        ----------
+        csv_filepath : str
+        """
+        file_hash = hashlib.sha1()
+        file_hash.update(self.input_type.encode())
+
+        with open(csv_filepath, 'rb') as file_to_hash:
+            for chunk in iter(lambda: file_to_hash.read(HASH_CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+
+        return file_hash.hexdigest()
 
     def import_chords(self, chords_csv_file, label_codec):
         """ Get chord label for each event in the song.
@@ -119,10 +249,52 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
         Taken from `_segment_chord_labels` function on line 97 of
         preprocess_chords.py from frog.
         """
+        distinct_chords, event_chord_indices = self.import_interned_chords(chords_csv_file, label_codec)
+        cl_segmented = [distinct_chords[chord_idx] for chord_idx in event_chord_indices]
+        return cl_segmented
+
+    def import_interned_chords(self, chords_csv_file, label_codec):
+        """ Get the distinct chord labels of the song, and which of them
+        occurs at each event.
+
+        Parameters
+        ----------
+        chords_csv_file : str
+        label_codec : LabelCodec
+
+        Returns
+        -------
+        distinct_chords : list of Chord
+        event_chord_indices : np.ndarray (dtype='int64', shape=(no. events,))
+            Index of each event's chord label in `distinct_chords`.
+        """
         chord_labels = self._load_chord_labels(chords_csv_file, label_codec)
         score_length = chord_labels[-1][1]
-        cl_segmented = self._segment_chord_labels(chord_labels, score_length)
-        return cl_segmented
+        frame_chord_label_indices = self._segment_chord_label_indices(chord_labels, score_length,
+                                                                      songname=strip_filename_from_filepath(chords_csv_file))
+
+        distinct_chords, chord_label_distinct_chord_indices = self.intern_chords([chord_label[2]
+                                                                                  for chord_label in chord_labels])
+
+        return distinct_chords, chord_label_distinct_chord_indices[frame_chord_label_indices]
+
+    def intern_chords(self, chords):
+        """ Find the distinct chords, and the index of each chord in them.
+
+        Parameters
+        ----------
+        chords : list of Chord
+
+        Returns
+        -------
+        distinct_chords : list of Chord
+            In order of first occurrence.
+        chord_indices : np.ndarray (dtype='int64', shape=(len(chords),))
+        """
+        distinct_chord_indices = {}
+        chord_indices = [distinct_chord_indices.setdefault(chord, len(distinct_chord_indices)) for chord in chords]
+
+        return list(distinct_chord_indices), np.asarray(chord_indices, dtype='int64')
 
     def _load_chord_labels(self, chords_csv_file, label_codec):
         """ Load the chord labels from the CSV file.
@@ -150,8 +322,34 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
             ]
         return chords
 
-    def _segment_chord_labels(self, chord_labels, score_duration, output_fpc=2):
-        """ Get chord label for each event in the song.
+    def _segment_chord_labels(self, chord_labels, score_duration, output_fpc=2, songname=None):
+        """ Get chord label for each event in the song (see
+        `_segment_chord_label_indices()`).
+
+        Parameters
+        ----------
+        chord_labels : list of (float, float, Chord)
+        score_duration : float
+        output_fpc : int
+        songname : str
+        """
+        frame_chord_label_indices = self._segment_chord_label_indices(chord_labels, score_duration, output_fpc, songname)
+
+        return [chord_labels[chord_idx][2] for chord_idx in frame_chord_label_indices]
+
+    def _segment_chord_label_indices(self, chord_labels, score_duration, output_fpc=2, songname=None):
+        """ Get the index in `chord_labels` of the chord label for each
+        event in the song.
+
+        Each chord covers the frames whose time is in [chord start, chord end),
+        which are found with a binary search over the frame times, so a song is
+        framed in O(frames + chords) instead of checking every chord at every
+        frame. Like the original frog implementation:
+        - If a frame is covered by more than one chord, the first one is used.
+        - If a frame isn't covered by any chord, the previous frame's chord is
+          used, or the first chord found if no earlier frame has a chord
+          (back-filling).
+        The warnings are output as counts per song, instead of once per frame.
 
         Parameters
         ----------
@@ -160,36 +358,75 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
         output_fpc : int
             fpc = "frames per crotchet (i.e. quarter note)." An event in the Micchi
             output is an eighth note, so `output_fpc` should be 2.
+        songname : str
+            Used in the warnings.
 
         Notes
         -----
-        Taken from `_segment_chord_labels` function on line 97 of
+        Adapted from `_segment_chord_labels` function on line 97 of
         preprocess_chords.py.
         """
-        labels = []
-        n_frames_to_backfill = 0
-        for n in range(math.ceil(score_duration * output_fpc)):
-            seg_time = n / output_fpc
-            chords_found = [c[2] for c in chord_labels if c[0] <= seg_time < c[1]]
-            if len(chords_found) == 0:
-                print(f"Warning: Cannot read labels at frame {n}, time {seg_time}.")
-                if labels:
-                    chords_found = [labels[-1]]
-                    print(f"Warning: Assuming that the previous chord is still valid: {chords_found}")
-                else:
-                    n_frames_to_backfill += 1
-                    print(f"Warning: No valid chord found yet. Back-filling with the next one")
-                    continue
-
-            if len(chords_found) > 1:
-                print(
-                    f"Warning: More than one chord at frame {n} starting at crotchet {seg_time}:\n"
-                    f"{[l for l in chords_found]}. Using only the first one."
-                )
-            for _ in range(1 + n_frames_to_backfill):
-                labels.append(chords_found[0])
-            n_frames_to_backfill = 0
-        return labels
+        num_frames = math.ceil(score_duration * output_fpc)
+        frame_times = np.arange(num_frames) / output_fpc
+
+        chord_starts = np.asarray([chord_label[0] for chord_label in chord_labels], dtype='float64')
+        chord_ends = np.asarray([chord_label[1] for chord_label in chord_labels], dtype='float64')
+
+        # Chord `i` covers frames [chord_start_frames[i], chord_stop_frames[i]).
+        chord_start_frames = np.searchsorted(frame_times, chord_starts, side='left')
+        chord_stop_frames = np.maximum(np.searchsorted(frame_times, chord_ends, side='left'), chord_start_frames)
+        chords_num_frames = chord_stop_frames - chord_start_frames
+
+        # The first (i.e. lowest index) chord covering each frame, or
+        # len(chord_labels) if none does.
+        covered_frames = (np.repeat(chord_start_frames - np.cumsum(chords_num_frames) + chords_num_frames, chords_num_frames)
+                          + np.arange(chords_num_frames.sum()))
+        covering_chord_indices = np.repeat(np.arange(len(chord_labels)), chords_num_frames)
+
+        frame_chord_indices = np.full(num_frames, len(chord_labels), dtype='int64')
+        np.minimum.at(frame_chord_indices, covered_frames, covering_chord_indices)
+        frame_num_chords = np.bincount(covered_frames, minlength=num_frames)
+
+        frame_has_chord = frame_num_chords > 0
+        frames_w_chords = np.flatnonzero(frame_has_chord)
+        if frames_w_chords.shape[0] == 0:
+            self.output_framing_warnings(songname, num_frames, num_frames, 0)
+            return np.zeros(0, dtype='int64')
+
+        # Frames without a chord take the chord of the last frame before them
+        # that has one, and frames before the first chord take the first chord.
+        last_frame_w_chord = np.maximum.accumulate(np.where(frame_has_chord, np.arange(num_frames), -1))
+        last_frame_w_chord[:frames_w_chords[0]] = frames_w_chords[0]
+
+        frame_chord_indices = frame_chord_indices[last_frame_w_chord]
+
+        self.output_framing_warnings(songname,
+                                     int(np.count_nonzero(~frame_has_chord)),
+                                     int(frames_w_chords[0]),
+                                     int(np.count_nonzero(frame_num_chords > 1)))
+
+        return frame_chord_indices
+
+    def output_framing_warnings(self, songname, num_frames_wo_chords, num_backfilled_frames,
+                                num_frames_w_multiple_chords):
+        """ Output how many frames of a song have no chord label or more
+        than one chord label.
+
+        Parameters
+        ----------
+        songname : str
+        num_frames_wo_chords : int
+        num_backfilled_frames : int
+            No. frames without a chord label before the first chord label.
+        num_frames_w_multiple_chords : int
+        """
+        if num_frames_wo_chords > 0:
+            print(f"Warning: Cannot read labels at {num_frames_wo_chords} frame(s) of {songname}. "
+                  f"Back-filled {num_backfilled_frames} with the next chord, and assumed that the "
+                  f"previous chord is still valid for the rest.")
+        if num_frames_w_multiple_chords > 0:
+            print(f"Warning: More than one chord at {num_frames_w_multiple_chords} frame(s) of "
+                  f"{songname}. Using only the first one.")
 
     def extract_keys_from_event_chord_labels(self, event_chord_labels):
         """ Create a numpy vector with length equal to the no. of
@@ -202,12 +439,23 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
         ----------
         event_chord_labels : list of Chord
         """
-        event_keys = []
-        for event_chord_label in event_chord_labels:
-            key_idx = self.convert_key_str_to_key_idx(event_chord_label.key)
-            event_keys.append(key_idx)
+        return self.extract_keys_from_distinct_chords(*self.intern_chords(event_chord_labels))
+
+    def extract_keys_from_distinct_chords(self, distinct_chords, event_chord_indices):
+        """ Same as `extract_keys_from_event_chord_labels()`, but the key
+        index is found once per distinct chord and then gathered for
+        every event.
+
+        Parameters
+        ----------
+        distinct_chords : list of Chord
+        event_chord_indices : np.ndarray (dtype='int64', shape=(no. events,))
+            Index of each event's chord label in `distinct_chords`.
+        """
+        distinct_chord_keys = np.asarray([self.convert_key_str_to_key_idx(chord.key) for chord in distinct_chords],
+                                         dtype='int64')
 
-        return np.asarray(event_keys, dtype='int64')
+        return distinct_chord_keys[event_chord_indices]
 
     def convert_key_str_to_key_idx(self, key_label):
         """ Convert key label from a string to an int
@@ -232,15 +480,58 @@ class Micchi2021CSVChords2EventKeyLabelsConverter:
         ----------
         event_chord_labels : list of Chord
         """
-        event_tonicizations = []
-        for event_chord_label in event_chord_labels:
-            if '/' in event_chord_label.degree:
-                tonicization_idx = TONICIZATION_PRESENT
-            else:
-                tonicization_idx = NO_TONICIZATION_PRESENT
-            event_tonicizations.append(tonicization_idx)
+        return self.extract_tonicizations_from_distinct_chords(*self.intern_chords(event_chord_labels))
 
-        return np.asarray(event_tonicizations, dtype='int64')
+    def extract_tonicizations_from_distinct_chords(self, distinct_chords, event_chord_indices):
+        """ Same as `extract_tonicizations_from_event_chord_labels()`, but
+        the tonicization is found once per distinct chord and then
+        gathered for every event.
+
+        Parameters
+        ----------
+        distinct_chords : list of Chord
+        event_chord_indices : np.ndarray (dtype='int64', shape=(no. events,))
+            Index of each event's chord label in `distinct_chords`.
+        """
+        distinct_chord_tonicizations = np.asarray([TONICIZATION_PRESENT if '/' in chord.degree else NO_TONICIZATION_PRESENT
+                                                   for chord in distinct_chords], dtype='int64')
+
+        return distinct_chord_tonicizations[event_chord_indices]
+
+def read_previous_conversion(manifest_json_path, event_key_labels_npz_path, event_tonicization_labels_npz_path,
+                             input_type):
+    """ Read the manifest and NPZ files written by a previous run, if all
+    of them exist and the previous run used the same input type.
+
+    Parameters
+    ----------
+    manifest_json_path : str
+    event_key_labels_npz_path : str
+    event_tonicization_labels_npz_path : str
+    input_type : str
+
+    Returns
+    -------
+    previous_csv_file_hashes : dict of { str : str }
+    previous_songs_to_event_key_labels : dict of { str : np.ndarray }
+    previous_songs_to_event_tonicization_labels : dict of { str : np.ndarray }
+        All None if there is no usable previous run.
+    """
+    if not all(os.path.isfile(filepath) for filepath in [manifest_json_path,
+                                                         event_key_labels_npz_path,
+                                                         event_tonicization_labels_npz_path]):
+        return None, None, None
+
+    json_file_handler = JsonFileHandler()
+    manifest = json_file_handler.read_json_file(manifest_json_path)
+    if manifest.get("input_type") != input_type:
+        return None, None, None
+
+    npz_file_handler = NpzFileHandler()
+    previous_songs_to_event_key_labels = npz_file_handler.read_npz_file(event_key_labels_npz_path)
+    previous_songs_to_event_tonicization_labels = npz_file_handler.read_npz_file(event_tonicization_labels_npz_path)
+
+    return manifest["csv_file_hashes"], previous_songs_to_event_key_labels, previous_songs_to_event_tonicization_labels
 
 def get_commandline_args():
     """ Get commandline argument values from user.
@@ -254,6 +545,26 @@ def get_commandline_args():
                              '.csv files with the key labels for each song.')
     parser.add_argument('--input_type', type=str, choices=['pitch_bass'],
                         default='pitch_bass')
+    parser.add_argument('--event_key_labels_npz_path', type=str,
+                        default='out/meta-corpus_validation_ground_truth_event_key_labels.npz',
+                        help='Path to .npz file to write the key label of each '
+                             'event to.')
+    parser.add_argument('--event_tonicization_labels_npz_path', type=str,
+                        default='out/meta-corpus_validation_ground_truth_event_tonicization_labels.npz',
+                        help='Path to .npz file to write whether each event '
+                             'occurs inside a tonicization to.')
+    parser.add_argument('--manifest_json_path', type=str,
+                        default='out/meta-corpus_validation_ground_truth_event_labels_manifest.json',
+                        help='Path to .json file containing the content hash of '
+                             'each converted .csv file. On a re-run, only the '
+                             '.csv files that changed are converted again.')
+    parser.add_argument('--no_incremental', action='store_true',
+                        help='Convert every .csv file, even if it hasn\'t '
+                             'changed since the previous run.')
+    parser.add_argument('--num_workers', type=int, default=1,
+                        help='Number of worker processes to convert the .csv '
+                             'files with. 1 converts them one at a time in the '
+                             'current process.')
     commandline_args = parser.parse_args()
 
     return commandline_args
@@ -261,13 +572,29 @@ def get_commandline_args():
 if __name__ == '__main__':
     args = get_commandline_args()
 
+    if args.no_incremental:
+        previous_conversion = (None, None, None)
+    else:
+        previous_conversion = read_previous_conversion(args.manifest_json_path,
+                                                       args.event_key_labels_npz_path,
+                                                       args.event_tonicization_labels_npz_path,
+                                                       args.input_type)
+
     csv_chords2event_key_labels_converter = Micchi2021CSVChords2EventKeyLabelsConverter(args.txt_file_with_csv_filepaths,
-                                                                                        args.input_type)
+                                                                                        args.input_type,
+                                                                                        num_workers=args.num_workers)
     songs_to_event_key_labels, \
-    songs_to_event_tonicization_labels = csv_chords2event_key_labels_converter.get_event_key_labels_from_csv_files_for_all_songs()
+    songs_to_event_tonicization_labels, \
+    csv_file_hashes = csv_chords2event_key_labels_converter.get_event_key_labels_from_csv_files_for_all_songs(*previous_conversion)
 
     npz_file_handler = NpzFileHandler()
     npz_file_handler.write_content_to_npz_file(songs_to_event_key_labels,
-                                               'out/meta-corpus_validation_ground_truth_event_key_labels.npz')
-    #npz_file_handler.write_content_to_npz_file(songs_to_event_tonicization_labels,
-    #                                           'out/meta-corpus_validation_ground_truth_event_tonicization_labels.npz')
\ No newline at end of file
+                                               args.event_key_labels_npz_path)
+    npz_file_handler.write_content_to_npz_file(songs_to_event_tonicization_labels,
+                                               args.event_tonicization_labels_npz_path)
+
+    json_file_handler = JsonFileHandler()
+    json_file_handler.write_content_to_json_file({
+        "input_type": args.input_type,
+        "csv_file_hashes": csv_file_hashes,
+    }, args.manifest_json_path)
@@ -1,2 +1,6 @@
 #python3 micchi2021_csv_chords_2_event_key_labels_converter.py --txt_file_with_csv_filepaths 'in/micchi2021_train_csv_filepaths.txt' --input_type 'pitch_bass'
-python3 micchi2021_csv_chords_2_event_key_labels_converter.py --txt_file_with_csv_filepaths 'in/micchi2021_validation_csv_filepaths.txt' --input_type 'pitch_bass'
\ No newline at end of file
+python3 micchi2021_csv_chords_2_event_key_labels_converter.py --txt_file_with_csv_filepaths 'in/micchi2021_validation_csv_filepaths.txt' --input_type 'pitch_bass' \
+                                                               --event_key_labels_npz_path 'out/meta-corpus_validation_ground_truth_event_key_labels.npz' \
+                                                               --event_tonicization_labels_npz_path 'out/meta-corpus_validation_ground_truth_event_tonicization_labels.npz' \
+                                                               --manifest_json_path 'out/meta-corpus_validation_ground_truth_event_labels_manifest.json' \
+                                                               --num_workers 4
@@ -0,0 +1,185 @@
+""" Histogram of key segment lengths, used to compute cumulative
+("length >= len") segment counts, event counts and whole segment
+precision and recall for every segment length at once.
+"""
+
+import numpy as np
+
+class SegmentLengthHistogram:
+    """ Histogram of key segment lengths, used to compute cumulative
+    ("length >= len") segment counts, event counts and whole segment
+    precision and recall for every segment length at once.
+
+    Every array is indexed by segment length (i.e. element `len` is the
+    value for segments of length `len`, or of length >= `len` for the
+    cumulative arrays), and has (max. segment length + 1) elements.
+    """
+
+    def __init__(self, segment_lengths, segment_is_correct=None):
+        """
+
+        Parameters
+        ----------
+        segment_lengths : np.ndarray (dtype='int64', shape=(no. segments,))
+        segment_is_correct : np.ndarray (dtype='bool', shape=(no. segments,))
+            Whether each segment is predicted entirely correctly. If None,
+            the correct counts are all 0.
+        """
+        segment_lengths = np.asarray(segment_lengths, dtype='int64')
+
+        self.segment_counts = np.bincount(segment_lengths)
+        self.segment_lens = np.arange(self.segment_counts.shape[0])
+
+        if segment_is_correct is None:
+            self.correct_segment_counts = np.zeros_like(self.segment_counts)
+        else:
+            self.correct_segment_counts = np.bincount(segment_lengths[segment_is_correct],
+                                                      minlength=self.segment_counts.shape[0])
+
+    def get_max_segment_len(self):
+        """ Get the length of the longest segment (0 if there are no
+        segments).
+        """
+        return self.segment_counts.shape[0] - 1 if self.segment_counts.shape[0] > 0 else 0
+
+    def get_event_counts(self):
+        """ Get the total number of events in the segments of each length.
+        """
+        return self.segment_counts * self.segment_lens
+
+    def get_correct_event_counts(self):
+        """ Get the total number of events in the entirely correct segments
+        of each length.
+        """
+        return self.correct_segment_counts * self.segment_lens
+
+    def compute_min_len_counts(self, counts):
+        """ Get the sum of `counts` over all segment lengths >= each length
+        (a reversed cumulative sum).
+
+        Parameters
+        ----------
+        counts : np.ndarray (dtype='int64', shape=(max. segment length + 1,))
+        """
+        return np.cumsum(counts[::-1])[::-1]
+
+    def get_min_len_segment_counts(self):
+        """ Get the number of segments with length >= each length.
+        """
+        return self.compute_min_len_counts(self.segment_counts)
+
+    def get_min_len_correct_segment_counts(self):
+        """ Get the number of entirely correct segments with length >= each
+        length.
+        """
+        return self.compute_min_len_counts(self.correct_segment_counts)
+
+    def get_min_len_event_counts(self):
+        """ Get the number of events in the segments with length >= each
+        length.
+        """
+        return self.compute_min_len_counts(self.get_event_counts())
+
+    def get_min_len_correct_event_counts(self):
+        """ Get the number of events in the entirely correct segments with
+        length >= each length.
+        """
+        return self.compute_min_len_counts(self.get_correct_event_counts())
+
+    def compute_precision_at_min_len(self):
+        """ Get the whole segment precision of the segments with length >=
+        each length, i.e. (no. correct segments with length >= len) /
+        (no. segments with length >= len).
+        """
+        min_len_segment_counts = self.get_min_len_segment_counts()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(min_len_segment_counts > 0,
+                            self.get_min_len_correct_segment_counts() / min_len_segment_counts, 0.0)
+
+    def compute_recall_at_min_len(self, ground_truth_histogram):
+        """ Get the whole segment recall of the segments with length >=
+        each length, i.e. (no. correct segments with length >= len) /
+        (no. ground truth segments with length >= len). Has as many
+        elements as the ground truth histogram.
+
+        Parameters
+        ----------
+        ground_truth_histogram : SegmentLengthHistogram
+        """
+        min_len_ground_truth_segment_counts = ground_truth_histogram.get_min_len_segment_counts()
+        min_len_correct_segment_counts = self.resize_to(self.get_min_len_correct_segment_counts(),
+                                                        min_len_ground_truth_segment_counts.shape[0])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(min_len_ground_truth_segment_counts > 0,
+                            min_len_correct_segment_counts / min_len_ground_truth_segment_counts, 0.0)
+
+    def resize_to(self, counts, num_segment_lens):
+        """ Truncate `counts` or pad it with 0s to have `num_segment_lens`
+        elements.
+
+        Parameters
+        ----------
+        counts : np.ndarray (dtype='int64')
+        num_segment_lens : int
+        """
+        resized_counts = np.zeros(num_segment_lens, dtype=counts.dtype)
+        num_kept_counts = min(num_segment_lens, counts.shape[0])
+        resized_counts[:num_kept_counts] = counts[:num_kept_counts]
+
+        return resized_counts
+
+    def convert_counts_to_dict(self, counts, segment_counts):
+        """ Create a dictionary where the key is the segment length and the
+        value is the count, for every segment length that has at least one
+        segment in `segment_counts`.
+
+        Parameters
+        ----------
+        counts : np.ndarray (dtype='int64', shape=(max. segment length + 1,))
+        segment_counts : np.ndarray (dtype='int64', shape=(max. segment length + 1,))
+            `self.segment_counts` or `self.correct_segment_counts`.
+        """
+        segment_lens_w_segments = np.flatnonzero(segment_counts)
+
+        return dict(zip(segment_lens_w_segments.tolist(), counts[segment_lens_w_segments].tolist()))
+
+    def get_segment_count_dict(self):
+        """ Get the number of segments of each length as a dictionary.
+        """
+        return self.convert_counts_to_dict(self.segment_counts, self.segment_counts)
+
+    def get_correct_segment_count_dict(self):
+        """ Get the number of entirely correct segments of each length as a
+        dictionary.
+        """
+        return self.convert_counts_to_dict(self.correct_segment_counts, self.correct_segment_counts)
+
+    def get_event_count_dict(self):
+        """ Get the number of events in the segments of each length as a
+        dictionary.
+        """
+        return self.convert_counts_to_dict(self.get_event_counts(), self.segment_counts)
+
+    def get_correct_event_count_dict(self):
+        """ Get the number of events in the entirely correct segments of
+        each length as a dictionary.
+        """
+        return self.convert_counts_to_dict(self.get_correct_event_counts(), self.correct_segment_counts)
+
+    def convert_min_len_counts_to_dict(self, min_len_counts):
+        """ Create a dictionary where the key is the segment length (from 1
+        up to the longest segment counted in `min_len_counts`) and the value
+        is the cumulative count for that length.
+
+        Parameters
+        ----------
+        min_len_counts : np.ndarray (dtype='int64', shape=(max. segment length + 1,))
+        """
+        segment_lens_w_counts = np.flatnonzero(min_len_counts)
+        max_counted_segment_len = segment_lens_w_counts[-1] if segment_lens_w_counts.shape[0] > 0 else 0
+
+        segment_lens = np.arange(1, max_counted_segment_len + 1)
+
+        return dict(zip(segment_lens.tolist(), min_len_counts[segment_lens].tolist()))
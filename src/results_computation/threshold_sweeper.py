@@ -0,0 +1,122 @@
+""" Compute the coverage, system-boundaries accuracy and complete-piece
+recall of the thresholded Micchi model for many thresholds at once.
+"""
+
+import numpy as np
+
+class ThresholdSweeper:
+    """ Compute the coverage, system-boundaries accuracy and complete-piece
+    recall of the thresholded Micchi model for many thresholds at once.
+
+    The maximum key probability of every event in every song is computed
+    once and sorted, along with whether the event's key prediction is
+    correct. The events that pass a threshold are then a suffix of the
+    sorted events, so the number of predicted and correctly predicted
+    events for any threshold is a binary search plus a lookup into a
+    cumulative sum. This is O(N log N) to set up for N events, and
+    O(log N) per threshold.
+    """
+
+    def __init__(self, event_key_probs_dict, event_key_preds_dict, ground_truth_key_labels_dict):
+        """
+
+        Parameters
+        ----------
+        event_key_probs_dict : dict of { str : np.ndarray (dtype='float32', shape=(no. events, 24)) }
+        event_key_preds_dict : dict of { str : np.ndarray (dtype='int64') }
+            May have one more event at the end of a song than `event_key_probs_dict`.
+        ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64') }
+        """
+        max_key_probs = []
+        correct_events = []
+        for songname in event_key_probs_dict:
+            song_event_key_probs = event_key_probs_dict[songname]
+            num_song_events = song_event_key_probs.shape[0]
+
+            max_key_probs.append(np.max(song_event_key_probs, axis=1))
+
+            song_key_pred_for_each_event = event_key_preds_dict[songname][:num_song_events]
+            correct_events.append(song_key_pred_for_each_event == ground_truth_key_labels_dict[songname])
+
+        if len(max_key_probs) == 0:
+            max_key_probs = np.zeros(0, dtype='float32')
+            correct_events = np.zeros(0, dtype=bool)
+        else:
+            max_key_probs = np.concatenate(max_key_probs)
+            correct_events = np.concatenate(correct_events)
+
+        event_order = np.argsort(max_key_probs, kind='stable')
+        self.sorted_max_key_probs = max_key_probs[event_order]
+
+        # `num_correct_events_before[i]` = no. correct events among the `i` least confident events
+        self.num_correct_events_before = np.concatenate([[0], np.cumsum(correct_events[event_order], dtype='int64')])
+
+        self.total_num_events = self.sorted_max_key_probs.shape[0]
+
+    def compute_event_counts(self, thresholds):
+        """ Count the events that have a maximum key probability >= each
+        threshold, and how many of those have a correct key prediction.
+
+        Parameters
+        ----------
+        thresholds : list of float
+
+        Returns
+        -------
+        num_correctly_predicted_events : np.ndarray (dtype='int64', shape=(no. thresholds,))
+        num_predicted_events : np.ndarray (dtype='int64', shape=(no. thresholds,))
+        """
+        # Compare in the dtype of the probabilities, like `song_max_key_probs >= threshold` would.
+        thresholds = np.asarray(thresholds).astype(self.sorted_max_key_probs.dtype)
+
+        first_predicted_event_indices = np.searchsorted(self.sorted_max_key_probs, thresholds, side='left')
+
+        num_predicted_events = self.total_num_events - first_predicted_event_indices
+        num_correctly_predicted_events = (self.num_correct_events_before[-1]
+                                          - self.num_correct_events_before[first_predicted_event_indices])
+
+        return num_correctly_predicted_events, num_predicted_events
+
+    def compute_coverage_accuracy_and_recall(self, thresholds):
+        """ Compute the coverage, system-boundaries accuracy and
+        complete-piece recall (%) for each threshold.
+
+        Parameters
+        ----------
+        thresholds : list of float
+
+        Returns
+        -------
+        coverages : np.ndarray (shape=(no. thresholds,))
+        accuracies : np.ndarray (shape=(no. thresholds,))
+            NaN for thresholds that no event passes.
+        recalls : np.ndarray (shape=(no. thresholds,))
+        num_correctly_predicted_events : np.ndarray (shape=(no. thresholds,))
+        num_predicted_events : np.ndarray (shape=(no. thresholds,))
+        """
+        num_correctly_predicted_events, num_predicted_events = self.compute_event_counts(thresholds)
+
+        coverages = (num_predicted_events / self.total_num_events) * 100.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accuracies = (num_correctly_predicted_events / num_predicted_events) * 100.0
+        recalls = (num_correctly_predicted_events / self.total_num_events) * 100.0
+
+        return coverages, accuracies, recalls, num_correctly_predicted_events, num_predicted_events
+
+    def compute_threshold_curve(self):
+        """ Compute the coverage, accuracy and recall at every distinct
+        maximum key probability in the corpus, i.e. at every threshold
+        where the set of predicted events changes.
+
+        Returns
+        -------
+        thresholds : np.ndarray (shape=(no. distinct max. key probabilities,))
+            In decreasing order.
+        coverages : np.ndarray
+        accuracies : np.ndarray
+        recalls : np.ndarray
+        """
+        thresholds = np.unique(self.sorted_max_key_probs)[::-1]
+        coverages, accuracies, recalls, _, _ = self.compute_coverage_accuracy_and_recall(thresholds)
+
+        return thresholds, coverages, accuracies, recalls
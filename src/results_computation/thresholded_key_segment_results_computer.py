@@ -31,10 +31,11 @@ import numpy as np
 
 from file_handlers import NpzFileHandler
 from fragmentation_computer import FragmentationComputer
-from utils import get_consecutive_groups_of_indices, \
-                  get_key_segments_from_consecutive_idx_groups, \
+from utils import get_key_segments_from_threshold_mask, \
                   remove_songs_to_ignore_from_dict, \
-                  truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
+                  truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels, \
+                  SONGS_TO_IGNORE
+from threshold_sweeper import ThresholdSweeper
 from whole_segment_key_accuracy_computer import WholeSegmentKeyAccuracyComputer
 
 class ThresholdedKeySegmentResultsComputer:
@@ -53,7 +54,7 @@ class ThresholdedKeySegmentResultsComputer:
         ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64')}
         threshold : float
         """
-        self.songs_to_ignore = ["Mozart_Wolfgang_Amadeus_-___-_K455"]
+        self.songs_to_ignore = list(SONGS_TO_IGNORE)
 
         self.event_key_probs_dict = remove_songs_to_ignore_from_dict(self.songs_to_ignore, event_key_probs_dict)
         self.ground_truth_key_labels_dict = remove_songs_to_ignore_from_dict(self.songs_to_ignore, ground_truth_key_labels_dict)
@@ -64,6 +65,8 @@ class ThresholdedKeySegmentResultsComputer:
 
         self.truncate_off_by_one_event_key_probs()
 
+        self.threshold_sweeper = None
+
     def truncate_off_by_one_event_key_probs(self):
         """ Several songs contain one more event at end in
         event predictions vs. the ground truth labels. For
@@ -199,6 +202,18 @@ class ThresholdedKeySegmentResultsComputer:
         recall = (num_correctly_predicted_events / total_num_events) * 100.0
         return accuracy, recall, num_correctly_predicted_events, num_predicted_events, total_num_events
 
+    def get_threshold_sweeper(self):
+        """ Get the ThresholdSweeper over all songs, which computes the
+        coverage, accuracy and recall for many thresholds at once. Built
+        on first use.
+        """
+        if self.threshold_sweeper is None:
+            self.threshold_sweeper = ThresholdSweeper(self.event_key_probs_dict,
+                                                      self.event_key_preds_dict,
+                                                      self.ground_truth_key_labels_dict)
+
+        return self.threshold_sweeper
+
     def update_threshold(self, threshold):
         """ Update the threshold.
 
@@ -218,13 +233,10 @@ class ThresholdedKeySegmentResultsComputer:
         for songname in self.event_key_probs_dict:
             song_event_key_probs = self.event_key_probs_dict[songname]
             song_max_key_prob_for_each_event = self.compute_max_key_prob_for_each_event(song_event_key_probs)
-            indices_of_events_w_key_prob_gt_threshold = self.get_indices_of_events_w_max_key_prob_greater_than_or_equal_to_threshold(
-                                                                                                    song_max_key_prob_for_each_event)
-
-            consecutive_idx_groups = get_consecutive_groups_of_indices(indices_of_events_w_key_prob_gt_threshold[0])
+            threshold_mask = song_max_key_prob_for_each_event >= self.threshold
 
             song_key_pred_for_each_event = self.event_key_preds_dict[songname]
-            key_segments = get_key_segments_from_consecutive_idx_groups(song_key_pred_for_each_event, consecutive_idx_groups)
+            key_segments = get_key_segments_from_threshold_mask(song_key_pred_for_each_event, threshold_mask)
 
             key_segments_dict[songname] = key_segments
 
@@ -248,6 +260,8 @@ def get_commandline_args():
                              "Table 6.4 - Fragmentation computed for T-KS.\n"
                              "Table 6.6 - Results for Whole Thresholded Key Segments (WT-KS).\n"
                              "Table 6.8 - Fragmentation computed for WT-KS.")
+    parser.add_argument('--report_bytes_read', action='store_true',
+                        help='Print how many bytes were read from each .npz file.')
 
     commandline_args = parser.parse_args()
 
@@ -264,16 +278,25 @@ def compute_accuracy_and_coverage_for_all_thresholds(thresholded_micchi_model,
     thresholds : list of float
     """
     print("Accuracy and Coverage:")
-    coverages = []
-    accuracies = []
-    for threshold in thresholds:
-        thresholded_micchi_model.update_threshold(threshold)
+    threshold_sweeper = thresholded_micchi_model.get_threshold_sweeper()
 
-        coverage = thresholded_micchi_model.compute_and_output_coverage()
-        coverages.append(coverage)
+    coverages, \
+    accuracies, \
+    recalls, \
+    num_correctly_predicted_events, \
+    num_predicted_events = threshold_sweeper.compute_coverage_accuracy_and_recall(thresholds)
 
-        accuracy = thresholded_micchi_model.compute_and_output_accuracy_and_recall()
-        accuracies.append(accuracy)
+    for threshold_idx, threshold in enumerate(thresholds):
+        thresholded_micchi_model.update_threshold(threshold)
+
+        print("Coverage (threshold = {:.3f}): {:.1f}% ({}/{})".format(threshold,
+                                                                      coverages[threshold_idx],
+                                                                      num_predicted_events[threshold_idx],
+                                                                      threshold_sweeper.total_num_events))
+        print("Accuracy: {:.1f}% ({}/{})".format(accuracies[threshold_idx], num_correctly_predicted_events[threshold_idx],
+                                                 num_predicted_events[threshold_idx]))
+        print("Recall: {:.1f}% ({}/{})".format(recalls[threshold_idx], num_correctly_predicted_events[threshold_idx],
+                                               threshold_sweeper.total_num_events))
 
         print()
 
@@ -347,8 +370,10 @@ if __name__ == '__main__':
     print(args)
 
     npz_file_handler = NpzFileHandler()
-    event_key_probs_dict = npz_file_handler.read_npz_file(args.event_key_probs_npz_path)
-    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_key_labels_npz_path)
+    event_key_probs_dict = npz_file_handler.read_npz_file(args.event_key_probs_npz_path, lazy=True, mmap=True,
+                                                          songs_to_ignore=SONGS_TO_IGNORE)
+    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_key_labels_npz_path, lazy=True,
+                                                                  mmap=True, songs_to_ignore=SONGS_TO_IGNORE)
 
     thresholds = [0.98, 0.89, 0.875, 0.87, 0.865, 0.825, 0.81, 0.51, 0.17]
     thresholded_micchi_model = ThresholdedKeySegmentResultsComputer(event_key_probs_dict,
@@ -365,4 +390,8 @@ if __name__ == '__main__':
                                                          thresholds)
     elif args.table == "6.8":
         compute_whole_key_segment_fragmentation_for_all_thresholds(thresholded_micchi_model,
-                                                                   thresholds)
\ No newline at end of file
+                                                                   thresholds)
+
+    if args.report_bytes_read:
+        npz_file_handler.output_num_bytes_read(event_key_probs_dict)
+        npz_file_handler.output_num_bytes_read(ground_truth_key_labels_dict)
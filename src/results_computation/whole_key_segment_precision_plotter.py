@@ -28,48 +28,30 @@ class WholeKeySegmentPrecisionPlotter:
         self.clear_key_definition = clear_key_definition
 
         self.c_ks_segment_len_bins = c_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins
-        self.c_ks_whole_segment_precisions = self.compute_whole_segments_precisions(c_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins,
-                                                                                    c_ks_whole_key_segment_stats_computer.correct_whole_predicted_segments_w_min_seg_len_count_dict,
-                                                                                    c_ks_whole_key_segment_stats_computer.predicted_segments_w_min_seg_len_count_dict)
+        self.c_ks_whole_segment_precisions = self.compute_whole_segments_precisions(c_ks_whole_key_segment_stats_computer)
         self.c_ks_min_extracted_segment_count_idx = c_ks_whole_key_segment_stats_computer.min_extracted_segment_count_idx
 
         self.t_ks_segment_len_bins = t_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins
-        self.t_ks_whole_segment_precisions = self.compute_whole_segments_precisions(t_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins,
-                                                                                    t_ks_whole_key_segment_stats_computer.correct_whole_predicted_segments_w_min_seg_len_count_dict,
-                                                                                    t_ks_whole_key_segment_stats_computer.predicted_segments_w_min_seg_len_count_dict)
+        self.t_ks_whole_segment_precisions = self.compute_whole_segments_precisions(t_ks_whole_key_segment_stats_computer)
         self.t_ks_min_extracted_segment_count_idx = t_ks_whole_key_segment_stats_computer.min_extracted_segment_count_idx
 
         self.ct_ks_segment_len_bins = ct_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins
-        self.ct_ks_whole_segment_precisions = self.compute_whole_segments_precisions(ct_ks_whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins,
-                                                                                     ct_ks_whole_key_segment_stats_computer.correct_whole_predicted_segments_w_min_seg_len_count_dict,
-                                                                                     ct_ks_whole_key_segment_stats_computer.predicted_segments_w_min_seg_len_count_dict)
+        self.ct_ks_whole_segment_precisions = self.compute_whole_segments_precisions(ct_ks_whole_key_segment_stats_computer)
         self.ct_ks_min_extracted_segment_count_idx = ct_ks_whole_key_segment_stats_computer.min_extracted_segment_count_idx
 
         self.X_AXIS_UPPER_LIM = 250.0
 
-    def compute_whole_segments_precisions(self, sorted_segment_len_bins, correct_whole_segments_count_dict,
-                                          segments_count_dict):
-        """ Create a dictionary where the key is the segment length and the
-        value is the cumulative whole segment precision.
+    def compute_whole_segments_precisions(self, whole_key_segment_stats_computer):
+        """ Get the cumulative whole segment precision for each segment
+        length in `sorted_cumulative_segment_len_bins`.
 
         Parameters
-        ---------- 
-        sorted_segment_len_bins: dict of {int : int}
-        correct_whole_segments_count_dict: dict of {int : int}
-        segments_count_dict: dict of {int : int}
+        ----------
+        whole_key_segment_stats_computer : WholeKeySegmentStatsComputer
         """
-        whole_segments_precision_dict = {}
-        for seg_len in sorted_segment_len_bins:
-            if seg_len not in correct_whole_segments_count_dict:
-                whole_segments_precision_dict[seg_len] = 0.0
-            else:
-                correct_whole_segments_count = correct_whole_segments_count_dict[seg_len]
-                segment_count = segments_count_dict[seg_len]
-                whole_segments_precision_dict[seg_len] = (correct_whole_segments_count / segment_count) 
-
-        whole_segments_precisions = [ whole_segments_precision_dict[seg_len] for seg_len in sorted_segment_len_bins ]
-
-        return whole_segments_precisions
+        whole_segments_precisions = whole_key_segment_stats_computer.predicted_segment_length_histogram.compute_precision_at_min_len()
+
+        return whole_segments_precisions[whole_key_segment_stats_computer.sorted_cumulative_segment_len_bins].tolist()
 
     def plot_seg_len_vs_precision(self):
         """ Plot cumulative segment lengths vs. whole segment
@@ -38,43 +38,17 @@ class WholeKeySegmentRecallPlotter:
         self.X_AXIS_UPPER_LIM = 250.0
 
     def get_segment_recall_stats(self, whole_key_segment_stats_computer):
-        """ Get the segment lengths and the cumulative whole segment
-        recall values for each of these segment lengths.
+        """ Get the cumulative whole segment recall for each ground truth
+        segment length, starting from length 1.
 
         Parameters
         ----------
         whole_key_segment_stats_computer : WholeKeySegmentStatsComputer 
         """
-        whole_segments_recall_dict = self.compute_whole_segments_recall_dict(whole_key_segment_stats_computer.correct_whole_predicted_segments_w_min_seg_len_count_dict,
-                                                                             whole_key_segment_stats_computer.ground_truth_segments_w_min_seg_len_count_dict)
+        predicted_histogram = whole_key_segment_stats_computer.predicted_segment_length_histogram
+        whole_segment_recalls = predicted_histogram.compute_recall_at_min_len(whole_key_segment_stats_computer.ground_truth_segment_length_histogram)
 
-        segment_lens = [ segment_len for segment_len in sorted(list(whole_segments_recall_dict.keys())) ]
-        whole_segment_recalls = [ whole_segments_recall_dict[segment_len] for segment_len in segment_lens ]
-
-        return whole_segment_recalls
-
-    def compute_whole_segments_recall_dict(self, correct_whole_segments_count_dict,
-                                           ground_truth_segments_count_dict):
-        """ Create a dictionary where the key is the segment length and the
-        value is the cumulative whole segment recall.
-
-        Parameters
-        ---------- 
-        correct_whole_segments_count_dict : dict of {int : int}
-        ground_truth_segments_count_dict : dict of {int : int}
-        total_num_events : int
-        """
-        whole_segments_recall_dict = {}
-        for seg_len in ground_truth_segments_count_dict:
-            if seg_len in correct_whole_segments_count_dict:
-                correct_whole_segments_count = correct_whole_segments_count_dict[seg_len]
-            else:
-                correct_whole_segments_count = 0
-
-            ground_truth_segments_count = ground_truth_segments_count_dict[seg_len]
-            whole_segments_recall_dict[seg_len] = (correct_whole_segments_count / ground_truth_segments_count) 
-
-        return whole_segments_recall_dict
+        return whole_segment_recalls[1:].tolist()
 
     def plot_seg_len_vs_recall(self):
         """ Plot cumulative segment lengths vs. whole segment recall
@@ -9,7 +9,8 @@ from argparse import ArgumentParser
 from file_handlers import NpzFileHandler
 from thresholded_key_segment_results_computer import ThresholdedKeySegmentResultsComputer
 from utils import convert_event_key_probs_to_event_key_labels, \
-                  remove_songs_to_ignore_from_dict
+                  remove_songs_to_ignore_from_dict, \
+                  SONGS_TO_IGNORE
 from whole_segment_key_accuracy_computer import WholeSegmentKeyAccuracyComputer
 from whole_key_segment_len_count_plotter import WholeKeySegmentLenCountPlotter
 from whole_key_segment_precision_plotter import WholeKeySegmentPrecisionPlotter
@@ -257,6 +258,8 @@ def get_commandline_args():
     parser.add_argument('--plot_recall', action='store_true')
     parser.add_argument('--plot_event_level_recall', action='store_true')
     parser.add_argument('--plot_correct_num_segments_in_log_space', action='store_true')
+    parser.add_argument('--report_bytes_read', action='store_true',
+                        help='Print how many bytes were read from each .npz file.')
 
     commandline_args = parser.parse_args()
 
@@ -266,13 +269,13 @@ if __name__ == '__main__':
     args = get_commandline_args()
     print(args)
 
-    songs_to_ignore = ['Mozart_Wolfgang_Amadeus_-___-_K455']
+    songs_to_ignore = SONGS_TO_IGNORE
 
     npz_file_handler = NpzFileHandler()
-    song_event_key_probs_dict = npz_file_handler.read_npz_file(args.event_key_probs_npz_path)
-    song_event_key_probs_dict = remove_songs_to_ignore_from_dict(songs_to_ignore, song_event_key_probs_dict)
-    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_key_labels_npz_path)
-    ground_truth_key_labels_dict = remove_songs_to_ignore_from_dict(songs_to_ignore, ground_truth_key_labels_dict)
+    song_event_key_probs_dict = npz_file_handler.read_npz_file(args.event_key_probs_npz_path, lazy=True, mmap=True,
+                                                               songs_to_ignore=songs_to_ignore)
+    ground_truth_key_labels_dict = npz_file_handler.read_npz_file(args.ground_truth_key_labels_npz_path, lazy=True,
+                                                                  mmap=True, songs_to_ignore=songs_to_ignore)
 
     clear_key_definition = args.clear_key_definition
 
@@ -302,4 +305,8 @@ if __name__ == '__main__':
                                                      plot_correct_num_segments_in_log_space,
                                                      plot_precision,
                                                      plot_event_level_recall,
-                                                     plot_recall)
\ No newline at end of file
+                                                     plot_recall)
+
+    if args.report_bytes_read:
+        npz_file_handler.output_num_bytes_read(song_event_key_probs_dict)
+        npz_file_handler.output_num_bytes_read(ground_truth_key_labels_dict)
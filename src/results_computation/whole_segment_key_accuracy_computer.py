@@ -4,9 +4,36 @@ whole segment event-based accuracy for all songs.
 
 import numpy as np
 
+from corpus_metrics_kernel import CorpusMetricsKernel
 from fragmentation_computer import FragmentationComputer
-from utils import compute_key_segment_length, \
-                  truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
+from segment_reducer import compute_whole_segment_stats, convert_to_segment_indices_array
+from utils import truncate_song_event_key_probs_one_event_longer_than_ground_truth_labels
+
+def output_song_whole_segment_key_accuracies(song_num_correct_whole_segments, song_num_segments,
+                                             song_num_correct_whole_segment_events, song_num_segment_events):
+    """ For a single song, compute and output the whole segment accuracy
+    and the whole segment event-level accuracy.
+
+    Parameters
+    ----------
+    song_num_correct_whole_segments : int
+    song_num_segments : int
+    song_num_correct_whole_segment_events : int
+    song_num_segment_events : int
+    """
+    if song_num_segments == 0:
+        percentage_correct_whole_segments = 0
+    else:
+        percentage_correct_whole_segments = (song_num_correct_whole_segments / song_num_segments) * 100.0
+
+    print("Percentage of segments that are entirely correct (by segments): {}% ({}/{})".format(percentage_correct_whole_segments, song_num_correct_whole_segments, song_num_segments))
+
+    if song_num_segment_events == 0:
+        percentage_correct_whole_segment_events = 0
+    else:
+        percentage_correct_whole_segment_events = (song_num_correct_whole_segment_events / song_num_segment_events) * 100.0
+
+    print("Percentage of segments that are entirely correct (by events): {}% ({}/{})".format(percentage_correct_whole_segment_events, song_num_correct_whole_segment_events, song_num_segment_events))
 
 class SongWholeSegmentKeyAccuracyComputer:
     """ Compute and output the whole segment accuracy and the
@@ -36,20 +63,23 @@ class SongWholeSegmentKeyAccuracyComputer:
 
         self.verbose = verbose
 
-    def get_correct_whole_segments(self):
+    def get_correct_whole_segments(self, segment_is_correct=None):
         """ Get the list of key segments that are predicted
         entirely correctly.
-        """
-        correct_whole_segments = []
-        for key_segment_idx in self.key_segment_indices:
-            start_idx, stop_idx = key_segment_idx[0], key_segment_idx[1]
-            pred_event_key_segment_labels = self.event_key_predictions[start_idx:stop_idx]
-            ground_truth_event_key_segment_labels = self.ground_truth_event_key_labels[start_idx:stop_idx]
 
-            if np.all(pred_event_key_segment_labels == ground_truth_event_key_segment_labels):
-                correct_whole_segments.append(key_segment_idx)
+        Parameters
+        ----------
+        segment_is_correct : np.ndarray (dtype='bool', shape=(no. key segments,))
+            Whether each key segment is predicted entirely correctly, if it
+            was already computed for all songs at once. Computed for this
+            song if None.
+        """
+        if segment_is_correct is None:
+            segment_is_correct, _ = compute_whole_segment_stats(self.event_key_predictions,
+                                                                self.ground_truth_event_key_labels,
+                                                                self.key_segment_indices)
 
-        return correct_whole_segments
+        return convert_to_segment_indices_array(self.key_segment_indices)[segment_is_correct]
 
     def compute_whole_segment_key_accuracy_stats(self, correct_whole_key_segment_indices):
         """ Compute the statistics needed to compute the whole segment accuracy
@@ -76,11 +106,9 @@ class SongWholeSegmentKeyAccuracyComputer:
         ----------
         key_segments : list of [int, int]
         """
-        num_segment_events = 0
-        for key_segment in key_segments:
-            num_segment_events += compute_key_segment_length(key_segment)
+        key_segments = convert_to_segment_indices_array(key_segments)
 
-        return num_segment_events
+        return int(np.sum(key_segments[:, 1] - key_segments[:, 0]))
 
     def compute_and_output_whole_segment_key_accuracies(self, song_num_correct_whole_segments, song_num_segments,
                                                         song_num_correct_whole_segment_events, song_num_segment_events):
@@ -94,27 +122,17 @@ class SongWholeSegmentKeyAccuracyComputer:
         song_num_correct_whole_segment_events : int
         song_num_segment_events : int
         """
-        if song_num_segments == 0:
-            percentage_correct_whole_segments = 0
-        else:
-            percentage_correct_whole_segments = (song_num_correct_whole_segments / song_num_segments) * 100.0
-
-        print("Percentage of segments that are entirely correct (by segments): {}% ({}/{})".format(percentage_correct_whole_segments, song_num_correct_whole_segments, song_num_segments))
-
-        if song_num_segment_events == 0:
-            percentage_correct_whole_segment_events = 0
-        else:
-            percentage_correct_whole_segment_events = (song_num_correct_whole_segment_events / song_num_segment_events) * 100.0
-
-        print("Percentage of segments that are entirely correct (by events): {}% ({}/{})".format(percentage_correct_whole_segment_events, song_num_correct_whole_segment_events, song_num_segment_events))
+        output_song_whole_segment_key_accuracies(song_num_correct_whole_segments, song_num_segments,
+                                                 song_num_correct_whole_segment_events, song_num_segment_events)
 
 class WholeSegmentKeyAccuracyComputer:
     """ Compute and output the whole segment accuracy and the
     whole segment event-based accuracy for all songs.
+    The per-song counts are read from a `CorpusMetricsKernel`.
     """
 
     def __init__(self, song_event_key_preds_dict, ground_truth_key_labels_dict,
-                 key_segment_indices_dict, verbose=False):
+                 key_segment_indices_dict, verbose=False, metrics_kernel=None):
         """
 
         Parameters
@@ -123,6 +141,9 @@ class WholeSegmentKeyAccuracyComputer:
         ground_truth_key_labels_dict : dict of { str : np.ndarray (dtype='int64')}
         key_segment_indices_dict : dict of { str : np.ndarray (dtype='int64')}
         verbose : bool
+        metrics_kernel : CorpusMetricsKernel
+            Kernel for the same predictions and ground truth labels, shared with
+            other results computers. Created if None.
         """
         self.song_event_key_preds_dict = song_event_key_preds_dict
 
@@ -139,49 +160,43 @@ class WholeSegmentKeyAccuracyComputer:
 
         self.correct_whole_key_segments_dict = {}
 
+        if metrics_kernel is None:
+            metrics_kernel = CorpusMetricsKernel(song_event_key_preds_dict, ground_truth_key_labels_dict)
+        self.metrics_kernel = metrics_kernel
+
     def compute_whole_segment_key_accuracies_for_each_song(self):
         """ Compute the statistics needed to compute the whole segment
         accuracy and the whole segment event-based accuracy for all
         songs in consideration.
         """
+        key_segment_metrics = self.metrics_kernel.get_key_segment_metrics(self.key_segment_indices_dict)
+        song_key_segment_offsets = key_segment_metrics["song_key_segment_offsets"]
+
         for songname in self.song_event_key_preds_dict: 
 
             if self.verbose:
                 print("Song:", songname)
 
-            song_event_key_preds = self.song_event_key_preds_dict[songname]
-            song_gt_key_labels = self.ground_truth_key_labels_dict[songname]
-
-            if self.key_segment_indices_dict:
-                if songname not in self.key_segment_indices_dict:
-                    print("Error: {} not in self.key_segment_indices_dict\n".format(songname))
-                    continue
-                else:
-                    song_key_segment_indices = self.key_segment_indices_dict[songname]
-            else:
-                song_key_segment_indices = None
+            song_idx = self.metrics_kernel.song_indices[songname]
 
-            song_whole_segment_key_accuracy_computer = SongWholeSegmentKeyAccuracyComputer(
-                                                                song_event_key_preds,
-                                                                song_gt_key_labels,
-                                                                song_key_segment_indices,
-                                                                self.verbose)
+            if not key_segment_metrics["song_has_key_segments"][song_idx]:
+                print("Error: {} not in self.key_segment_indices_dict\n".format(songname))
+                continue
 
-            correct_whole_key_segments = song_whole_segment_key_accuracy_computer.get_correct_whole_segments()
+            song_key_segments = slice(song_key_segment_offsets[song_idx], song_key_segment_offsets[song_idx+1])
+            self.correct_whole_key_segments_dict[songname] = key_segment_metrics["key_segment_indices"][song_key_segments][
+                                                                    key_segment_metrics["key_segment_is_correct"][song_key_segments]]
 
-            self.correct_whole_key_segments_dict[songname] = correct_whole_key_segments 
-
-            song_num_correct_whole_segments, \
-            song_num_segments, \
-            song_num_correct_whole_segment_events, \
-            song_num_segment_events = song_whole_segment_key_accuracy_computer.compute_whole_segment_key_accuracy_stats(correct_whole_key_segments)
+            song_num_correct_whole_segments = int(key_segment_metrics["song_num_correct_whole_key_segments"][song_idx])
+            song_num_segments = int(key_segment_metrics["song_num_key_segments"][song_idx])
+            song_num_correct_whole_segment_events = int(key_segment_metrics["song_num_correct_whole_key_segment_events"][song_idx])
+            song_num_segment_events = int(key_segment_metrics["song_num_key_segment_events"][song_idx])
 
             if self.verbose:
-                song_whole_segment_key_accuracy_computer.compute_and_output_whole_segment_key_accuracies(
-                                                                    song_num_correct_whole_segments,
-                                                                    song_num_segments,
-                                                                    song_num_correct_whole_segment_events,
-                                                                    song_num_segment_events)
+                output_song_whole_segment_key_accuracies(song_num_correct_whole_segments,
+                                                         song_num_segments,
+                                                         song_num_correct_whole_segment_events,
+                                                         song_num_segment_events)
 
             self.overall_num_correct_whole_segments += song_num_correct_whole_segments
             self.overall_num_segments += song_num_segments
@@ -207,8 +222,11 @@ class WholeSegmentKeyAccuracyComputer:
                                                                                 self.overall_num_segment_events))
             print()
 
+        return (self.overall_num_correct_whole_segments, self.overall_num_segments,
+                self.overall_num_correct_whole_segment_events, self.overall_num_segment_events)
+
     def compute_fragmentation_for_all_songs(self):
         """ Compute the average segment length for all songs in consideration.
         """
         fragmentation_computer = FragmentationComputer(self.correct_whole_key_segments_dict)
-        fragmentation_computer.compute_and_output_avg_segment_len()
\ No newline at end of file
+        return fragmentation_computer.compute_and_output_avg_segment_len()
\ No newline at end of file
@@ -0,0 +1,90 @@
+""" Call a method of an object on each item of a list, either in the
+current process or in a pool of worker processes.
+
+The object is sent to each worker process only once, when the worker
+starts, instead of once per item. The printed output of each item is
+captured so that the caller can print it in the order of the items, and
+any exception is caught and returned so that one bad item doesn't stop
+the others.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import traceback
+
+# Set in each worker process by `initialize_worker()`.
+worker_obj = None
+worker_method_name = None
+worker_method_args = ()
+
+def initialize_worker(obj, method_name, method_args):
+    """ Store the object and method that the current worker process
+    should call on each item.
+
+    Parameters
+    ----------
+    obj : object
+    method_name : str
+    method_args : tuple
+        Arguments passed to the method after each item.
+    """
+    global worker_obj, worker_method_name, worker_method_args
+    worker_obj = obj
+    worker_method_name = method_name
+    worker_method_args = method_args
+
+def call_method_in_worker(item):
+    """ Call the worker method on one item in the current worker process.
+
+    Parameters
+    ----------
+    item : object
+
+    Returns
+    -------
+    item_output : str
+        Everything printed while calling the method.
+    item_result : object
+        What the method returned. None if the method failed.
+    item_error : str
+        The traceback of the exception. None if the method succeeded.
+    """
+    item_output = io.StringIO()
+    with contextlib.redirect_stdout(item_output):
+        try:
+            item_result = getattr(worker_obj, worker_method_name)(item, *worker_method_args)
+        except Exception:
+            return item_output.getvalue(), None, traceback.format_exc()
+
+    return item_output.getvalue(), item_result, None
+
+def run_in_worker_pool(obj, method_name, items, num_workers, method_args=()):
+    """ Call `obj.method_name(item, *method_args)` on each item, in the
+    current process if `num_workers` is 1 or there is only one item, or
+    else in a pool of `num_workers` worker processes.
+
+    Parameters
+    ----------
+    obj : object
+        Must be picklable if `num_workers` is more than 1.
+    method_name : str
+    items : list
+    num_workers : int
+    method_args : tuple
+        Arguments passed to the method after each item.
+
+    Returns
+    -------
+    item_outcomes : list of (str, object, str)
+        The printed output, result and error of each item, in the order
+        of `items`. See `call_method_in_worker()`.
+    """
+    if num_workers <= 1 or len(items) <= 1:
+        initialize_worker(obj, method_name, method_args)
+        return [call_method_in_worker(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             initializer=initialize_worker,
+                             initargs=(obj, method_name, method_args)) as executor:
+        return list(executor.map(call_method_in_worker, items))